@@ -1,86 +1,157 @@
+import asyncio
 import uuid
 import os
-from custom_chat_history import CustomChatMessageHistory
-from langchain_core.messages import AIMessage, HumanMessage
-import psycopg2
-
-from langchain_core.runnables import RunnablePassthrough
-from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 import sys
+import time
+import anyio
 
-def initialize_agent(session_id:str):
-    # Load environment variables first
-    load_dotenv()
-    
-    # Get database connection from environment variable
-    database_url = os.environ.get('DATABASE_URL')
-    
-    if not database_url:
-        # Fallback to individual parameters for local development
-        database_user = os.environ.get("database_user", "postgres")
-        database_password = os.environ.get("database_password", "12345")
-        database_host = os.environ.get("database_host", "localhost")
-        database_port = os.environ.get("database_port", "5432")
-        database_name = os.environ.get("database_name", "chatbot")
-        database_url = f"postgresql://{database_user}:{database_password}@{database_host}:{database_port}/{database_name}"
-    else:
-        # Render provides postgres:// but psycopg2 needs postgresql://
-        if database_url.startswith("postgres://"):
-            database_url = database_url.replace("postgres://", "postgresql://", 1)
-    
-    # Establish a synchronous connection to the database
-    sync_connection = psycopg2.connect(database_url)
+# Make the Backend package importable when this file is run directly
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
 
-    table_name = "chats_2"
+from custom_chat_history import CustomChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Optional, Union
+import database
+import metrics
 
-    # Get Gemini API key
-    gemini_api_key = os.environ.get('gemini_api_key')
+from Agent.agent_registry import registry, DEFAULT_MODEL
+from Agent.llm_governor import llm_governor
 
-    # Initialize the language model
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=gemini_api_key)
+TABLE_NAME = "chats_2"
 
-    # Create a prompt template with a placeholder for chat history
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are a helpful assistant who remembers previous conversations."),
-        MessagesPlaceholder(variable_name="chat_history"),
-        ("human", "{input}")
-    ])
+def initialize_agent(session_id: str, db: Union[Session, AsyncSession], model_name: str = DEFAULT_MODEL):
+    # The chain is shared across requests; only the history is per session
+    chain = registry.get_chain("chat", model_name)
 
     # Initialize the chat history manager
     chat_history = CustomChatMessageHistory(
-        connection=sync_connection,
-        table_name=table_name,
+        db=db,
+        table_name=TABLE_NAME,
         session_id=session_id
     )
 
-    # Create a chain using the modern approach
-    chain = (
-        {"chat_history": lambda _: chat_history.messages, "input": RunnablePassthrough()}
-        | prompt
-        | llm
+    return chain, chat_history
+
+async def chat_with_agent(session_id: str, user_input: str, db: Optional[AsyncSession] = None):
+    # Reuse the caller's pooled connection, or check one out for this turn
+    owns_db = db is None
+    if owns_db:
+        db = database.AsyncSessionLocal()
+
+    turn_started = time.perf_counter()
+    try:
+        llm_governor.ensure_available()  # Don't record a turn we already know can't be answered
+        chain, chat_history = initialize_agent(session_id, db)
+        # The chat chain is prompt | llm; its steps run separately below so each can be timed
+        prompt, llm = chain.first, chain.last
+
+        # Load prior turns before recording the new one, so the prompt holds it once
+        with metrics.time_stage("history_load", "invoke"):
+            history = await chat_history.aget_messages()
+        metrics.CHAT_HISTORY_MESSAGES.observe(len(history))
+
+        # Add user message to history
+        with metrics.time_stage("persist", "invoke"):
+            await chat_history.aadd_messages([
+                HumanMessage(content=user_input),
+            ])
+
+        with metrics.time_stage("prompt_build", "invoke"):
+            prompt_value = await prompt.ainvoke({"chat_history": history, "input": user_input})
+
+        # Get AI response; the event loop serves other requests while we wait
+        with metrics.time_stage("llm_call", "invoke"):
+            response = await llm_governor.acall(lambda: llm.ainvoke(prompt_value))
+        metrics.observe_usage(response.usage_metadata)
+
+        # Add AI response to history
+        with metrics.time_stage("persist", "invoke"):
+            await chat_history.aadd_messages([
+                AIMessage(content=response.content, usage_metadata=response.usage_metadata),
+            ])
+
+        metrics.CHAT_TURN_SECONDS.labels(mode="invoke").observe(time.perf_counter() - turn_started)
+        return response.content  # Return only the content
+    finally:
+        if owns_db:
+            await db.close()  # Return the connection to the pool
+
+def _chunk_text(chunk) -> str:
+    """Extract the text of a streamed message chunk (plain string or content blocks)."""
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    return "".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for part in content
     )
 
-    return chain, chat_history
+def _add_usage(total: Optional[dict], usage: Optional[dict]) -> Optional[dict]:
+    """Sum streamed usage_metadata deltas."""
+    if not usage:
+        return total
+    if total is None:
+        return dict(usage)
+    return {key: (total.get(key) or 0) + (usage.get(key) or 0) for key in ("input_tokens", "output_tokens", "total_tokens")}
+
+async def stream_chat_with_agent(session_id: str, user_input: str) -> AsyncIterator[str]:
+    """
+    Stream the assistant reply token by token.
 
-def chat_with_agent(session_id: str, user_input: str):
-    chain, chat_history = initialize_agent(session_id)
+    The generator owns its own pooled connection because it outlives the
+    request handler. The full AI message is stored exactly once: after the
+    stream completes, or with the partial reply if the consumer stops early
+    (e.g. the client disconnected and the response task was cancelled).
+    """
+    db = database.AsyncSessionLocal()
+    parts = []
+    usage = None
+    turn_started = time.perf_counter()
+    try:
+        llm_governor.ensure_available()
+        chain, chat_history = initialize_agent(session_id, db)
+        prompt, llm = chain.first, chain.last
 
-    # Add user message to history
-    chat_history.add_messages([
-        HumanMessage(content=user_input),
-    ])
+        with metrics.time_stage("history_load", "stream"):
+            history = await chat_history.aget_messages()
+        metrics.CHAT_HISTORY_MESSAGES.observe(len(history))
 
-    # Get AI response
-    response = chain.invoke({"input": user_input})
+        with metrics.time_stage("persist", "stream"):
+            await chat_history.aadd_messages([
+                HumanMessage(content=user_input),
+            ])
 
-    # Add AI response to history
-    chat_history.add_messages([
-        AIMessage(content=response.content),
-    ])
+        with metrics.time_stage("prompt_build", "stream"):
+            prompt_value = await prompt.ainvoke({"chat_history": history, "input": user_input})
 
-    return response.content  # Return only the content
+        llm_started = time.perf_counter()
+        stream = llm_governor.astream(lambda: llm.astream(prompt_value))
+        async for chunk in stream:
+            usage = _add_usage(usage, chunk.usage_metadata)
+            text = _chunk_text(chunk)
+            if text:
+                if not parts:
+                    metrics.observe_stage("first_token", "stream", time.perf_counter() - llm_started)
+                parts.append(text)
+                yield text
+        metrics.observe_stage("llm_call", "stream", time.perf_counter() - llm_started)
+    finally:
+        # Shield the final write from the cancellation that ends a disconnected stream
+        with anyio.CancelScope(shield=True):
+            try:
+                if parts:
+                    with metrics.time_stage("persist", "stream"):
+                        await chat_history.aadd_messages([
+                            AIMessage(content="".join(parts), usage_metadata=usage),
+                        ])
+                    metrics.observe_usage(usage)
+                    metrics.CHAT_TURN_SECONDS.labels(mode="stream").observe(time.perf_counter() - turn_started)
+            finally:
+                await db.close()  # Return the connection to the pool
 
 if __name__ == "__main__":
     # For standalone testing
@@ -90,5 +161,5 @@ if __name__ == "__main__":
         session_id = 'a151d47b85b39c9c838393ae04df0f6c'  # fallback
     
     user_input = input("You: ")
-    response = chat_with_agent(session_id, user_input)
+    response = asyncio.run(chat_with_agent(session_id, user_input))
     print(f"Assistant: {response}")
\ No newline at end of file
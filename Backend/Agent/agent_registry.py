@@ -0,0 +1,124 @@
+''' Process-wide registry of LLM clients and compiled chains, built once and reused across requests '''
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, PromptTemplate
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable
+
+from Agent.response_cache import get_route_cache
+
+# Load environment variables (Backend/.env and Agent/.env)
+load_dotenv()
+load_dotenv(dotenv_path=Path(__file__).parent / '.env')
+
+DEFAULT_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+# "gemini" for the real model, "stub" for the local fake used by benchmarks (Agent/stub_llm.py)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()
+
+# Prompt used for chat turns; history is supplied per call through "chat_history"
+CHAT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are a helpful assistant who remembers previous conversations."),
+    MessagesPlaceholder(variable_name="chat_history"),
+    ("human", "{input}")
+])
+
+SESSION_NAME_PROMPT = PromptTemplate(
+    input_variables=["topic"],
+    template="""Generate a concise and descriptive name (2-4 words) for a session about: {topic}
+
+    Requirements:
+    - Keep it brief and meaningful
+    - Use title case
+    - No special characters or quotes
+    - Should be easily readable
+
+    Example output format:
+    If topic is "machine learning basics", output: "ML Fundamentals"
+    If topic is "cooking italian food", output: "Italian Cuisine Basics"
+    """
+)
+
+# Chain builders keyed by prompt name; each receives the shared model client
+CHAIN_BUILDERS: Dict[str, Callable[[BaseChatModel], Runnable]] = {
+    "chat": lambda llm: CHAT_PROMPT | llm,
+    "session_name": lambda llm: SESSION_NAME_PROMPT | llm | StrOutputParser(),
+}
+
+def get_api_key() -> str:
+    """Return the Gemini API key from the environment, or an empty string if unset."""
+    return os.getenv("gemini_api_key") or os.getenv("GEMINI_API_KEY") or ""
+
+class AgentRegistry:
+    """
+    Holds one model client per model name and one compiled chain per
+    (model name, prompt name). Chains are stateless; per-session history
+    is passed in at invoke time. Prompts listed in LLM_CACHE_ROUTES get a
+    client wired to the response cache.
+    """
+
+    def __init__(self):
+        self._llms: Dict[Tuple[str, Optional[str]], BaseChatModel] = {}
+        self._chains: Dict[Tuple[str, str], Runnable] = {}
+        self._lock = threading.Lock()
+
+    def get_llm(self, model_name: str = DEFAULT_MODEL, cache_route: Optional[str] = None) -> BaseChatModel:
+        """
+        Return the shared client for model_name, creating it on first use.
+        With cache_route, the client consults that route's response cache.
+        """
+        cache = get_route_cache(cache_route) if cache_route else None
+        key = (model_name, cache_route if cache is not None else None)
+        llm = self._llms.get(key)
+        if llm is None:
+            with self._lock:
+                llm = self._llms.get(key)
+                if llm is None:
+                    llm = self._build_llm(model_name, cache if cache is not None else False)
+                    self._llms[key] = llm
+        return llm
+
+    def _build_llm(self, model_name: str, cache):
+        if LLM_PROVIDER == "stub":
+            from Agent.stub_llm import StubChatModel
+            return StubChatModel(model=model_name, cache=cache)
+        # The Google SDK takes a good part of a second to import; load it with the first client
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(
+            model=model_name,
+            google_api_key=get_api_key(),
+            cache=cache,
+            max_retries=1  # A single attempt; Agent/llm_governor.py owns retries and backoff
+        )
+
+    def get_chain(self, prompt_name: str, model_name: str = DEFAULT_MODEL) -> Runnable:
+        """Return the compiled chain for prompt_name on model_name, building it on first use."""
+        key = (model_name, prompt_name)
+        chain = self._chains.get(key)
+        if chain is None:
+            if prompt_name not in CHAIN_BUILDERS:
+                raise KeyError(f"Unknown prompt: {prompt_name}")
+            llm = self.get_llm(model_name, cache_route=prompt_name)
+            with self._lock:
+                chain = self._chains.get(key)
+                if chain is None:
+                    chain = CHAIN_BUILDERS[prompt_name](llm)
+                    self._chains[key] = chain
+        return chain
+
+    def warm(self, model_name: str = DEFAULT_MODEL) -> None:
+        """Build every known chain for model_name ahead of the first request."""
+        for prompt_name in CHAIN_BUILDERS:
+            self.get_chain(prompt_name, model_name)
+
+    def clear(self) -> None:
+        """Drop all cached clients and chains."""
+        with self._lock:
+            self._llms.clear()
+            self._chains.clear()
+
+registry = AgentRegistry()
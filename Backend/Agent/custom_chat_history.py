@@ -1,25 +1,132 @@
 from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict, HumanMessage, AIMessage
-from typing import List, Optional, TYPE_CHECKING, Sequence
+from typing import List, Optional, TYPE_CHECKING, Sequence, Union
 from langchain_core.chat_history import BaseChatMessageHistory
-import psycopg2
-from psycopg2.extras import Json
+from sqlalchemy import text
+import math
+import os
+from Agent.history_cache import history_cache, HistoryRow
+import crud.archive_crud as archive_crud
+import metrics
 
 if TYPE_CHECKING:
-    from psycopg2.extensions import connection
+    from sqlalchemy.orm import Session
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+# Prompt history is limited to the newest messages that fit this many tokens (per deployment)
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "8000"))
+# Hard cap on rows considered for the window, so the scan stays bounded
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "200"))
+
+def estimate_tokens(content: str) -> int:
+    """Approximate token count (~4 characters per token for Gemini models)."""
+    return max(1, math.ceil(len(content) / 4)) if content else 0
+
+def count_message_tokens(message: BaseMessage) -> int:
+    """Token count for a message, preferring the model's reported usage for AI replies."""
+    usage = getattr(message, "usage_metadata", None)
+    if isinstance(message, AIMessage) and usage and usage.get("output_tokens"):
+        # output_tokens includes thinking tokens, which never come back in the prompt
+        reasoning = (usage.get("output_token_details") or {}).get("reasoning", 0)
+        if usage["output_tokens"] > reasoning:
+            return usage["output_tokens"] - reasoning
+    return estimate_tokens(message.content if isinstance(message.content, str) else str(message.content))
 
 class CustomChatMessageHistory(BaseChatMessageHistory):
+    """
+    Chat history stored in the chats_2 table.
+
+    Pass a Session to use the sync methods, or an AsyncSession to use the
+    async ones (aget_messages / aadd_messages / aclear). Reads go through the
+    process-wide history_cache, which every write here keeps up to date and
+    which is checked against the session's newest id before each hit.
+    A session moved to the archive is moved back on the first uncached read.
+    """
+
     def __init__(
         self,
-        connection: "connection",  # String annotation
+        db: Union["Session", "AsyncSession"],  # Request-scoped session, checked out from the shared pool
         table_name: str,
         session_id: str,
+        token_budget: int = CHAT_HISTORY_TOKEN_BUDGET,
     ):
-        self.connection = connection
+        self.db = db
         self.table_name = table_name
         self.session_id = session_id
+        self.token_budget = token_budget
 
-    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
-        """Add messages to the chat history."""
+    def _insert_query(self):
+        # One statement per turn, in order. The subquery does not see the rows
+        # being inserted, so previous_id is the session's newest id before them.
+        return text(f"""
+        INSERT INTO {self.table_name}
+        (session_id, messages, sender, token_count)
+        SELECT :session_id, r.messages, r.sender, r.token_count
+        FROM unnest(CAST(:messages AS TEXT[]), CAST(:senders AS VARCHAR[]), CAST(:token_counts AS INTEGER[]))
+            WITH ORDINALITY AS r(messages, sender, token_count, position)
+        ORDER BY r.position
+        RETURNING id, (SELECT MAX(id) FROM {self.table_name} WHERE session_id = :session_id) AS previous_id
+        """)
+
+    def _insert_params(self, rows: List[dict]) -> dict:
+        return {
+            "session_id": self.session_id,
+            "messages": [row["messages"] for row in rows],
+            "senders": [row["sender"] for row in rows],
+            "token_counts": [row["token_count"] for row in rows],
+        }
+
+    def _newest_id_query(self):
+        # Served from the (session_id, id) index; tells whether a cached window is current
+        return text(f"SELECT MAX(id) FROM {self.table_name} WHERE session_id = :session_id")
+
+    def _select_query(self):
+        # Walk backwards from the newest id, keep a running token total and
+        # stop at the budget. The window is computed from (id, token_count)
+        # alone, an index-only scan of the (session_id, id) covering index;
+        # only the rows inside it are read from the heap for their text.
+        # Rows written before token_count existed fall back to the same
+        # length-based estimate, which reads that one row.
+        return text(f"""
+        WITH recent AS MATERIALIZED (
+            SELECT r.id, COALESCE(r.token_count, (
+                SELECT CEIL(LENGTH(legacy.messages) / 4.0)::int FROM {self.table_name} legacy
+                WHERE legacy.session_id = :session_id AND legacy.id = r.id
+            )) AS tokens
+            FROM (
+                SELECT id, token_count FROM {self.table_name}
+                WHERE session_id = :session_id
+                ORDER BY id DESC
+                LIMIT :max_messages
+            ) r
+        ), windowed AS (
+            SELECT id, tokens, SUM(tokens) OVER (ORDER BY id DESC) AS running_tokens
+            FROM recent
+        )
+        SELECT c.messages, c.sender, windowed.tokens
+        FROM windowed
+        JOIN {self.table_name} c ON c.session_id = :session_id AND c.id = windowed.id
+        WHERE windowed.running_tokens <= :token_budget
+        ORDER BY windowed.id ASC
+        """)
+
+    def _select_params(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "max_messages": CHAT_HISTORY_MAX_MESSAGES,
+            "token_budget": self.token_budget,
+        }
+
+    def _clear_query(self):
+        return text(f"""
+        DELETE FROM {self.table_name}
+        WHERE session_id = :session_id
+        """)
+
+    def _clear_archive_query(self):
+        return text("DELETE FROM chats_archive WHERE session_id = :session_id")
+
+    def _to_rows(self, messages: Sequence[BaseMessage]) -> List[dict]:
+        rows = []
         for message in messages:
             if isinstance(message, HumanMessage):
                 sender = "human"
@@ -27,52 +134,106 @@ class CustomChatMessageHistory(BaseChatMessageHistory):
                 sender = "ai"
             else:
                 sender = "unknown"
-            insert_query = f"""
-            INSERT INTO {self.table_name} 
-            (session_id, messages, sender) 
-            VALUES (%s, %s, %s)
-            """
-            with self.connection.cursor() as cursor:
-                cursor.execute(
-                    insert_query, 
-                    (
-                        self.session_id,
-                        message.content,
-                        sender
-                    )
-                )
-            self.connection.commit()
+            rows.append({
+                "session_id": self.session_id,
+                "messages": message.content,
+                "sender": sender,
+                "token_count": count_message_tokens(message)
+            })
+        return rows
 
-    def get_messages(self) -> List[BaseMessage]:
-        """Get messages from the chat history."""
-        select_query = f"""
-        SELECT messages, sender FROM {self.table_name}
-        WHERE session_id = %s
-        ORDER BY id ASC
-        """
+    @staticmethod
+    def _to_cache_rows(rows: List[dict]) -> List[HistoryRow]:
+        return [(row["sender"], row["messages"], row["token_count"]) for row in rows]
+
+    @staticmethod
+    def _to_messages(rows: List[HistoryRow]) -> List[BaseMessage]:
         messages_list = []
-        with self.connection.cursor() as cursor:
-            cursor.execute(select_query, (self.session_id,))
-            results = cursor.fetchall()
-            for message_content, sender in results:
-                if sender == "human":
-                    messages_list.append(HumanMessage(content=message_content))
-                elif sender == "ai":
-                    messages_list.append(AIMessage(content=message_content))
+        for sender, message_content, _ in rows:
+            if sender == "human":
+                messages_list.append(HumanMessage(content=message_content))
+            elif sender == "ai":
+                messages_list.append(AIMessage(content=message_content))
+        # A window may start mid-exchange; the model expects the user to speak first
+        while messages_list and not isinstance(messages_list[0], HumanMessage):
+            messages_list.pop(0)
         return messages_list
 
+    def _append_to_cache(self, rows: List[dict], inserted) -> None:
+        history_cache.append(
+            self.session_id, self._to_cache_rows(rows),
+            previous_id=inserted[0].previous_id, newest_id=max(row.id for row in inserted)
+        )
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """Add messages to the chat history."""
+        rows = self._to_rows(messages)
+        if not rows:
+            return
+        inserted = self.db.execute(self._insert_query(), self._insert_params(rows)).all()
+        self.db.commit()
+        self._append_to_cache(rows, inserted)
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """Add messages to the chat history without blocking the event loop."""
+        rows = self._to_rows(messages)
+        if not rows:
+            return
+        inserted = (await self.db.execute(self._insert_query(), self._insert_params(rows))).all()
+        await self.db.commit()
+        self._append_to_cache(rows, inserted)
+
+    def _cached_rows(self, newest_id: Optional[int]) -> Optional[List[HistoryRow]]:
+        rows = history_cache.get(self.session_id, self.token_budget, CHAT_HISTORY_MAX_MESSAGES, newest_id)
+        metrics.record_cache("history", rows is not None)
+        return rows
+
+    def _store_rows(self, results, generation: int, newest_id: Optional[int]) -> List[HistoryRow]:
+        rows = [(sender, message_content, tokens) for message_content, sender, tokens in results]
+        history_cache.put(self.session_id, rows, self.token_budget, CHAT_HISTORY_MAX_MESSAGES, generation, newest_id)
+        return rows
+
+    def get_messages(self) -> List[BaseMessage]:
+        """Get messages from the chat history."""
+        params = {"session_id": self.session_id}
+        newest_id = self.db.execute(self._newest_id_query(), params).scalar()
+        rows = self._cached_rows(newest_id)
+        if rows is None:
+            generation = history_cache.generation(self.session_id)
+            if archive_crud.rehydrate_session(self.db, self.session_id):
+                newest_id = self.db.execute(self._newest_id_query(), params).scalar()
+            results = self.db.execute(self._select_query(), self._select_params()).fetchall()
+            rows = self._store_rows(results, generation, newest_id)
+        return self._to_messages(rows)
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        """Get messages from the chat history without blocking the event loop."""
+        params = {"session_id": self.session_id}
+        newest_id = (await self.db.execute(self._newest_id_query(), params)).scalar()
+        rows = self._cached_rows(newest_id)
+        if rows is None:
+            generation = history_cache.generation(self.session_id)
+            if await archive_crud.arehydrate_session(self.db, self.session_id):
+                newest_id = (await self.db.execute(self._newest_id_query(), params)).scalar()
+            result = await self.db.execute(self._select_query(), self._select_params())
+            rows = self._store_rows(result.fetchall(), generation, newest_id)
+        return self._to_messages(rows)
+
     @property
     def messages(self) -> List[BaseMessage]:
         """Return messages property required by LangChain."""
         return self.get_messages()
-    
+
     def clear(self) -> None:
         """Clear messages for this session."""
-        clear_query = f"""
-        DELETE FROM {self.table_name}
-        WHERE session_id = %s
-        """
-        
-        with self.connection.cursor() as cursor:
-            cursor.execute(clear_query, (self.session_id,))
-        self.connection.commit()
\ No newline at end of file
+        self.db.execute(self._clear_query(), {"session_id": self.session_id})
+        self.db.execute(self._clear_archive_query(), {"session_id": self.session_id})
+        self.db.commit()
+        history_cache.invalidate(self.session_id)
+
+    async def aclear(self) -> None:
+        """Clear messages for this session without blocking the event loop."""
+        await self.db.execute(self._clear_query(), {"session_id": self.session_id})
+        await self.db.execute(self._clear_archive_query(), {"session_id": self.session_id})
+        await self.db.commit()
+        history_cache.invalidate(self.session_id)
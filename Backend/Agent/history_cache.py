@@ -0,0 +1,189 @@
+''' In-process, write-through cache of recent chat history per session '''
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Approximate memory ceiling for cached history; 0 disables the cache
+HISTORY_CACHE_MAX_BYTES = int(os.getenv("HISTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Entries older than this are reloaded; a backstop, as every hit is checked against the database
+HISTORY_CACHE_TTL = float(os.getenv("HISTORY_CACHE_TTL", "300"))
+
+# One cached row: (sender, content, token_count). Plain tuples keep entries small.
+HistoryRow = Tuple[str, str, int]
+
+ROW_OVERHEAD_BYTES = 72  # tuple + int + list slot, roughly
+
+def _row_size(row: HistoryRow) -> int:
+    return ROW_OVERHEAD_BYTES + sys.getsizeof(row[1])
+
+class _Entry:
+    __slots__ = ("rows", "token_budget", "max_messages", "newest_id", "tokens", "size", "loaded_at")
+
+    def __init__(self, rows: List[HistoryRow], token_budget: int, max_messages: int, newest_id: Optional[int]):
+        self.rows = rows
+        self.newest_id = newest_id
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.tokens = sum(row[2] for row in rows)
+        self.size = sum(_row_size(row) for row in rows)
+        self.loaded_at = time.monotonic()
+
+    def trim(self) -> None:
+        """Drop the oldest rows until the window fits its budget again."""
+        while self.rows and (self.tokens > self.token_budget or len(self.rows) > self.max_messages):
+            row = self.rows.pop(0)
+            self.tokens -= row[2]
+            self.size -= _row_size(row)
+
+class HistoryCache:
+    """
+    LRU of the prompt window per session, evicted by approximate memory use.
+
+    Entries are filled after a history read and appended to on every write,
+    so a warm session needs no SELECT. A per-session generation stops a slow
+    read from overwriting rows appended while it was in flight. Generations
+    are drawn from one increasing clock; when idle sessions' generations are
+    pruned, the floor every unknown session reports moves up to the clock, so
+    a read that started before the prune cannot be cached.
+
+    Other worker processes write to the same sessions, so each entry also
+    records the id of the session's newest chats_2 row, and a hit is only
+    served while the caller's current newest id still matches it (one index
+    probe instead of reading and summing the window). Any write, clear or
+    archive elsewhere changes that id, as ids are never reused.
+    """
+
+    def __init__(self, max_bytes: int = HISTORY_CACHE_MAX_BYTES, ttl: float = HISTORY_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._clock = 0  # Last generation handed out
+        self._floor = 0  # Generation of sessions with no counter
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def generation(self, session_id: str) -> int:
+        """Current write generation for session_id; pass it back to put()."""
+        with self._lock:
+            return self._generations.get(session_id, self._floor)
+
+    def get(self, session_id: str, token_budget: int, max_messages: int, newest_id: Optional[int]) -> Optional[List[HistoryRow]]:
+        """Return a copy of the cached window if it still ends at newest_id, or None on a miss."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry.newest_id != newest_id:
+                # Written, cleared or archived by another process since it was cached
+                self._remove(session_id)
+                entry = None
+            if (
+                entry is None
+                or entry.token_budget != token_budget
+                or entry.max_messages != max_messages
+                or time.monotonic() - entry.loaded_at > self.ttl
+            ):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return list(entry.rows)
+
+    def put(
+        self, session_id: str, rows: List[HistoryRow], token_budget: int, max_messages: int,
+        generation: int, newest_id: Optional[int]
+    ) -> None:
+        """
+        Cache a window read from the database, unless it was written to
+        meanwhile. newest_id is the session's newest id, read before the window.
+        """
+        if not self.enabled:
+            return
+        entry = _Entry(list(rows), token_budget, max_messages, newest_id)
+        with self._lock:
+            if self._generations.get(session_id, self._floor) != generation:
+                return
+            self._remove(session_id)
+            self._entries[session_id] = entry
+            self._bytes += entry.size
+            self._evict()
+
+    def append(self, session_id: str, rows: List[HistoryRow], previous_id: Optional[int], newest_id: int) -> None:
+        """
+        Write-through: extend a cached window with rows just committed.
+        previous_id is the session's newest id before them; if the entry does
+        not end there, another process wrote in between and it is dropped.
+        """
+        with self._lock:
+            self._bump(session_id)
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            if entry.newest_id != previous_id:
+                self._remove(session_id)
+                return
+            entry.newest_id = newest_id
+            self._bytes -= entry.size
+            for row in rows:
+                entry.rows.append(row)
+                entry.tokens += row[2]
+                entry.size += _row_size(row)
+            entry.trim()
+            self._bytes += entry.size
+            self._entries.move_to_end(session_id)
+            self._evict()
+
+    def invalidate(self, session_id: str) -> None:
+        """Forget a session, e.g. after its history was cleared or the session deleted."""
+        with self._lock:
+            self._bump(session_id)
+            self._remove(session_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._clock += 1
+            self._floor = self._clock
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _bump(self, session_id: str) -> None:
+        self._clock += 1
+        self._generations[session_id] = self._clock
+
+    def _remove(self, session_id: str) -> None:
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+        # Generations only matter while a session is active; raising the floor
+        # keeps every pruned session's generation from going backwards
+        if len(self._generations) > 4 * max(len(self._entries), 1024):
+            self._generations = {key: self._generations[key] for key in self._entries if key in self._generations}
+            self._floor = self._clock
+
+history_cache = HistoryCache()
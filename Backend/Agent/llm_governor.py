@@ -0,0 +1,425 @@
+''' Shared governor for outbound LLM calls: adaptive concurrency, retries and a circuit breaker
+
+Every model invocation (chat turns, streamed chat turns and session-name
+generation) goes through the process-wide ``llm_governor``:
+
+    - At most ``limit`` calls are in flight. The limit adapts AIMD-style:
+      it creeps up by 1/limit after each fast success and is cut by
+      LLM_LIMIT_BACKOFF when the model rate-limits us or answers slower
+      than LLM_LATENCY_TARGET, staying within [LLM_MIN_IN_FLIGHT,
+      LLM_MAX_IN_FLIGHT]. Callers wait up to LLM_QUEUE_TIMEOUT for a slot.
+    - Rate limits, timeouts and server errors are retried up to
+      LLM_MAX_RETRIES times with full-jitter exponential backoff; other
+      errors (bad request, auth) are raised at once.
+    - After LLM_BREAKER_THRESHOLD consecutive failed attempts the breaker
+      opens and calls fail immediately for LLM_BREAKER_COOLDOWN seconds,
+      after which a single probe call decides whether it closes again.
+
+When the governor refuses a call, or gives up on one after retryable
+errors, it raises LLMUnavailable, which carries a retry_after hint for
+the HTTP layer (503 + Retry-After).
+'''
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Optional, TypeVar
+
+from langchain_core import exceptions as lc_exceptions
+
+T = TypeVar("T")
+
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "32"))
+LLM_MIN_IN_FLIGHT = int(os.getenv("LLM_MIN_IN_FLIGHT", "2"))
+LLM_LATENCY_TARGET = float(os.getenv("LLM_LATENCY_TARGET", "20"))
+LLM_LIMIT_BACKOFF = float(os.getenv("LLM_LIMIT_BACKOFF", "0.7"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+# The limit is cut at most this often, so one burst of 429s counts once
+DECREASE_INTERVAL = 1.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Error classes from langchain_core; older releases lack some of them
+_RATE_LIMIT_ERRORS = tuple(
+    cls for cls in (getattr(lc_exceptions, "ModelRateLimitError", None),) if cls is not None
+)
+_TRANSIENT_ERRORS = (TimeoutError, asyncio.TimeoutError, ConnectionError) + tuple(
+    cls for cls in (
+        getattr(lc_exceptions, "ModelAPIError", None),
+        getattr(lc_exceptions, "ModelConnectionError", None),
+        getattr(lc_exceptions, "ModelTimeoutError", None),
+    ) if cls is not None
+)
+_TRANSIENT_STATUS = {500, 502, 503, 504}
+
+class LLMUnavailable(Exception):
+    """The model cannot be called right now; retry after ``retry_after`` seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+def _causes(exc: BaseException):
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__ or exc.__context__
+
+def is_rate_limit(exc: BaseException) -> bool:
+    return any(
+        isinstance(e, _RATE_LIMIT_ERRORS) or _status_code(e) == 429 or "RESOURCE_EXHAUSTED" in str(e)
+        for e in _causes(exc)
+    )
+
+def is_retryable(exc: BaseException) -> bool:
+    """Rate limits, timeouts, connection and 5xx errors; not bad requests or auth failures."""
+    if is_rate_limit(exc):
+        return True
+    return any(
+        isinstance(e, _TRANSIENT_ERRORS) or _status_code(e) in _TRANSIENT_STATUS
+        for e in _causes(exc)
+    )
+
+class _Waiter:
+    """A caller queued for a slot; woken through an Event (threads) or a Future (event loop)."""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.granted = False
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+
+    def wake(self) -> None:
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+class LLMGovernor:
+    def __init__(
+        self,
+        max_in_flight: int = LLM_MAX_IN_FLIGHT,
+        min_in_flight: int = LLM_MIN_IN_FLIGHT,
+        latency_target: float = LLM_LATENCY_TARGET,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+        breaker_threshold: int = LLM_BREAKER_THRESHOLD,
+        breaker_cooldown: float = LLM_BREAKER_COOLDOWN
+    ):
+        self.max_in_flight = max_in_flight
+        self.min_in_flight = min(min_in_flight, max_in_flight)
+        self.latency_target = latency_target
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+
+        self._lock = threading.Lock()
+        self._limit = float(max_in_flight)
+        self._in_flight = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._last_decrease = 0.0
+
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.rejected = 0
+
+    # Concurrency limit
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_in_flight, int(self._limit))
+
+    def _grant_waiters_locked(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self._in_flight += 1
+            waiter.wake()
+
+    def _try_acquire_locked(self) -> bool:
+        if not self._waiters and self._in_flight < self.limit:
+            self._in_flight += 1
+            return True
+        return False
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Called when a wait ends early; returns True if the slot was granted meanwhile."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def _overloaded(self) -> LLMUnavailable:
+        return LLMUnavailable("The model is overloaded; too many requests are waiting", retry_after=self.queue_timeout)
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._try_acquire_locked():
+                return
+            waiter = _Waiter()
+            self._waiters.append(waiter)
+        if not waiter.event.wait(self.queue_timeout) and not self._abandon(waiter):
+            self.rejected += 1
+            raise self._overloaded()
+
+    async def _aacquire(self) -> None:
+        with self._lock:
+            if self._try_acquire_locked():
+                return
+            waiter = _Waiter(asyncio.get_running_loop())
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not self._abandon(waiter):
+                self.rejected += 1
+                raise self._overloaded()
+        except asyncio.CancelledError:
+            if self._abandon(waiter):
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._grant_waiters_locked()
+
+    # Outcome bookkeeping: adaptive limit and breaker
+
+    def _record_success(self, latency: float) -> None:
+        with self._lock:
+            self._consecutive_failures = 0
+            if self._state != CLOSED:
+                print("LLM circuit breaker closed")
+            self._state = CLOSED
+            self._probe_in_flight = False
+            if latency > self.latency_target:
+                self._decrease_locked()
+            else:
+                self._limit = min(float(self.max_in_flight), self._limit + 1.0 / max(self._limit, 1.0))
+                self._grant_waiters_locked()
+
+    def _record_failure(self, exc: BaseException) -> None:
+        with self._lock:
+            self._probe_in_flight = False
+            if not is_retryable(exc):
+                return  # Our request was bad; the model is fine
+            self.failures += 1
+            if is_rate_limit(exc):
+                self.rate_limited += 1
+                self._decrease_locked()
+            self._consecutive_failures += 1
+            if self._state == HALF_OPEN or self._consecutive_failures >= self.breaker_threshold:
+                if self._state != OPEN:
+                    print(f"LLM circuit breaker opened after {self._consecutive_failures} failures: {str(exc)}")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def _end_probe(self) -> None:
+        """A call left without an outcome (no slot, cancelled); let the next call probe instead."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _decrease_locked(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease >= DECREASE_INTERVAL:
+            self._limit = max(float(self.min_in_flight), self._limit * LLM_LIMIT_BACKOFF)
+            self._last_decrease = now
+
+    def _check_breaker(self) -> None:
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            remaining = self._opened_at + self.breaker_cooldown - time.monotonic()
+            if self._state == OPEN and remaining <= 0:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True  # This call is the probe
+                return
+            self.rejected += 1
+        raise LLMUnavailable(
+            "The model is temporarily unavailable",
+            retry_after=max(remaining, 1.0)
+        )
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * (2 ** attempt)))
+
+    def _give_up(self, exc: BaseException, attempt: int) -> BaseException:
+        """The error to raise once retries are exhausted: LLMUnavailable for anything retryable."""
+        if not is_retryable(exc):
+            return exc
+        with self._lock:
+            remaining = self._opened_at + self.breaker_cooldown - time.monotonic() if self._state == OPEN else 0.0
+        if remaining > 0:
+            return LLMUnavailable("The model is temporarily unavailable", retry_after=remaining)
+        if is_rate_limit(exc):
+            return LLMUnavailable("The model is rate limiting requests", retry_after=LLM_RETRY_MAX_DELAY)
+        return LLMUnavailable(
+            "The model is not responding",
+            retry_after=min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * (2 ** attempt))
+        )
+
+    # Public API
+
+    def ensure_available(self) -> None:
+        """Fail fast while the breaker is open, e.g. before doing work that only makes sense with a reply."""
+        with self._lock:
+            remaining = self._opened_at + self.breaker_cooldown - time.monotonic()
+            if self._state != OPEN or remaining <= 0:
+                return
+            self.rejected += 1
+        raise LLMUnavailable("The model is temporarily unavailable", retry_after=max(remaining, 1.0))
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """Run a blocking model call under the governor (worker threads)."""
+        self.calls += 1
+        attempt = 0
+        while True:
+            self._check_breaker()
+            try:
+                self._acquire()
+            except LLMUnavailable:
+                self._end_probe()
+                raise
+            started = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                self._release()
+                self._record_failure(e)
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise self._give_up(e, attempt) from e
+                self.retries += 1
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            self._release()
+            self._record_success(time.monotonic() - started)
+            return result
+
+    async def acall(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await a model call under the governor."""
+        self.calls += 1
+        attempt = 0
+        while True:
+            self._check_breaker()
+            try:
+                await self._aacquire()
+            except BaseException:
+                self._end_probe()
+                raise
+            started = time.monotonic()
+            try:
+                result = await fn()
+            except Exception as e:
+                self._release()
+                self._record_failure(e)
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise self._give_up(e, attempt) from e
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                self._release()
+                self._end_probe()
+                raise
+            self._release()
+            self._record_success(time.monotonic() - started)
+            return result
+
+    async def astream(self, fn: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """
+        Stream a model call under the governor. The slot is held until the
+        stream ends; failures are only retried before the first chunk, and
+        latency is measured to that first chunk.
+        """
+        self.calls += 1
+        attempt = 0
+        while True:
+            self._check_breaker()
+            try:
+                await self._aacquire()
+            except BaseException:
+                self._end_probe()
+                raise
+            started = time.monotonic()
+            first_chunk = True
+            try:
+                async for chunk in fn():
+                    if first_chunk:
+                        first_chunk = False
+                        self._record_success(time.monotonic() - started)
+                    yield chunk
+                if first_chunk:
+                    self._record_success(time.monotonic() - started)
+                return
+            except Exception as e:
+                self._record_failure(e)
+                if not first_chunk or attempt >= self.max_retries or not is_retryable(e):
+                    raise self._give_up(e, attempt) from e
+                self.retries += 1
+            except BaseException:
+                if first_chunk:
+                    self._end_probe()  # Cancelled or closed before any output
+                raise
+            finally:
+                self._release()
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._state,
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+                "waiting": len(self._waiters),
+                "consecutive_failures": self._consecutive_failures,
+                "calls": self.calls,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "failures": self.failures,
+                "rejected": self.rejected,
+            }
+
+llm_governor = LLMGovernor()
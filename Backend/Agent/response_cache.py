@@ -0,0 +1,192 @@
+''' Exact-match cache of LLM responses, plugged into LangChain's model cache hook
+
+LangChain hands the cache the serialized prompt messages and a string
+describing the model and its parameters; the key is a SHA-256 of both, so
+a hit needs the same model, settings and rendered messages. Caching is
+opt-in per route (the prompt names in agent_registry) via LLM_CACHE_ROUTES.
+
+Backends:
+    memory   - per-process LRU with TTL (default)
+    postgres - shared llm_response_cache table (migration 0005), survives restarts
+    none     - disabled
+'''
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Sequence
+
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation
+from sqlalchemy import text
+
+from ttl_cache import TTLCache
+import metrics
+
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory").lower()
+LLM_CACHE_ROUTES = {route.strip() for route in os.getenv("LLM_CACHE_ROUTES", "session_name").split(",") if route.strip()}
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+# Only these classes may be rebuilt from stored payloads
+CACHE_PAYLOAD_CLASSES = [ChatGeneration, Generation, AIMessage]
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """Stable key for a model + rendered prompt."""
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+class InMemoryBackend:
+    """Per-process LRU keeping the generation objects themselves."""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl: float = LLM_CACHE_TTL):
+        self._cache = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    def get(self, key: str) -> Optional[Sequence]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: Sequence) -> None:
+        self._cache.set(key, list(value))
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+class PostgresBackend:
+    """
+    Cache rows in llm_response_cache, shared by every worker. Expired rows
+    are ignored on read; beyond max_entries the least recently used rows are
+    removed when new entries are written.
+    """
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl: float = LLM_CACHE_TTL, prune_every: int = 100):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self._writes = 0
+
+    def _session(self):
+        import database
+        return database.SessionLocal()
+
+    def get(self, key: str) -> Optional[Sequence]:
+        db = self._session()
+        try:
+            row = db.execute(
+                text("""
+                UPDATE llm_response_cache SET last_used_at = now()
+                WHERE cache_key = :key AND expires_at > now()
+                RETURNING payload
+                """),
+                {"key": key}
+            ).first()
+            db.commit()
+        finally:
+            db.close()
+        return loads(row.payload, allowed_objects=CACHE_PAYLOAD_CLASSES) if row else None
+
+    def set(self, key: str, value: Sequence) -> None:
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        db = self._session()
+        try:
+            db.execute(
+                text("""
+                INSERT INTO llm_response_cache (cache_key, payload, expires_at)
+                VALUES (:key, :payload, :expires_at)
+                ON CONFLICT (cache_key) DO UPDATE
+                SET payload = EXCLUDED.payload, expires_at = EXCLUDED.expires_at, last_used_at = now()
+                """),
+                {"key": key, "payload": dumps(list(value)), "expires_at": expires_at}
+            )
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                self._prune(db)
+            db.commit()
+        finally:
+            db.close()
+
+    def _prune(self, db) -> None:
+        db.execute(text("DELETE FROM llm_response_cache WHERE expires_at <= now()"))
+        db.execute(
+            text("""
+            DELETE FROM llm_response_cache WHERE cache_key IN (
+                SELECT cache_key FROM llm_response_cache
+                ORDER BY last_used_at DESC
+                OFFSET :max_entries
+            )
+            """),
+            {"max_entries": self.max_entries}
+        )
+
+    def clear(self) -> None:
+        db = self._session()
+        try:
+            db.execute(text("DELETE FROM llm_response_cache"))
+            db.commit()
+        finally:
+            db.close()
+
+class RouteCache(BaseCache):
+    """LangChain cache for one route, counting its own hits and misses over a shared backend."""
+
+    def __init__(self, route: str, backend):
+        self.route = route
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        try:
+            value = self.backend.get(cache_key(prompt, llm_string))
+        except Exception as e:
+            print(f"LLM cache lookup failed for {self.route}: {str(e)}")
+            value = None
+        metrics.record_cache(f"llm_response:{self.route}", value is not None)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        try:
+            self.backend.set(cache_key(prompt, llm_string), return_val)
+        except Exception as e:
+            print(f"LLM cache update failed for {self.route}: {str(e)}")
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if isinstance(self.backend, InMemoryBackend):
+            return self.lookup(prompt, llm_string)
+        return await super().alookup(prompt, llm_string)  # Runs the DB call in the executor
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if isinstance(self.backend, InMemoryBackend):
+            return self.update(prompt, llm_string, return_val)
+        return await super().aupdate(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        self.backend.clear()
+
+def _make_backend():
+    if LLM_CACHE_BACKEND == "postgres":
+        return PostgresBackend()
+    if LLM_CACHE_BACKEND == "memory":
+        return InMemoryBackend()
+    return None
+
+_backend = _make_backend()
+_route_caches: Dict[str, RouteCache] = {}
+
+def get_route_cache(route: str) -> Optional[RouteCache]:
+    """Return the cache for a route, or None if the route has not opted in."""
+    if _backend is None or route not in LLM_CACHE_ROUTES:
+        return None
+    if route not in _route_caches:
+        _route_caches[route] = RouteCache(route, _backend)
+    return _route_caches[route]
+
+def cache_stats() -> dict:
+    """Hit/miss counters per opted-in route."""
+    return {
+        route: {"hits": cache.hits, "misses": cache.misses}
+        for route, cache in _route_caches.items()
+    }
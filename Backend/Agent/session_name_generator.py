@@ -1,5 +1,4 @@
 ''' This file provides a function to generate session names using LangChain and Gemini '''
-import os
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -10,48 +9,24 @@ from pathlib import Path
 env_path = Path(__file__).parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
-# Get API key
-GEMINI_API_KEY = os.getenv("gemini_api_key") or os.getenv("GEMINI_API_KEY")
+from Agent.agent_registry import registry, get_api_key, DEFAULT_MODEL, LLM_PROVIDER
+from Agent.llm_governor import llm_governor
 
-if not GEMINI_API_KEY:
-    raise ValueError("Gemini API key not found in environment variables")
-
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-
-def session_name_generator(topic: str) -> str:
+def session_name_generator(topic: str, model_name: str = DEFAULT_MODEL) -> str:
     """
     Generate a short session name for a given topic
     
     Args:
         topic (str): The topic to generate a name for
+        model_name (str): Gemini model to use
         
     Returns:
         str: A short name for the session
     """
-    # Initialize the LLM
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=GEMINI_API_KEY)
-
-    # Create a prompt template
-    name_generator = PromptTemplate(
-        input_variables=["topic"],
-        template="""Generate a concise and descriptive name (2-4 words) for a session about: {topic}
-
-        Requirements:
-        - Keep it brief and meaningful
-        - Use title case
-        - No special characters or quotes
-        - Should be easily readable
-
-        Example output format:
-        If topic is "machine learning basics", output: "ML Fundamentals"
-        If topic is "cooking italian food", output: "Italian Cuisine Basics"
-        """
-    )
-
-    # Create and run the chain
-    chain = name_generator | llm | StrOutputParser()
-    return chain.invoke({"topic": topic})
-
+    # Checked per call rather than at import, so a missing key fails name generation, not startup
+    if LLM_PROVIDER != "stub" and not get_api_key():
+        raise ValueError("Gemini API key not found in environment variables")
 
+    # Reuse the shared prompt | llm | parser chain, within the shared LLM concurrency budget
+    chain = registry.get_chain("session_name", model_name)
+    return llm_governor.call(lambda: chain.invoke({"topic": topic}))
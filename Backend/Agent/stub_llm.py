@@ -0,0 +1,116 @@
+''' Deterministic local stand-in for the Gemini chat model, for benchmarks and load tests
+
+Selected with LLM_PROVIDER=stub. Replies are built from the prompt, so the
+same input always yields the same text, and are "generated" at a fixed
+pace: STUB_LLM_LATENCY seconds before the first token, then
+STUB_LLM_TOKENS_PER_SEC tokens per second. No network calls are made.
+'''
+import asyncio
+import hashlib
+import os
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+STUB_LLM_LATENCY = float(os.getenv("STUB_LLM_LATENCY", "0.2"))
+STUB_LLM_TOKENS_PER_SEC = float(os.getenv("STUB_LLM_TOKENS_PER_SEC", "50"))
+STUB_LLM_REPLY_TOKENS = int(os.getenv("STUB_LLM_REPLY_TOKENS", "40"))
+
+WORDS = (
+    "the quick answer is that it depends on context so here is a short "
+    "explanation with a few details and an example to make it concrete"
+).split()
+
+class StubChatModel(BaseChatModel):
+    """Chat model that returns canned, prompt-derived replies at a configurable speed."""
+
+    model: str = "stub"
+    latency: float = STUB_LLM_LATENCY
+    tokens_per_sec: float = STUB_LLM_TOKENS_PER_SEC
+    reply_tokens: int = STUB_LLM_REPLY_TOKENS
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model": self.model, "reply_tokens": self.reply_tokens}
+
+    def _reply_tokens(self, messages: List[BaseMessage]) -> List[str]:
+        digest = hashlib.sha256("\x00".join(str(m.content) for m in messages).encode("utf-8")).digest()
+        return [
+            WORDS[digest[i % len(digest)] % len(WORDS)] + ("" if i == self.reply_tokens - 1 else " ")
+            for i in range(self.reply_tokens)
+        ]
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+    def _usage(self, messages: List[BaseMessage]) -> dict:
+        input_tokens = sum(max(1, len(str(m.content)) // 4) for m in messages)
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": self.reply_tokens,
+            "total_tokens": input_tokens + self.reply_tokens,
+        }
+
+    def _result(self, messages: List[BaseMessage], tokens: List[str]) -> ChatResult:
+        message = AIMessage(content="".join(tokens), usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._reply_tokens(messages)
+        time.sleep(self.latency + self._token_delay() * len(tokens))
+        return self._result(messages, tokens)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._reply_tokens(messages)
+        await asyncio.sleep(self.latency + self._token_delay() * len(tokens))
+        return self._result(messages, tokens)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        tokens = self._reply_tokens(messages)
+        for index, token in enumerate(tokens):
+            if index:
+                time.sleep(self._token_delay())
+            usage = self._usage(messages) if index == len(tokens) - 1 else None
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        tokens = self._reply_tokens(messages)
+        for index, token in enumerate(tokens):
+            if index:
+                await asyncio.sleep(self._token_delay())
+            usage = self._usage(messages) if index == len(tokens) - 1 else None
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage))
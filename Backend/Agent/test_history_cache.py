@@ -0,0 +1,47 @@
+''' Tests for the history cache (no database needed) '''
+from Agent.history_cache import HistoryCache
+
+BUDGET, MAX_MESSAGES = 100, 10
+
+def cached(cache: HistoryCache, rows, newest_id):
+    cache.put("s", rows, BUDGET, MAX_MESSAGES, cache.generation("s"), newest_id)
+
+def test_hit_only_while_the_newest_id_matches():
+    cache = HistoryCache(max_bytes=1 << 20)
+    cached(cache, [("human", "hi", 1)], newest_id=7)
+    assert cache.get("s", BUDGET, MAX_MESSAGES, 7) == [("human", "hi", 1)]
+    # Another process wrote to the session
+    assert cache.get("s", BUDGET, MAX_MESSAGES, 9) is None
+    assert cache.stats()["sessions"] == 0
+
+def test_cleared_or_archived_session_is_a_miss():
+    cache = HistoryCache(max_bytes=1 << 20)
+    cached(cache, [("human", "hi", 1)], newest_id=7)
+    assert cache.get("s", BUDGET, MAX_MESSAGES, None) is None
+
+def test_append_extends_the_window_it_follows():
+    cache = HistoryCache(max_bytes=1 << 20)
+    cached(cache, [("human", "hi", 1)], newest_id=7)
+    cache.append("s", [("ai", "hello", 1)], previous_id=7, newest_id=8)
+    assert cache.get("s", BUDGET, MAX_MESSAGES, 8) == [("human", "hi", 1), ("ai", "hello", 1)]
+
+def test_append_after_a_write_elsewhere_drops_the_entry():
+    cache = HistoryCache(max_bytes=1 << 20)
+    cached(cache, [("human", "hi", 1)], newest_id=7)
+    cache.append("s", [("human", "again", 1)], previous_id=8, newest_id=9)
+    assert cache.get("s", BUDGET, MAX_MESSAGES, 9) is None
+
+def test_read_overtaken_by_a_write_is_not_cached():
+    cache = HistoryCache(max_bytes=1 << 20)
+    generation = cache.generation("s")
+    cache.append("s", [("human", "hi", 1)], previous_id=None, newest_id=1)
+    cache.put("s", [], BUDGET, MAX_MESSAGES, generation, None)
+    assert cache.stats()["sessions"] == 0
+
+def test_pruned_generations_do_not_let_old_reads_in():
+    cache = HistoryCache(max_bytes=1 << 20)
+    generation = cache.generation("s")
+    cache.append("s", [("human", "hi", 1)], previous_id=None, newest_id=1)
+    cache.clear()
+    cache.put("s", [], BUDGET, MAX_MESSAGES, generation, None)
+    assert cache.stats()["sessions"] == 0
@@ -0,0 +1,202 @@
+''' Tests for the LLM governor (no model or database needed)
+
+Run from the Backend directory: python -m pytest Agent/test_llm_governor.py
+'''
+import asyncio
+import time
+
+import pytest
+
+from Agent.llm_governor import CLOSED, HALF_OPEN, OPEN, LLMGovernor, LLMUnavailable
+
+class RateLimited(Exception):
+    status_code = 429
+
+def make_governor(**kwargs) -> LLMGovernor:
+    governor = LLMGovernor(**{"latency_target": 60, "queue_timeout": 1, "max_retries": 0, **kwargs})
+    governor._backoff = lambda attempt: 0
+    return governor
+
+async def succeed():
+    return "ok"
+
+async def rate_limited():
+    raise RateLimited("429 RESOURCE_EXHAUSTED")
+
+async def unreachable():
+    raise ConnectionError("connection refused")
+
+def test_limit_is_cut_on_rate_limit_and_creeps_back():
+    governor = make_governor(max_in_flight=10, min_in_flight=2)
+
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(governor.acall(rate_limited))
+    assert governor.limit == 7
+
+    # Additive increase: 1/limit per fast success, so about 7 successes per step
+    for _ in range(8):
+        asyncio.run(governor.acall(succeed))
+    assert governor.limit == 8
+    for _ in range(50):
+        asyncio.run(governor.acall(succeed))
+    assert governor.limit == 10
+
+def test_slow_success_cuts_the_limit_but_not_below_the_minimum():
+    governor = make_governor(max_in_flight=4, min_in_flight=3, latency_target=0)
+    asyncio.run(governor.acall(succeed))
+    assert governor.limit == 3
+    governor._last_decrease = 0.0
+    asyncio.run(governor.acall(succeed))
+    assert governor.limit == 3
+
+def test_exhausted_retries_raise_llm_unavailable():
+    governor = make_governor(max_retries=2, breaker_threshold=10)
+    calls = 0
+
+    async def flaky():
+        nonlocal calls
+        calls += 1
+        raise ConnectionError("reset by peer")
+
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(governor.acall(flaky))
+    assert calls == 3
+    assert governor.retries == 2
+
+def test_bad_requests_are_not_retried_or_wrapped():
+    governor = make_governor(max_retries=2)
+
+    async def bad_request():
+        raise ValueError("invalid argument")
+
+    with pytest.raises(ValueError):
+        asyncio.run(governor.acall(bad_request))
+    assert governor.retries == 0
+    assert governor.stats()["consecutive_failures"] == 0
+
+def test_breaker_half_open_lets_one_probe_through():
+    governor = make_governor(breaker_threshold=2, breaker_cooldown=0.05)
+    for _ in range(2):
+        with pytest.raises(LLMUnavailable):
+            asyncio.run(governor.acall(unreachable))
+    assert governor.stats()["state"] == OPEN
+
+    # Open: calls fail without reaching the model
+    with pytest.raises(LLMUnavailable) as refused:
+        asyncio.run(governor.acall(succeed))
+    assert 0 < refused.value.retry_after <= 1.0
+    time.sleep(0.06)
+
+    async def probe_and_second_call():
+        release = asyncio.Event()
+
+        async def slow_probe():
+            await release.wait()
+            return "probe"
+
+        probe = asyncio.create_task(governor.acall(slow_probe))
+        await asyncio.sleep(0)
+        assert governor.stats()["state"] == HALF_OPEN
+        with pytest.raises(LLMUnavailable):
+            await governor.acall(succeed)  # Only the probe may run while half open
+        release.set()
+        return await probe
+
+    assert asyncio.run(probe_and_second_call()) == "probe"
+    assert governor.stats()["state"] == CLOSED
+    assert asyncio.run(governor.acall(succeed)) == "ok"
+
+def test_failed_probe_reopens_the_breaker():
+    governor = make_governor(breaker_threshold=1, breaker_cooldown=0.05)
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(governor.acall(unreachable))
+    time.sleep(0.06)
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(governor.acall(unreachable))
+    assert governor.stats()["state"] == OPEN
+
+def test_cancelled_callers_release_their_slots():
+    governor = make_governor(max_in_flight=1, min_in_flight=1)
+
+    async def scenario():
+        hold = asyncio.Event()
+
+        async def blocked():
+            await hold.wait()
+
+        running = asyncio.create_task(governor.acall(blocked))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(governor.acall(succeed))
+        await asyncio.sleep(0)
+        assert governor.stats()["in_flight"] == 1
+        assert governor.stats()["waiting"] == 1
+
+        queued.cancel()
+        running.cancel()
+        await asyncio.gather(running, queued, return_exceptions=True)
+        assert governor.stats()["in_flight"] == 0
+        assert governor.stats()["waiting"] == 0
+        return await governor.acall(succeed)
+
+    assert asyncio.run(scenario()) == "ok"
+
+def test_queued_caller_gets_the_slot_when_it_is_released():
+    governor = make_governor(max_in_flight=1, min_in_flight=1)
+
+    async def scenario():
+        hold = asyncio.Event()
+
+        async def blocked():
+            await hold.wait()
+            return "first"
+
+        first = asyncio.create_task(governor.acall(blocked))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(governor.acall(succeed))
+        await asyncio.sleep(0)
+        hold.set()
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(scenario()) == ["first", "ok"]
+    assert governor.stats()["in_flight"] == 0
+
+def test_astream_retries_before_the_first_chunk():
+    governor = make_governor(max_retries=1, breaker_threshold=10)
+    attempts = 0
+
+    async def stream():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise ConnectionError("connection reset")
+        for chunk in ("a", "b", "c"):
+            yield chunk
+
+    async def collect():
+        return [chunk async for chunk in governor.astream(stream)]
+
+    assert asyncio.run(collect()) == ["a", "b", "c"]
+    assert attempts == 2
+    assert governor.retries == 1
+    assert governor.stats()["in_flight"] == 0
+
+def test_astream_does_not_retry_after_output():
+    governor = make_governor(max_retries=3, breaker_threshold=10)
+    attempts = 0
+
+    async def stream():
+        nonlocal attempts
+        attempts += 1
+        yield "partial"
+        raise ConnectionError("connection reset")
+
+    async def collect(chunks):
+        async for chunk in governor.astream(stream):
+            chunks.append(chunk)
+
+    chunks = []
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(collect(chunks))
+    assert chunks == ["partial"]
+    assert attempts == 1
+    assert governor.stats()["in_flight"] == 0
@@ -0,0 +1,66 @@
+''' Micro-benchmark: per-request agent setup cost, rebuilt every call vs. served from the registry
+
+Run from the Backend directory:
+    python benchmarks/bench_agent_setup.py --iterations 50
+
+No network calls are made; only client, prompt and chain construction is timed.
+'''
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("gemini_api_key", "benchmark-placeholder-key")
+
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnablePassthrough
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from Agent.agent_registry import AgentRegistry, DEFAULT_MODEL
+
+def legacy_setup():
+    """What initialize_agent used to do on every POST /chat."""
+    llm = ChatGoogleGenerativeAI(model=DEFAULT_MODEL, google_api_key=os.environ["gemini_api_key"])
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", "You are a helpful assistant who remembers previous conversations."),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("human", "{input}")
+    ])
+    return (
+        {"chat_history": lambda _: [], "input": RunnablePassthrough()}
+        | prompt
+        | llm
+    )
+
+def time_calls(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def report(label: str, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<28} mean={statistics.mean(samples):9.3f} ms  p50={statistics.median(samples):9.3f} ms  p95={p95:9.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    registry = AgentRegistry()
+    start = time.perf_counter()
+    registry.warm()
+    warm_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Per-request setup over {args.iterations} iterations")
+    report("before (rebuild per call)", time_calls(legacy_setup, args.iterations))
+    report("after (registry lookup)", time_calls(lambda: registry.get_chain("chat"), args.iterations))
+    print(f"one-time registry warm-up: {warm_ms:.3f} ms")
+
+if __name__ == "__main__":
+    main()
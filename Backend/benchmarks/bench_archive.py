@@ -0,0 +1,155 @@
+''' Benchmark: storage saved by the session archive and rehydration latency
+
+Seeds --sessions sessions of --messages messages each into chats_2, all
+idle for longer than the archive threshold, then:
+
+    - archives them with crud/archive_crud.py, timing the pass;
+    - compares the rows' size in chats_2 (heap tuples, after Postgres' own
+      TOAST compression) with the size of their chats_archive rows;
+    - rehydrates --samples of them, as the first read of an archived
+      session does, and reports the latency percentiles.
+
+Message text is random words from a fixed vocabulary, so it compresses
+roughly like chat text rather than like repeated strings. Run from the
+Backend directory against a disposable database:
+
+    python benchmarks/bench_archive.py --sessions 200 --messages 500 --level 9
+
+Results are printed as JSON; the seeded rows are removed afterwards.
+'''
+import argparse
+import json
+import os
+import random
+import statistics
+import string
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert, text
+
+import database
+import models
+from crud import archive_crud
+
+EMAIL_DOMAIN = "archivebench.invalid"
+
+def seed(sessions: int, messages: int, message_words: int, rng: random.Random):
+    vocabulary = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10))) for _ in range(5000)]
+    created = datetime.now(timezone.utc) - timedelta(days=365)
+    tokens = [str(uuid.uuid4()) for _ in range(sessions)]
+    with database.engine.begin() as conn:
+        user_id = conn.execute(
+            insert(models.User).returning(models.User.id),
+            {"name": "archive bench", "email": f"{uuid.uuid4().hex[:8]}@{EMAIL_DOMAIN}", "password": "bench"}
+        ).scalar_one()
+        conn.execute(insert(models.SessionModel), [{"user_id": user_id, "session_token": token} for token in tokens])
+        for token in tokens:
+            rows = []
+            for index in range(messages):
+                words = rng.randint(message_words // 4, message_words * 2)
+                content = " ".join(rng.choices(vocabulary, k=words))
+                rows.append({
+                    "session_id": token,
+                    "messages": content,
+                    "sender": "human" if index % 2 == 0 else "ai",
+                    "token_count": len(content) // 4,
+                    "created_at": created + timedelta(seconds=index),
+                })
+            conn.execute(insert(models.ChatModel), rows)
+    return user_id, tokens
+
+def cleanup(user_id: int, tokens) -> None:
+    with database.engine.begin() as conn:
+        conn.execute(text("DELETE FROM chats_2 WHERE session_id = ANY(:tokens)"), {"tokens": tokens})
+        conn.execute(text("DELETE FROM chats_archive WHERE session_id = ANY(:tokens)"), {"tokens": tokens})
+        conn.execute(text('DELETE FROM "Session" WHERE user_id = :user_id'), {"user_id": user_id})
+        conn.execute(text('DELETE FROM "User" WHERE id = :user_id'), {"user_id": user_id})
+
+def hot_bytes(tokens) -> dict:
+    with database.engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT COUNT(*) AS rows, SUM(pg_column_size(c.*)) AS tuple_bytes, SUM(octet_length(c.messages)) AS text_bytes
+            FROM chats_2 c WHERE c.session_id = ANY(:tokens)
+        """), {"tokens": tokens}).one()
+    return dict(row._mapping)
+
+def archived_bytes(tokens) -> dict:
+    with database.engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT COUNT(*) AS sessions, SUM(pg_column_size(a.*)) AS tuple_bytes,
+                   SUM(raw_bytes) AS raw_bytes, SUM(compressed_bytes) AS compressed_bytes
+            FROM chats_archive a WHERE a.session_id = ANY(:tokens)
+        """), {"tokens": tokens}).one()
+    return dict(row._mapping)
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=500, help="Messages per session")
+    parser.add_argument("--message-words", type=int, default=40, help="Typical words per message")
+    parser.add_argument("--level", type=int, default=archive_crud.ARCHIVE_ZSTD_LEVEL, help="zstd level")
+    parser.add_argument("--samples", type=int, default=50, help="Sessions to rehydrate")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"Seeding {args.sessions} sessions x {args.messages} messages...", file=sys.stderr)
+    user_id, tokens = seed(args.sessions, args.messages, args.message_words, rng)
+    try:
+        hot = hot_bytes(tokens)
+        cutoff = datetime.now(timezone.utc) - timedelta(days=1)
+
+        db = database.SessionLocal()
+        try:
+            started = time.perf_counter()
+            for token in tokens:
+                archive_crud.archive_session(db, token, cutoff, level=args.level)
+            archive_seconds = time.perf_counter() - started
+            archived = archived_bytes(tokens)
+
+            latencies = []
+            sampled = rng.sample(tokens, min(args.samples, len(tokens)))
+            for token in sampled:
+                started = time.perf_counter()
+                archive_crud.rehydrate_session(db, token)
+                latencies.append((time.perf_counter() - started) * 1000)
+            # Reading them again pays only the check on a session that is not archived
+            checks = []
+            for token in sampled:
+                started = time.perf_counter()
+                archive_crud.rehydrate_session(db, token)
+                db.rollback()
+                checks.append((time.perf_counter() - started) * 1000)
+        finally:
+            db.close()
+    finally:
+        cleanup(user_id, tokens)
+
+    result = {
+        "config": {"sessions": args.sessions, "messages": args.messages, "message_words": args.message_words, "zstd_level": args.level},
+        "hot": hot,
+        "archive": archived,
+        "bytes_saved": hot["tuple_bytes"] - archived["tuple_bytes"],
+        "tuple_ratio": round(hot["tuple_bytes"] / archived["tuple_bytes"], 2),
+        "archive_sessions_per_s": round(args.sessions / archive_seconds, 1),
+        "rehydrate_ms": {
+            "p50": round(percentile(latencies, 0.50), 2),
+            "p95": round(percentile(latencies, 0.95), 2),
+            "p99": round(percentile(latencies, 0.99), 2),
+            "mean": round(statistics.mean(latencies), 2),
+        },
+        "not_archived_check_ms": {"p50": round(percentile(checks, 0.50), 3), "p95": round(percentile(checks, 0.95), 3)},
+    }
+    print(json.dumps(result, indent=2, default=int))
+
+if __name__ == "__main__":
+    main()
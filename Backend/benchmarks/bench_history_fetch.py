@@ -0,0 +1,138 @@
+''' Benchmark: history-fetch latency on chats_2 layouts at scale
+
+Builds three copies of a synthetic chats_2 in a scratch schema and times
+the two history reads the app issues (the token-budgeted prompt window and
+the newest page of GET /chat/{token}) for random sessions:
+
+    single     - the old layout: primary key on id, separate index on session_id
+    covering   - (session_id, id) INCLUDE (sender, token_count), migration 0003
+    hash       - hash-partitioned by session_id, see migrations/partition_chats.py
+
+Run from the Backend directory against a disposable database:
+    python benchmarks/bench_history_fetch.py --rows 10000000 --sessions 100000
+
+Results are printed as JSON. Pass --keep to reuse the seeded schema on the next run.
+'''
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Agent')))
+
+from sqlalchemy import text
+
+import database
+from custom_chat_history import CustomChatMessageHistory, CHAT_HISTORY_MAX_MESSAGES, CHAT_HISTORY_TOKEN_BUDGET
+
+SCHEMA = "bench_history"
+VARIANTS = ["single", "covering", "hash"]
+
+COLUMNS = """
+    id INTEGER NOT NULL,
+    session_id VARCHAR(255) NOT NULL,
+    messages TEXT NOT NULL,
+    sender VARCHAR(10) NOT NULL,
+    token_count INTEGER
+"""
+
+def seed(conn, rows: int, sessions: int, partitions: int) -> None:
+    print(f"Seeding {rows} rows over {sessions} sessions...", file=sys.stderr)
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+
+    conn.execute(text(f"CREATE TABLE {SCHEMA}.chats_single ({COLUMNS}, PRIMARY KEY (id))"))
+    # Rows of one session are spread across the table, as they are in production
+    conn.execute(text(f"""
+        INSERT INTO {SCHEMA}.chats_single (id, session_id, messages, sender, token_count)
+        SELECT g, 's' || (g % :sessions), repeat(md5(g::text), 1 + g % 12),
+               CASE WHEN g % 2 = 0 THEN 'human' ELSE 'ai' END, 8 * (1 + g % 12)
+        FROM generate_series(1, :rows) g
+    """), {"sessions": sessions, "rows": rows})
+    conn.execute(text(f"CREATE INDEX ON {SCHEMA}.chats_single (id)"))
+    conn.execute(text(f"CREATE INDEX ON {SCHEMA}.chats_single (session_id)"))
+
+    conn.execute(text(f"CREATE TABLE {SCHEMA}.chats_covering ({COLUMNS}, PRIMARY KEY (id))"))
+    conn.execute(text(f"INSERT INTO {SCHEMA}.chats_covering SELECT * FROM {SCHEMA}.chats_single"))
+    conn.execute(text(
+        f"CREATE INDEX ON {SCHEMA}.chats_covering (session_id, id) INCLUDE (sender, token_count)"
+    ))
+
+    conn.execute(text(
+        f"CREATE TABLE {SCHEMA}.chats_hash ({COLUMNS}, PRIMARY KEY (session_id, id) INCLUDE (sender, token_count)) "
+        f"PARTITION BY HASH (session_id)"
+    ))
+    for remainder in range(partitions):
+        conn.execute(text(
+            f"CREATE TABLE {SCHEMA}.chats_hash_p{remainder} PARTITION OF {SCHEMA}.chats_hash "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        ))
+    conn.execute(text(f"INSERT INTO {SCHEMA}.chats_hash SELECT * FROM {SCHEMA}.chats_single"))
+
+    for variant in VARIANTS:
+        conn.execute(text(f"VACUUM ANALYZE {SCHEMA}.chats_{variant}"))
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def time_query(conn, query, params_for, session_ids) -> dict:
+    samples = []
+    for session_id in session_ids:
+        start = time.perf_counter()
+        conn.execute(query, params_for(session_id)).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(percentile(samples, 0.95), 3),
+        "p99_ms": round(percentile(samples, 0.99), 3),
+        "mean_ms": round(statistics.mean(samples), 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="History-fetch latency by chats_2 layout")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--keep", action="store_true", help="Reuse an existing seeded schema")
+    args = parser.parse_args()
+
+    engine = database.engine.execution_options(isolation_level="AUTOCOMMIT")
+    with engine.connect() as conn:
+        exists = conn.execute(text("SELECT to_regclass(:t)"), {"t": f"{SCHEMA}.chats_hash"}).scalar()
+        if not (args.keep and exists):
+            seed(conn, args.rows, args.sessions, args.partitions)
+
+        rng = random.Random(42)
+        session_ids = [f"s{rng.randrange(args.sessions)}" for _ in range(args.queries)]
+        results = {"rows": args.rows, "sessions": args.sessions, "queries": args.queries, "variants": {}}
+
+        for variant in VARIANTS:
+            table = f"{SCHEMA}.chats_{variant}"
+            window_query = CustomChatMessageHistory(None, table, "")._select_query()
+            page_query = text(
+                f"SELECT id, sender, messages FROM {table} WHERE session_id = :session_id ORDER BY id DESC LIMIT 51"
+            )
+            # Warm the cache once so every variant is measured the same way
+            time_query(conn, page_query, lambda s: {"session_id": s}, session_ids[:50])
+            results["variants"][variant] = {
+                "prompt_window": time_query(conn, window_query, lambda s: {
+                    "session_id": s,
+                    "max_messages": CHAT_HISTORY_MAX_MESSAGES,
+                    "token_budget": CHAT_HISTORY_TOKEN_BUDGET,
+                }, session_ids),
+                "latest_page": time_query(conn, page_query, lambda s: {"session_id": s}, session_ids),
+            }
+
+        if not args.keep:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+''' Benchmark: full-text search latency over millions of messages
+
+Seeds --messages messages into chats_2, spread over --users users with
+--sessions sessions each, plus one heavy user with --heavy-messages,
+generated inside Postgres so millions of rows load in minutes. Words are
+drawn from a fixed vocabulary with a skewed (log-uniform) distribution, so
+some terms are in most messages and others in a handful. Then, for
+--samples typical users and for the heavy user, it times:
+
+    - search_crud.search_messages (ranked and highlighted) for a common
+      term, a rare term, two terms and a phrase, and the pages after the
+      first when following the cursor on the most common term;
+    - the unindexed alternative: ILIKE '%term%' over the user's messages.
+
+It also times inserting --insert-rows messages into copies of chats_2 with
+and without the search_vector column, its trigger and its GIN index, which
+is what search adds to every chat write, and reports the size of the index.
+Run from the Backend directory against a disposable database:
+
+    python benchmarks/bench_search.py --messages 2000000 --users 2000 --samples 200
+
+Results are printed as JSON. The seeded rows are removed afterwards unless
+--keep is given.
+'''
+import argparse
+import json
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+
+import database
+from crud import search_crud
+
+EMAIL_DOMAIN = "searchbench.invalid"
+SEED_BATCH_USERS = 100
+
+_INSERT_MESSAGES = text("""
+INSERT INTO chats_2 (session_id, messages, sender, token_count, created_at)
+SELECT s.session_token,
+       -- Refers to m, so the words are drawn again for every message
+       (SELECT string_agg((CAST(:vocabulary AS TEXT[]))[1 + floor(power(:size, random()))::int % :size], ' ')
+        FROM generate_series(1, 6 + (m % 40))),
+       CASE WHEN m % 2 = 0 THEN 'human' ELSE 'ai' END,
+       NULL,
+       now() - make_interval(mins => m)
+FROM "Session" s, generate_series(1, :per_session) m
+WHERE s.user_id = ANY(:user_ids)
+""")
+
+def make_vocabulary(size: int, rng: random.Random):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+def seed_users(conn, count: int, sessions: int, per_session: int, vocabulary, prefix: str = "") -> list:
+    user_ids = conn.execute(
+        text("""
+        INSERT INTO "User" (id, name, password, email)
+        SELECT nextval('user_id_seq'), 'search bench', 'bench', :prefix || md5(random()::text || g) || :domain
+        FROM generate_series(1, :count) g
+        RETURNING id
+        """),
+        {"count": count, "prefix": prefix, "domain": f"@{EMAIL_DOMAIN}"}
+    ).scalars().all()
+    conn.execute(
+        text("""
+        INSERT INTO "Session" (id, user_id, session_token, session_short_name)
+        SELECT nextval('session_id_seq'), u, gen_random_uuid()::text, NULL
+        FROM unnest(CAST(:user_ids AS INTEGER[])) u, generate_series(1, :sessions)
+        """),
+        {"user_ids": user_ids, "sessions": sessions}
+    )
+    conn.execute(
+        _INSERT_MESSAGES,
+        {"vocabulary": vocabulary, "size": len(vocabulary), "per_session": per_session, "user_ids": user_ids}
+    )
+    return user_ids
+
+def seed(users: int, sessions: int, messages: int, heavy_messages: int, vocabulary) -> None:
+    per_session = max(1, messages // (users * sessions))
+    for first in range(0, users, SEED_BATCH_USERS):
+        with database.engine.begin() as conn:
+            seed_users(conn, min(SEED_BATCH_USERS, users - first), sessions, per_session, vocabulary)
+        print(f"Seeded {(first + SEED_BATCH_USERS) * sessions * per_session} messages", file=sys.stderr)
+    if heavy_messages:
+        with database.engine.begin() as conn:
+            seed_users(conn, 1, sessions, max(1, heavy_messages // sessions), vocabulary, prefix="heavy.")
+    # As autovacuum would: flushes the GIN pending list and refreshes the planner's statistics
+    with database.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE chats_2"))
+        conn.execute(text('VACUUM ANALYZE "Session"'))
+
+def cleanup() -> None:
+    with database.engine.begin() as conn:
+        conn.execute(text("""
+            DELETE FROM chats_2 c USING "Session" s, "User" u
+            WHERE c.session_id = s.session_token AND s.user_id = u.id AND u.email LIKE :pattern
+        """), {"pattern": f"%@{EMAIL_DOMAIN}"})
+        conn.execute(text("""
+            DELETE FROM "Session" s USING "User" u WHERE s.user_id = u.id AND u.email LIKE :pattern
+        """), {"pattern": f"%@{EMAIL_DOMAIN}"})
+        conn.execute(text('DELETE FROM "User" WHERE email LIKE :pattern'), {"pattern": f"%@{EMAIL_DOMAIN}"})
+
+def bench_users():
+    """(typical user ids, heavy user id or None) of the seeded users."""
+    with database.engine.connect() as conn:
+        rows = conn.execute(
+            text('SELECT id, email FROM "User" WHERE email LIKE :pattern'), {"pattern": f"%@{EMAIL_DOMAIN}"}
+        ).all()
+    heavy = [user_id for user_id, email in rows if email.startswith("heavy.")]
+    return [user_id for user_id, email in rows if not email.startswith("heavy.")], (heavy[0] if heavy else None)
+
+def insert_cost(vocabulary, rows: int, rng: random.Random) -> dict:
+    """Microseconds per message inserted, with and without the search column and index."""
+    messages = [
+        {"session_id": "bench", "messages": " ".join(rng.choices(vocabulary[:5000], k=rng.randint(6, 45))), "sender": "human"}
+        for _ in range(rows)
+    ]
+    result = {}
+    with database.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, drop_search in (("with_search_us", False), ("without_search_us", True)):
+            conn.execute(text("DROP TABLE IF EXISTS search_bench_insert"))
+            conn.execute(text("CREATE TABLE search_bench_insert (LIKE chats_2 INCLUDING ALL)"))
+            if drop_search:
+                conn.execute(text("ALTER TABLE search_bench_insert DROP COLUMN search_vector"))
+            else:
+                # LIKE copies the column and its GIN index but not the trigger that fills it
+                conn.execute(text("""
+                    CREATE TRIGGER search_bench_insert_vector BEFORE INSERT ON search_bench_insert FOR EACH ROW
+                    EXECUTE FUNCTION tsvector_update_trigger(search_vector, 'pg_catalog.english', messages)
+                """))
+            try:
+                started = time.perf_counter()
+                for first in range(0, rows, 500):
+                    conn.execute(
+                        text("INSERT INTO search_bench_insert (session_id, messages, sender) VALUES (:session_id, :messages, :sender)"),
+                        messages[first:first + 500]
+                    )
+                result[name] = round((time.perf_counter() - started) / rows * 1_000_000, 1)
+            finally:
+                conn.execute(text("DROP TABLE search_bench_insert"))
+    result["overhead"] = round(result["with_search_us"] / result["without_search_us"], 2)
+    return result
+
+def sample_phrase(db, user_id: int, rng: random.Random) -> str:
+    message = db.execute(text("""
+        SELECT c.messages FROM chats_2 c JOIN "Session" s ON s.session_token = c.session_id
+        WHERE s.user_id = :user_id ORDER BY c.id LIMIT 1 OFFSET :offset
+    """), {"user_id": user_id, "offset": rng.randint(0, 50)}).scalar()
+    words = message.split()
+    start = rng.randint(0, max(0, len(words) - 2))
+    return '"' + " ".join(words[start:start + 2]) + '"'
+
+def ilike_page(db, user_id: int, term: str, limit: int):
+    return db.execute(text("""
+        SELECT c.id FROM chats_2 c JOIN "Session" s ON s.session_token = c.session_id
+        WHERE s.user_id = :user_id AND s.deleted_at IS NULL AND c.messages ILIKE :pattern
+        ORDER BY c.id DESC LIMIT :limit
+    """), {"user_id": user_id, "pattern": f"%{term}%", "limit": limit}).all()
+
+def summarize(samples) -> dict:
+    ordered = sorted(samples)
+    def percentile(fraction):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 2)
+    return {"p50": percentile(0.50), "p95": percentile(0.95), "p99": percentile(0.99), "mean": round(statistics.mean(ordered), 2)}
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - started) * 1000, result
+
+def bench_searches(db, user_ids, vocabulary, rng: random.Random, limit: int, depth: int) -> dict:
+    # Low indexes of the vocabulary are drawn most often (see _INSERT_MESSAGES)
+    terms = {
+        "common": lambda: vocabulary[rng.randint(1, 3)],
+        "rare": lambda: vocabulary[rng.randint(len(vocabulary) // 2, len(vocabulary) - 1)],
+        "two_terms": lambda: f"{vocabulary[rng.randint(1, 20)]} {vocabulary[rng.randint(20, 2000)]}",
+    }
+    timings = {name: [] for name in list(terms) + ["phrase", "next_pages", "ilike_common", "ilike_rare"]}
+    hits = {name: [] for name in timings}
+    for user_id in user_ids:
+        queries = {name: make() for name, make in terms.items()}
+        queries["phrase"] = sample_phrase(db, user_id, rng)
+        for name, query in queries.items():
+            elapsed, (page, _) = timed(lambda: search_crud.search_messages(db, user_id, query, limit))
+            db.rollback()
+            timings[name].append(elapsed)
+            hits[name].append(len(page))
+
+        page, cursor = search_crud.search_messages(db, user_id, vocabulary[1], limit)
+        for _ in range(depth - 1):
+            if cursor is None:
+                break
+            elapsed, (page, cursor) = timed(lambda: search_crud.search_messages(db, user_id, vocabulary[1], limit, cursor))
+            timings["next_pages"].append(elapsed)
+            hits["next_pages"].append(len(page))
+        db.rollback()
+
+        for name in ("common", "rare"):
+            term = queries[name]
+            elapsed, rows = timed(lambda: ilike_page(db, user_id, term, limit))
+            db.rollback()
+            timings[f"ilike_{name}"].append(elapsed)
+            hits[f"ilike_{name}"].append(len(rows))
+    return {
+        "search_ms": {name: summarize(samples) for name, samples in timings.items() if samples},
+        "mean_hits_per_page": {name: round(statistics.mean(counts), 1) for name, counts in hits.items() if counts},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=10, help="Sessions per user")
+    parser.add_argument("--heavy-messages", type=int, default=200_000, help="Messages of the heavy user (0 for none)")
+    parser.add_argument("--vocabulary", type=int, default=50_000, help="Distinct words")
+    parser.add_argument("--samples", type=int, default=200, help="Typical users searched")
+    parser.add_argument("--heavy-samples", type=int, default=20, help="Searches of the heavy user, per query kind")
+    parser.add_argument("--limit", type=int, default=search_crud.SEARCH_PAGE_DEFAULT_LIMIT)
+    parser.add_argument("--depth", type=int, default=5, help="Pages to follow on the most common term")
+    parser.add_argument("--insert-rows", type=int, default=20_000)
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded rows for another run (reused if present)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(args.vocabulary, rng)
+    user_ids, heavy_user_id = bench_users()
+    if not user_ids:
+        print(f"Seeding {args.messages} + {args.heavy_messages} messages...", file=sys.stderr)
+        seed(args.users, args.sessions, args.messages, args.heavy_messages, vocabulary)
+        user_ids, heavy_user_id = bench_users()
+
+    db = database.SessionLocal()
+    try:
+        typical = bench_searches(db, rng.sample(user_ids, min(args.samples, len(user_ids))), vocabulary, rng, args.limit, args.depth)
+        heavy = None
+        if heavy_user_id is not None:
+            heavy = bench_searches(db, [heavy_user_id] * args.heavy_samples, vocabulary, rng, args.limit, args.depth)
+        sizes = db.execute(text("""
+            SELECT COUNT(*) AS messages,
+                   (SELECT SUM(pg_relation_size(relid)) FROM pg_partition_tree('chats_2')) AS heap_bytes,
+                   (SELECT SUM(pg_relation_size(relid)) FROM pg_partition_tree('ix_chats_2_search_vector')) AS gin_index_bytes
+            FROM chats_2
+        """)).one()
+    finally:
+        db.close()
+        if not args.keep:
+            cleanup()
+
+    result = {
+        "config": {
+            "users": len(user_ids), "sessions_per_user": args.sessions, "heavy_messages": args.heavy_messages,
+            "vocabulary": args.vocabulary, "limit": args.limit
+        },
+        "table": dict(sizes._mapping),
+        "insert_per_message": insert_cost(vocabulary, args.insert_rows, rng),
+        "typical_user": typical,
+        "heavy_user": heavy,
+    }
+    print(json.dumps(result, indent=2, default=int))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+''' Benchmark: CPU cost of turning history rows into a response body
+
+Compares, on synthetic (id, sender, messages) rows shaped like chats_2:
+
+    pydantic  - the old path: a ChatMessage per row, a ChatResponse, then
+                FastAPI's response_model validation and serialization
+    orjson    - the fast path of GET /chat/{token}: rows to JSON bytes
+                (crud/chat_crud.py, fast_json.py)
+
+and the cost of gzip / brotli on the resulting body. No database needed;
+run from the Backend directory:
+
+    python benchmarks/bench_serialization.py --rows 50,200,2000 --message-chars 400
+
+Results are printed as JSON, in microseconds per response.
+'''
+import argparse
+import asyncio
+import json
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+import fast_json
+from crud.chat_crud import _encode_messages
+from schemas.chat_schemas import ChatMessage, ChatResponse
+
+def make_rows(count: int, message_chars: int, rng: random.Random):
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(500)]
+    rows = []
+    for index in range(count):
+        text = ""
+        while len(text) < message_chars:
+            text += rng.choice(words) + " "
+        rows.append((1_000_000 - index, "human" if index % 2 else "ai", text.strip()))
+    return rows
+
+# The response_model field FastAPI builds for GET /chat/{token}
+RESPONSE_FIELD = create_model_field(name="Response_get_chat", type_=ChatResponse, mode="serialization")
+
+def pydantic_body(rows, loop) -> bytes:
+    messages = [ChatMessage(id=row_id, sender=sender, messages=messages) for row_id, sender, messages in rows if messages and sender]
+    response = ChatResponse(messages=messages, next_cursor=rows[-1][0])
+    # What FastAPI then does with it: validate against response_model, then JSONResponse.render
+    content = loop.run_until_complete(serialize_response(field=RESPONSE_FIELD, response_content=response))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+def orjson_body(rows) -> bytes:
+    return b'{"messages":[' + _encode_messages(rows) + b'],"next_cursor":' + fast_json.dumps(rows[-1][0]) + b"}"
+
+def time_per_call(fn, min_seconds: float) -> float:
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return elapsed / calls * 1_000_000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="50,200,2000", help="Comma-separated page sizes")
+    parser.add_argument("--message-chars", type=int, default=400)
+    parser.add_argument("--min-seconds", type=float, default=1.0, help="Time spent per measurement")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    loop = asyncio.new_event_loop()
+    results = []
+    for count in (int(value) for value in args.rows.split(",")):
+        rows = make_rows(count, args.message_chars, rng)
+        body = orjson_body(rows)
+        assert json.loads(body) == json.loads(pydantic_body(rows, loop)), "fast path output differs"
+        result = {
+            "rows": count,
+            "body_bytes": len(body),
+            "pydantic_us": round(time_per_call(lambda: pydantic_body(rows, loop), args.min_seconds), 1),
+            "orjson_us": round(time_per_call(lambda: orjson_body(rows), args.min_seconds), 1),
+        }
+        result["speedup"] = round(result["pydantic_us"] / result["orjson_us"], 1)
+        for encoding in fast_json.SUPPORTED_ENCODINGS:
+            compressed = fast_json.compress(body, encoding)
+            result[f"{encoding}_bytes"] = len(compressed)
+            result[f"{encoding}_us"] = round(time_per_call(lambda: fast_json.compress(body, encoding), args.min_seconds), 1)
+        results.append(result)
+    print(json.dumps({"message_chars": args.message_chars, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+''' Import and startup time of the API, measured in fresh interpreters
+
+Three numbers, each over --runs fresh processes:
+
+    - import: wall time of `import main` (no server, no database work);
+    - live: spawn of a uvicorn process until GET /health/live answers;
+    - ready: spawn until GET /health/ready answers 200 (migrations applied,
+      LLM clients built, workers started).
+
+The server runs with LLM_PROVIDER=stub so no Gemini calls are made; with
+--background it also runs with STARTUP_IN_BACKGROUND, so "live" no longer
+waits for the startup steps (startup.py). The slowest imports are listed
+from `python -X importtime`, to show where import time goes. Run from the
+Backend directory:
+
+    python benchmarks/bench_startup.py --runs 5 --output startup.json
+    python benchmarks/bench_startup.py --baseline startup.json --tolerance 0.2
+
+With --baseline the run exits non-zero when any median is more than
+--tolerance slower than in the baseline.
+'''
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+def server_env(background: bool = False) -> dict:
+    env = dict(os.environ, LLM_PROVIDER="stub")
+    if background:
+        env["STARTUP_IN_BACKGROUND"] = "true"
+    env.setdefault("gemini_api_key", "bench-placeholder-key")
+    return env
+
+def time_import() -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=BACKEND_DIR, env=server_env(), capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def slowest_imports(count: int):
+    """Top-level packages by cumulative import time of `import main`, in ms."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=server_env(), capture_output=True, text=True, check=True
+    ).stderr
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Modules imported directly by main are indented by two spaces
+        name = name[1:]
+        if name.startswith("   ") or not name.startswith("  "):
+            continue
+        try:
+            totals[name.strip()] = int(cumulative) / 1000
+        except ValueError:
+            continue  # Header line
+    return [{"module": name, "ms": round(ms, 1)} for name, ms in sorted(totals.items(), key=lambda item: -item[1])[:count]]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def time_server_start(timeout: float, background: bool):
+    """Seconds from spawning uvicorn until /health/live and until /health/ready answer."""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=server_env(background)
+    )
+    live = ready = None
+    try:
+        deadline = started + timeout
+        while ready is None and time.perf_counter() < deadline:
+            try:
+                if live is None and httpx.get(f"{base_url}/health/live", timeout=1.0).status_code == 200:
+                    live = time.perf_counter() - started
+                if live is not None and httpx.get(f"{base_url}/health/ready", timeout=1.0).status_code == 200:
+                    ready = time.perf_counter() - started
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    if ready is None:
+        raise RuntimeError(f"Server did not become ready within {timeout:.0f}s")
+    return live, ready
+
+def summarize(samples):
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+def compare(result: dict, baseline: dict, tolerance: float):
+    regressions = []
+    for name, current in result["timings"].items():
+        before = baseline.get("timings", {}).get(name)
+        if before and current["median_ms"] > before["median_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: median {current['median_ms']}ms vs {before['median_ms']}ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-server", action="store_true", help="Only time `import main`")
+    parser.add_argument("--background", action="store_true", help="Start the server with STARTUP_IN_BACKGROUND")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for readiness")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    parser.add_argument("--baseline", help="JSON result of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed median slowdown vs. the baseline")
+    args = parser.parse_args()
+
+    imports, lives, readies = [], [], []
+    for _ in range(args.runs):
+        imports.append(time_import())
+        if not args.skip_server:
+            live, ready = time_server_start(args.timeout, args.background)
+            lives.append(live)
+            readies.append(ready)
+
+    timings = {"import": summarize(imports)}
+    if lives:
+        timings["live"] = summarize(lives)
+        timings["ready"] = summarize(readies)
+    result = {"runs": args.runs, "timings": timings, "slowest_imports": slowest_imports(args.top)}
+
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
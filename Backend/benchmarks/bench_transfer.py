@@ -0,0 +1,239 @@
+''' Benchmark: NDJSON bulk import (COPY) and streaming export
+
+Writes a synthetic export of --sessions sessions plus one session of
+--big-session messages (--messages in total) and then:
+
+    - imports it with crud/transfer_crud.py (COPY), timing messages/s;
+    - inserts --baseline-messages of the same messages one INSERT per row,
+      as the chat write path does, for comparison;
+    - exports the imported user through the server-side cursor, timing it,
+      and compares the peak Python memory of the export (tracemalloc) with
+      loading each session's history whole, as calling GET /chat/{token}
+      for every session did;
+    - checks that the export matches the file that was imported.
+
+Run from the Backend directory against a disposable database:
+
+    python benchmarks/bench_transfer.py --messages 500000 --sessions 500 --big-session 100000
+
+Results are printed as JSON; the seeded rows are removed afterwards.
+'''
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import orjson
+from sqlalchemy import insert, text
+
+import database
+import fast_json
+import models
+from crud import transfer_crud
+
+EMAIL_DOMAIN = "transferbench.invalid"
+
+def write_export(path: str, sessions: int, messages: int, big_session: int, rng: random.Random) -> None:
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(2000)]
+    started = datetime.now(timezone.utc) - timedelta(days=30)
+    per_session = max(1, (messages - big_session) // sessions)
+    sizes = [big_session] + [per_session] * sessions
+    with open(path, "wb") as output:
+        for index, size in enumerate(sizes):
+            token = str(uuid.uuid4())
+            output.write(fast_json.dumps({
+                "type": "session", "session_token": token, "session_short_name": f"Bench {index}",
+                "created_at": started,
+            }) + b"\n")
+            for number in range(size):
+                content = " ".join(rng.choices(words, k=rng.randint(5, 60)))
+                output.write(fast_json.dumps({
+                    "type": "message", "session_token": token, "id": number,
+                    "sender": "human" if number % 2 == 0 else "ai", "messages": content,
+                    "token_count": len(content) // 4, "created_at": started + timedelta(seconds=number),
+                }) + b"\n")
+
+def create_user(name: str) -> int:
+    with database.engine.begin() as conn:
+        return conn.execute(
+            insert(models.User).returning(models.User.id),
+            {"name": name, "email": f"{uuid.uuid4().hex[:8]}@{EMAIL_DOMAIN}", "password": "bench"}
+        ).scalar_one()
+
+def cleanup() -> None:
+    with database.engine.begin() as conn:
+        tokens = conn.execute(text("""
+            SELECT s.session_token FROM "Session" s JOIN "User" u ON u.id = s.user_id WHERE u.email LIKE :pattern
+        """), {"pattern": f"%@{EMAIL_DOMAIN}"}).scalars().all()
+        conn.execute(text("DELETE FROM chats_2 WHERE session_id = ANY(:tokens)"), {"tokens": tokens})
+        conn.execute(text('DELETE FROM "Session" WHERE session_token = ANY(:tokens)'), {"tokens": tokens})
+        conn.execute(text('DELETE FROM "User" WHERE email LIKE :pattern'), {"pattern": f"%@{EMAIL_DOMAIN}"})
+
+def copy_import(path: str, user_id: int) -> dict:
+    db = database.SessionLocal()
+    try:
+        importer = transfer_crud.NdjsonImporter(db, user_id)
+        with open(path, "rb") as source:
+            for line in source:
+                importer.add_line(line)
+                if importer.full:
+                    importer.flush()
+        return importer.finish()
+    finally:
+        db.close()
+
+def per_row_import(path: str, user_id: int, limit: int) -> int:
+    """The same messages, one INSERT per row (committed every 1000 rows)."""
+    inserted = 0
+    db = database.SessionLocal()
+    try:
+        with open(path, "rb") as source:
+            for line in source:
+                record = orjson.loads(line)
+                if record["type"] == "session":
+                    token = str(uuid.uuid4())
+                    db.add(models.SessionModel(user_id=user_id, session_token=token, session_short_name=record["session_short_name"]))
+                    db.flush()
+                    continue
+                db.execute(
+                    text("""
+                    INSERT INTO chats_2 (session_id, messages, sender, token_count, created_at)
+                    VALUES (:session_id, :messages, :sender, :token_count, :created_at)
+                    """),
+                    {
+                        "session_id": token, "messages": record["messages"], "sender": record["sender"],
+                        "token_count": record["token_count"], "created_at": record["created_at"],
+                    }
+                )
+                inserted += 1
+                if inserted % 1000 == 0:
+                    db.commit()
+                if inserted >= limit:
+                    break
+        db.commit()
+    finally:
+        db.close()
+    return inserted
+
+def streamed_export(user_id: int, output) -> int:
+    db = database.SessionLocal()
+    written = 0
+    try:
+        for chunk in transfer_crud.export_user_ndjson(db, user_id):
+            if output is not None:
+                output.write(chunk)
+            written += len(chunk)
+    finally:
+        db.close()
+    return written
+
+def whole_session_export(user_id: int) -> int:
+    """The old way: every session's history loaded whole, one session at a time."""
+    written = 0
+    db = database.SessionLocal()
+    try:
+        tokens = db.execute(
+            text('SELECT session_token FROM "Session" WHERE user_id = :user_id ORDER BY id'), {"user_id": user_id}
+        ).scalars().all()
+        for token in tokens:
+            rows = db.execute(
+                text("SELECT id, sender, messages FROM chats_2 WHERE session_id = :session_id ORDER BY id DESC"),
+                {"session_id": token}
+            ).all()
+            body = fast_json.dumps({"messages": [{"id": r.id, "sender": r.sender, "messages": r.messages} for r in rows]})
+            written += len(body)
+    finally:
+        db.close()
+    return written
+
+def peak_memory(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def comparable(path: str):
+    """Records without the fields an import does not keep (message ids)."""
+    with open(path, "rb") as source:
+        for line in source:
+            record = orjson.loads(line)
+            record.pop("id", None)
+            yield record
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500_000)
+    parser.add_argument("--sessions", type=int, default=500, help="Ordinary sessions, besides the big one")
+    parser.add_argument("--big-session", type=int, default=100_000, help="Messages in the largest session")
+    parser.add_argument("--baseline-messages", type=int, default=20_000, help="Messages inserted row by row")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="bench_transfer_")
+    source_path = os.path.join(workdir, "source.ndjson")
+    export_path = os.path.join(workdir, "export.ndjson")
+    print(f"Writing {args.messages} messages to {source_path}...", file=sys.stderr)
+    write_export(source_path, args.sessions, args.messages, args.big_session, rng)
+
+    try:
+        user_id = create_user("transfer bench")
+        started = time.perf_counter()
+        totals = copy_import(source_path, user_id)
+        copy_seconds = time.perf_counter() - started
+
+        baseline_user = create_user("transfer bench baseline")
+        started = time.perf_counter()
+        baseline_rows = per_row_import(source_path, baseline_user, args.baseline_messages)
+        baseline_seconds = time.perf_counter() - started
+
+        with open(export_path, "wb") as output:
+            started = time.perf_counter()
+            export_bytes = streamed_export(user_id, output)
+            export_seconds = time.perf_counter() - started
+        matches = all(a == b for a, b in zip(comparable(source_path), comparable(export_path)))
+        matches = matches and sum(1 for _ in open(source_path, "rb")) == sum(1 for _ in open(export_path, "rb"))
+
+        streamed_peak = peak_memory(lambda: streamed_export(user_id, None))
+        whole_peak = peak_memory(lambda: whole_session_export(user_id))
+    finally:
+        cleanup()
+        for path in (source_path, export_path):
+            if os.path.exists(path):
+                os.remove(path)
+        os.rmdir(workdir)
+
+    copy_rate = totals["messages_imported"] / copy_seconds
+    baseline_rate = baseline_rows / baseline_seconds
+    result = {
+        "config": {"messages": totals["messages_imported"], "sessions": totals["sessions_imported"], "big_session": args.big_session},
+        "import": {
+            "copy_messages_per_s": round(copy_rate),
+            "per_row_messages_per_s": round(baseline_rate),
+            "speedup": round(copy_rate / baseline_rate, 1),
+            "copy_seconds": round(copy_seconds, 2),
+        },
+        "export": {
+            "messages_per_s": round(totals["messages_imported"] / export_seconds),
+            "bytes": export_bytes,
+            "seconds": round(export_seconds, 2),
+            "matches_import": matches,
+            "streamed_peak_python_bytes": streamed_peak,
+            "whole_session_peak_python_bytes": whole_peak,
+        },
+    }
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+''' Throughput scaling with the number of gunicorn workers, against the stub LLM
+
+For each count in --workers, starts gunicorn with gunicorn.conf.py and that
+many uvicorn workers (LLM_PROVIDER=stub), drives it with the closed-loop
+workload of benchmarks/load_test.py and records throughput and latency.
+Prints one JSON document with a row per worker count and the speedup over
+the first one. Run from the Backend directory against a disposable
+database:
+
+    python benchmarks/bench_workers.py --workers 1,2,4 --concurrency 64 --duration 20
+
+Every worker has its own DB pools: keep the largest worker count times
+2 x (--db-pool-size + --db-max-overflow) under the database's
+max_connections. Scaling stops at the number of CPUs available.
+'''
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from load_test import BACKEND_DIR, add_load_arguments, cleanup, drive, free_port, seed, stub_env, summarize, wait_ready
+
+def start_gunicorn(port: int, workers: int, args, multiproc_dir: str) -> subprocess.Popen:
+    env = stub_env(args)
+    env.update(
+        WEB_CONCURRENCY=str(workers),
+        DB_POOL_SIZE=str(args.db_pool_size),
+        DB_MAX_OVERFLOW=str(args.db_max_overflow),
+        PROMETHEUS_MULTIPROC_DIR=multiproc_dir,
+        GUNICORN_MAX_REQUESTS="0",  # No recycling mid-run
+        GUNICORN_LOG_LEVEL="warning",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}", "main:app"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+def stop(server: subprocess.Popen) -> None:
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default=f"1,2,{os.cpu_count() or 1}", help="Comma-separated worker counts")
+    add_load_arguments(parser)
+    parser.add_argument("--db-pool-size", type=int, default=5, help="DB_POOL_SIZE per worker")
+    parser.add_argument("--db-max-overflow", type=int, default=5, help="DB_MAX_OVERFLOW per worker")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+    counts = sorted({int(count) for count in args.workers.split(",")})
+
+    run_id = f"load-{uuid.uuid4().hex[:8]}"
+    rows = []
+    dataset = None
+    try:
+        for workers in counts:
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            with tempfile.TemporaryDirectory(prefix="bench-metrics-") as multiproc_dir:
+                server = start_gunicorn(port, workers, args, multiproc_dir)
+                try:
+                    wait_ready(base_url)
+                    if dataset is None:
+                        # After the first server is up, so migrations have been applied
+                        dataset = seed(args.users, args.sessions_per_user, args.messages_per_session, run_id)
+                    print(f"Driving {workers} worker(s) with {args.concurrency} clients for {args.duration:.0f}s...", file=sys.stderr)
+                    latencies, errors, elapsed = asyncio.run(drive(base_url, dataset, args))
+                finally:
+                    stop(server)
+            result = summarize(latencies, errors, elapsed, args)
+            rows.append({
+                "workers": workers,
+                "throughput_rps": result["throughput_rps"],
+                "errors": result["errors"],
+                "endpoints": result["endpoints"],
+            })
+            time.sleep(1)  # Let the old workers' connections close
+    finally:
+        cleanup(run_id)
+
+    base = rows[0]["throughput_rps"] or None
+    for row in rows:
+        row["speedup"] = round(row["throughput_rps"] / base, 2) if base else None
+    config = summarize({}, {}, 1.0, args)["config"]
+    config.update(cpus=os.cpu_count(), db_pool_size=args.db_pool_size, db_max_overflow=args.db_max_overflow)
+
+    output = json.dumps({"config": config, "runs": rows}, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+''' End-to-end load test of the HTTP API against the local stub LLM
+
+Seeds users, sessions and chat history straight into the database, then
+drives POST /chat/, GET /chat/{token} and GET /sessions/{user_id} from
+--concurrency concurrent clients for --duration seconds and prints
+throughput and latency percentiles per endpoint as JSON.
+
+By default the server is started here as a uvicorn subprocess with
+LLM_PROVIDER=stub, so no Gemini calls are made; point --base-url at an
+already running server (started with LLM_PROVIDER=stub) to test that
+instead. Run from the Backend directory against a disposable database:
+
+    python benchmarks/load_test.py --concurrency 32 --duration 30 --output run.json
+    python benchmarks/load_test.py --baseline run.json --tolerance 0.2
+
+With --baseline the run exits non-zero when any endpoint's p95 is more
+than --tolerance slower than in the baseline, or its error rate rose.
+'''
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_DIR)
+
+from sqlalchemy import insert, text
+
+import database
+import models
+
+EMAIL_DOMAIN = "loadtest.invalid"
+ENDPOINTS = ["chat", "history", "sessions"]
+
+def seed(users: int, sessions_per_user: int, messages_per_session: int, run_id: str):
+    """Insert the synthetic dataset; returns [(user_id, [session_token, ...]), ...]."""
+    dataset = []
+    with database.engine.begin() as conn:
+        for index in range(users):
+            # Core inserts so the models' id sequences are applied
+            user_id = conn.execute(
+                insert(models.User).returning(models.User.id),
+                {"name": f"load {index}", "email": f"{run_id}-{index}@{EMAIL_DOMAIN}", "password": "loadtest"}
+            ).scalar_one()
+            tokens = [str(uuid.uuid4()) for _ in range(sessions_per_user)]
+            conn.execute(
+                insert(models.SessionModel),
+                [{"user_id": user_id, "session_token": token} for token in tokens]
+            )
+            if messages_per_session:
+                conn.execute(
+                    text("""
+                    INSERT INTO chats_2 (session_id, messages, sender, token_count)
+                    SELECT t.token, repeat('seeded message ', 1 + g % 20),
+                           CASE WHEN g % 2 = 0 THEN 'human' ELSE 'ai' END, 4 * (1 + g % 20)
+                    FROM unnest(CAST(:tokens AS TEXT[])) AS t(token), generate_series(0, :count - 1) g
+                    ORDER BY t.token, g
+                    """),
+                    {"tokens": tokens, "count": messages_per_session}
+                )
+            dataset.append((user_id, tokens))
+    return dataset
+
+def cleanup(run_id: str) -> None:
+    """Remove everything seed() created for run_id."""
+    with database.engine.begin() as conn:
+        conn.execute(text("""
+            DELETE FROM chats_2 WHERE session_id IN (
+                SELECT s.session_token FROM "Session" s JOIN "User" u ON u.id = s.user_id
+                WHERE u.email LIKE :pattern
+            )
+        """), {"pattern": f"{run_id}-%@{EMAIL_DOMAIN}"})
+        conn.execute(text("""
+            DELETE FROM "Session" WHERE user_id IN (SELECT id FROM "User" WHERE email LIKE :pattern)
+        """), {"pattern": f"{run_id}-%@{EMAIL_DOMAIN}"})
+        conn.execute(text('DELETE FROM "User" WHERE email LIKE :pattern'), {"pattern": f"{run_id}-%@{EMAIL_DOMAIN}"})
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def stub_env(args) -> dict:
+    """Server environment using the stub LLM configured by args."""
+    env = dict(
+        os.environ,
+        LLM_PROVIDER="stub",
+        STUB_LLM_LATENCY=str(args.stub_latency),
+        STUB_LLM_TOKENS_PER_SEC=str(args.stub_tokens_per_sec),
+        STUB_LLM_REPLY_TOKENS=str(args.stub_reply_tokens),
+    )
+    env.setdefault("gemini_api_key", "loadtest-placeholder-key")
+    return env
+
+def start_server(port: int, args) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=stub_env(args),
+    )
+
+def wait_ready(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health/ready", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready within {timeout:.0f}s")
+
+def percentile(sorted_values, fraction: float):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+async def drive(base_url: str, dataset, args):
+    """Run the closed-loop load; returns ({endpoint: [latency_ms, ...]}, {endpoint: errors}, elapsed)."""
+    weights = [args.chat_weight, args.history_weight, args.sessions_weight]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        async def worker(worker_id: int, deadline: float):
+            rng = random.Random(args.seed * 1000 + worker_id)
+            while time.monotonic() < deadline:
+                endpoint = rng.choices(ENDPOINTS, weights)[0]
+                user_id, tokens = rng.choice(dataset)
+                token = rng.choice(tokens)
+                start = time.perf_counter()
+                try:
+                    if endpoint == "chat":
+                        response = await client.post("/chat/", json={
+                            "session_token": token,
+                            "message": f"load test question {rng.randrange(1_000_000)}"
+                        })
+                    elif endpoint == "history":
+                        response = await client.get(f"/chat/{token}")
+                    else:
+                        response = await client.get(f"/sessions/{user_id}")
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if ok:
+                    latencies[endpoint].append(elapsed_ms)
+                else:
+                    errors[endpoint] += 1
+
+        if args.warmup > 0:
+            await asyncio.gather(*(worker(i, time.monotonic() + args.warmup) for i in range(args.concurrency)))
+            latencies.clear()
+            errors.clear()
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker(i, started + args.duration) for i in range(args.concurrency)))
+        return latencies, errors, time.monotonic() - started
+
+def summarize(latencies, errors, elapsed: float, args) -> dict:
+    endpoints = {}
+    total_ok = total_errors = 0
+    for endpoint in ENDPOINTS:
+        samples = sorted(latencies.get(endpoint, []))
+        failed = errors.get(endpoint, 0)
+        total_ok += len(samples)
+        total_errors += failed
+        if not samples and not failed:
+            continue
+        endpoints[endpoint] = {
+            "requests": len(samples) + failed,
+            "errors": failed,
+            "error_rate": round(failed / (len(samples) + failed), 4),
+            "throughput_rps": round(len(samples) / elapsed, 2),
+            "mean_ms": round(sum(samples) / len(samples), 2) if samples else None,
+            "p50_ms": round(percentile(samples, 0.50), 2) if samples else None,
+            "p95_ms": round(percentile(samples, 0.95), 2) if samples else None,
+            "p99_ms": round(percentile(samples, 0.99), 2) if samples else None,
+        }
+    return {
+        "config": {
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "users": args.users,
+            "sessions_per_user": args.sessions_per_user,
+            "messages_per_session": args.messages_per_session,
+            "weights": {"chat": args.chat_weight, "history": args.history_weight, "sessions": args.sessions_weight},
+            "stub_latency_s": args.stub_latency,
+            "stub_tokens_per_sec": args.stub_tokens_per_sec,
+            "stub_reply_tokens": args.stub_reply_tokens,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "requests": total_ok + total_errors,
+        "errors": total_errors,
+        "throughput_rps": round(total_ok / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+def compare(result: dict, baseline: dict, tolerance: float):
+    """Return a list of regressions of result against baseline."""
+    regressions = []
+    for endpoint, stats in result["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(endpoint)
+        if not before:
+            continue
+        if before.get("p95_ms") and stats["p95_ms"] and stats["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{endpoint}: p95 {before['p95_ms']} ms -> {stats['p95_ms']} ms")
+        if stats["error_rate"] > before.get("error_rate", 0):
+            regressions.append(f"{endpoint}: error rate {before.get('error_rate', 0)} -> {stats['error_rate']}")
+    return regressions
+
+def add_load_arguments(parser: argparse.ArgumentParser) -> None:
+    """Workload options, shared with benchmarks/bench_workers.py."""
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before the run")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--sessions-per-user", type=int, default=5)
+    parser.add_argument("--messages-per-session", type=int, default=40)
+    parser.add_argument("--chat-weight", type=float, default=1.0)
+    parser.add_argument("--history-weight", type=float, default=3.0)
+    parser.add_argument("--sessions-weight", type=float, default=1.0)
+    parser.add_argument("--stub-latency", type=float, default=0.2, help="Seconds before the stub's first token")
+    parser.add_argument("--stub-tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--stub-reply-tokens", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", help="Use a running server instead of starting one")
+    add_load_arguments(parser)
+    parser.add_argument("--keep-data", action="store_true", help="Leave the seeded rows in place")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    parser.add_argument("--baseline", help="JSON result of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 slowdown vs. the baseline")
+    args = parser.parse_args()
+
+    run_id = f"load-{uuid.uuid4().hex[:8]}"
+    server = None
+    base_url = args.base_url
+    try:
+        if base_url is None:
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = start_server(port, args)  # Also applies pending migrations before seeding
+        wait_ready(base_url)
+
+        print(f"Seeding {args.users} users x {args.sessions_per_user} sessions x {args.messages_per_session} messages...", file=sys.stderr)
+        dataset = seed(args.users, args.sessions_per_user, args.messages_per_session, run_id)
+
+        print(f"Driving {base_url} with {args.concurrency} clients for {args.duration:.0f}s...", file=sys.stderr)
+        latencies, errors, elapsed = asyncio.run(drive(base_url, dataset, args))
+        result = summarize(latencies, errors, elapsed, args)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        if not args.keep_data:
+            cleanup(run_id)
+
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
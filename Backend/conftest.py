@@ -0,0 +1 @@
+''' pytest puts this directory on sys.path, so tests import Backend modules (Agent.*, single_flight) as the app does '''
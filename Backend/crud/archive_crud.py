@@ -0,0 +1,293 @@
+''' Cold storage for idle sessions: chats_2 rows packed into one zstd blob per session
+
+archive_session moves an idle session's messages from chats_2 into a
+single chats_archive row. rehydrate_session (arehydrate_session on an
+AsyncSession) moves them back with their original ids the first time the
+session is read again; every reader of chats_2 calls it first, so callers
+never see whether a session was archived. The check is a primary-key
+lookup on chats_archive; only when it finds a row is the session row
+key-share locked and the archive taken. The lock waits for an archiver
+still merging into that row to commit, so the DELETE, a new statement,
+sees the merged archive.
+
+An archiver that commits just after the lookup is missed: that one read
+finds the session's chats_2 rows gone. Only sessions idle since the
+archive cutoff are archived, and the next read rehydrates them (a cached
+history is dropped too, as the session's newest id has changed).
+
+Each archive row also keeps the session's lexemes (search_vector, without
+positions) so full-text search can find archived sessions and rehydrate
+only those that match (crud/search_crud.py).
+
+Messages written to an archived session before it is read again (e.g. from
+a worker whose history cache was still warm) simply land in chats_2 with
+higher ids and are merged on rehydration.
+'''
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import List, Optional
+
+import orjson
+import zstandard
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import metrics
+import models
+
+ARCHIVE_ZSTD_LEVEL = int(os.getenv("ARCHIVE_ZSTD_LEVEL", "9"))
+ARCHIVE_FORMAT_VERSION = 1
+
+_HAS_ARCHIVE = text("SELECT 1 FROM chats_archive WHERE session_id = :session_id")
+# Conflicts only with the archiver's FOR UPDATE, not with updates to the session's other columns
+_LOCK_SESSION = text('SELECT 1 FROM "Session" WHERE session_token = :session_id FOR KEY SHARE')
+_TAKE_ARCHIVE = text("DELETE FROM chats_archive WHERE session_id = :session_id RETURNING blob")
+
+_RESTORE_ROWS = text("""
+INSERT INTO chats_2 (id, session_id, messages, sender, token_count, created_at)
+SELECT r.id, :session_id, r.messages, r.sender, r.token_count, r.created_at
+FROM unnest(
+    CAST(:ids AS INTEGER[]), CAST(:messages AS TEXT[]), CAST(:senders AS VARCHAR[]),
+    CAST(:token_counts AS INTEGER[]), CAST(:created_ats AS TIMESTAMPTZ[])
+) AS r(id, messages, sender, token_count, created_at)
+ON CONFLICT DO NOTHING
+""")
+
+class RehydrationStats:
+    """Rehydrations done by this process, for the admin archive report."""
+
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.messages = 0
+        self._recent = deque(maxlen=window)
+
+    def record(self, seconds: float, messages: int) -> None:
+        self.count += 1
+        self.messages += messages
+        self._recent.append(seconds)
+        metrics.CHAT_REHYDRATE_SECONDS.observe(seconds)
+
+    def summary(self) -> dict:
+        recent = sorted(self._recent)
+        def percentile(fraction):
+            return round(recent[min(len(recent) - 1, int(len(recent) * fraction))] * 1000, 2) if recent else None
+        return {
+            "rehydrations": self.count,
+            "messages_rehydrated": self.messages,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "max_ms": round(recent[-1] * 1000, 2) if recent else None,
+        }
+
+rehydration_stats = RehydrationStats()
+
+def encode_rows(rows: List[tuple]) -> bytes:
+    """(id, sender, messages, token_count, created_at) rows -> uncompressed archive payload."""
+    return orjson.dumps({"v": ARCHIVE_FORMAT_VERSION, "rows": rows})
+
+def decode_blob(blob: bytes) -> List[list]:
+    payload = orjson.loads(zstandard.ZstdDecompressor().decompress(blob))
+    if payload.get("v") != ARCHIVE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported archive format: {payload.get('v')}")
+    return payload["rows"]
+
+def _restore_params(session_id: str, rows: List[list]) -> dict:
+    return {
+        "session_id": session_id,
+        "ids": [row[0] for row in rows],
+        "senders": [row[1] for row in rows],
+        "messages": [row[2] for row in rows],
+        "token_counts": [row[3] for row in rows],
+        "created_ats": [datetime.fromisoformat(row[4]) for row in rows],
+    }
+
+def rehydrate_session(db: Session, session_id: str) -> int:
+    """
+    Move an archived session's messages back into chats_2 and commit.
+    Returns the number of messages restored (0 if it was not archived).
+    """
+    started = time.perf_counter()
+    # Most reads are of sessions that were never archived: no lock, no DELETE
+    if db.execute(_HAS_ARCHIVE, {"session_id": session_id}).scalar() is None:
+        return 0
+    db.execute(_LOCK_SESSION, {"session_id": session_id})
+    blob = db.execute(_TAKE_ARCHIVE, {"session_id": session_id}).scalar()
+    if blob is None:
+        return 0
+    rows = decode_blob(blob)
+    db.execute(_RESTORE_ROWS, _restore_params(session_id, rows))
+    db.commit()
+    rehydration_stats.record(time.perf_counter() - started, len(rows))
+    return len(rows)
+
+async def arehydrate_session(db: AsyncSession, session_id: str) -> int:
+    """rehydrate_session for an AsyncSession."""
+    started = time.perf_counter()
+    if (await db.execute(_HAS_ARCHIVE, {"session_id": session_id})).scalar() is None:
+        return 0
+    await db.execute(_LOCK_SESSION, {"session_id": session_id})
+    blob = (await db.execute(_TAKE_ARCHIVE, {"session_id": session_id})).scalar()
+    if blob is None:
+        return 0
+    rows = decode_blob(blob)
+    await db.execute(_RESTORE_ROWS, _restore_params(session_id, rows))
+    await db.commit()
+    rehydration_stats.record(time.perf_counter() - started, len(rows))
+    return len(rows)
+
+def fetch_idle_sessions(db: Session, cutoff: datetime, after_id: int, limit: int) -> List[tuple]:
+    """
+    (id, session_token) of live sessions with messages in chats_2, none
+    newer than cutoff, in id order after after_id.
+    """
+    return db.execute(
+        text("""
+        SELECT s.id, s.session_token
+        FROM "Session" s
+        JOIN LATERAL (
+            SELECT c.created_at FROM chats_2 c
+            WHERE c.session_id = s.session_token
+            ORDER BY c.id DESC
+            LIMIT 1
+        ) last ON true
+        WHERE s.id > :after_id AND s.deleted_at IS NULL AND last.created_at < :cutoff
+        ORDER BY s.id
+        LIMIT :limit
+        """),
+        {"cutoff": cutoff, "after_id": after_id, "limit": limit}
+    ).all()
+
+def archive_session(db: Session, session_id: str, cutoff: datetime, level: int = ARCHIVE_ZSTD_LEVEL) -> Optional[dict]:
+    """
+    Move a session's chats_2 rows into its chats_archive row, in one
+    transaction, if it is still idle since cutoff. Rows archived earlier
+    are merged in. Returns the archive's sizes, or None if skipped.
+    """
+    try:
+        # Serializes archivers on the session; a session being purged or archived elsewhere is skipped
+        locked = db.execute(
+            text('SELECT id FROM "Session" WHERE session_token = :session_id AND deleted_at IS NULL FOR UPDATE SKIP LOCKED'),
+            {"session_id": session_id}
+        ).scalar()
+        if locked is None:
+            db.rollback()
+            return None
+        rows = db.execute(
+            text("""
+            SELECT id, sender, messages, token_count, created_at FROM chats_2
+            WHERE session_id = :session_id
+            ORDER BY id
+            """),
+            {"session_id": session_id}
+        ).all()
+        if not rows or rows[-1].created_at >= cutoff:
+            db.rollback()
+            return None
+
+        hot_ids = [row.id for row in rows]
+        merged = [tuple(row) for row in rows]
+        previous = db.execute(
+            text("DELETE FROM chats_archive WHERE session_id = :session_id RETURNING blob, search_vector"),
+            {"session_id": session_id}
+        ).first()
+        if previous is not None:
+            archived = [
+                (row_id, sender, messages, token_count, datetime.fromisoformat(created_at))
+                for row_id, sender, messages, token_count, created_at in decode_blob(previous.blob)
+            ]
+            merged = sorted(archived + merged, key=lambda row: row[0])
+
+        payload = encode_rows(merged)
+        blob = zstandard.ZstdCompressor(level=level).compress(payload)
+        last = merged[-1]
+        db.execute(
+            text("""
+            INSERT INTO chats_archive (
+                session_id, blob, message_count, first_id, last_id, last_message, last_sender,
+                last_activity_at, raw_bytes, compressed_bytes, search_vector
+            ) VALUES (
+                :session_id, :blob, :message_count, :first_id, :last_id, :last_message, :last_sender,
+                :last_activity_at, :raw_bytes, :compressed_bytes,
+                -- Lexemes of the rows being archived, added to those of any earlier archive
+                COALESCE(CAST(:previous_vector AS tsvector), '') || (
+                    SELECT strip(to_tsvector(CAST(:ts_config AS regconfig), string_agg(messages, ' ')))
+                    FROM chats_2 WHERE session_id = :session_id AND id = ANY(:ids)
+                )
+            )
+            """),
+            {
+                "session_id": session_id,
+                "blob": blob,
+                "message_count": len(merged),
+                "first_id": merged[0][0],
+                "last_id": last[0],
+                "last_message": last[2],
+                "last_sender": last[1],
+                "last_activity_at": last[4],
+                "raw_bytes": len(payload),
+                "compressed_bytes": len(blob),
+                "previous_vector": previous.search_vector if previous is not None else None,
+                "ts_config": models.SEARCH_TS_CONFIG,
+                "ids": hot_ids,
+            }
+        )
+        # Exactly the rows read above; anything written meanwhile stays in chats_2
+        db.execute(
+            text("DELETE FROM chats_2 WHERE session_id = :session_id AND id = ANY(:ids)"),
+            {"session_id": session_id, "ids": hot_ids}
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    metrics.observe_archive(len(payload), len(blob))
+    return {"messages": len(merged), "raw_bytes": len(payload), "compressed_bytes": len(blob)}
+
+def index_unsearchable_archives(db: Session, limit: int) -> int:
+    """
+    Fill in search_vector for archives written before search existed, from
+    their blobs. Returns the number of archives indexed.
+    """
+    pending = db.execute(
+        text("SELECT session_id, blob FROM chats_archive WHERE search_vector IS NULL LIMIT :limit"),
+        {"limit": limit}
+    ).all()
+    for session_id, blob in pending:
+        db.execute(
+            text("""
+            UPDATE chats_archive
+            SET search_vector = (
+                SELECT strip(to_tsvector(CAST(:ts_config AS regconfig), string_agg(m, ' ')))
+                FROM unnest(CAST(:messages AS TEXT[])) AS m
+            )
+            WHERE session_id = :session_id AND search_vector IS NULL
+            """),
+            {"session_id": session_id, "messages": [row[2] for row in decode_blob(blob)], "ts_config": models.SEARCH_TS_CONFIG}
+        )
+        db.commit()
+    return len(pending)
+
+def delete_archive(db: Session, session_id: str) -> None:
+    """Drop a session's archived messages (used when the session is purged)."""
+    db.execute(text("DELETE FROM chats_archive WHERE session_id = :session_id"), {"session_id": session_id})
+    db.commit()
+
+def archive_report(db: Session) -> dict:
+    """Archived totals and the current on-disk size of chats_2 and chats_archive."""
+    totals = db.execute(text("""
+        SELECT COUNT(*) AS sessions, COALESCE(SUM(message_count), 0) AS messages,
+               COALESCE(SUM(raw_bytes), 0) AS raw_bytes, COALESCE(SUM(compressed_bytes), 0) AS compressed_bytes,
+               -- Summed over partitions, in case chats_2 is partitioned (migrations/partition_chats.py)
+               (SELECT SUM(pg_total_relation_size(relid)) FROM pg_partition_tree('chats_2')) AS hot_table_bytes,
+               pg_total_relation_size('chats_archive') AS archive_table_bytes
+        FROM chats_archive
+    """)).one()
+    report = dict(totals._mapping)
+    raw, compressed = report["raw_bytes"], report["compressed_bytes"]
+    report["bytes_saved"] = raw - compressed
+    report["compression_ratio"] = round(raw / compressed, 2) if compressed else None
+    report["rehydration"] = rehydration_stats.summary()
+    return report
@@ -1,41 +1,184 @@
+from sqlalchemy import select, text
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+import os
+import database
+import fast_json
 import models
-from typing import List
-from schemas.chat_schemas import ChatMessage
+import crud.archive_crud as archive_crud
+from typing import AsyncIterator, Optional, Tuple
 from fastapi import HTTPException
 
-def delete_session(db: Session, session_id: str):
-    db_session = db.query(models.ChatModel).filter(models.ChatModel.session_id == session_id).first()
-    if db_session:
-        db.delete(db_session)
-        db.commit()
-        return True
-    return False
+def delete_session_batch(db: Session, session_id: str, batch_size: int) -> int:
+    """
+    Delete up to batch_size of a session's messages, oldest first, in one
+    short transaction. Returns the number of rows deleted (0 when done).
+    """
+    result = db.execute(
+        text("""
+        DELETE FROM chats_2
+        WHERE session_id = :session_id AND id IN (
+            SELECT id FROM chats_2
+            WHERE session_id = :session_id
+            ORDER BY id
+            LIMIT :batch_size
+        )
+        """),
+        {"session_id": session_id, "batch_size": batch_size}
+    )
+    db.commit()
+    return result.rowcount
 
-def get_chat_messages(db: Session, session_id: str) -> List[ChatMessage]:
+CHAT_PAGE_DEFAULT_LIMIT = 50
+CHAT_PAGE_MAX_LIMIT = 200
+# Pages larger than CHAT_PAGE_MAX_LIMIT, up to this, are streamed from a server-side cursor
+CHAT_STREAM_MAX_LIMIT = int(os.getenv("CHAT_STREAM_MAX_LIMIT", "10000"))
+CHAT_STREAM_CHUNK_ROWS = int(os.getenv("CHAT_STREAM_CHUNK_ROWS", "500"))
+
+def _page_query(session_id: str, before: Optional[int], after: Optional[int]):
+    """Columns and range conditions shared by the buffered and streamed history pages."""
+    query = select(
+        models.ChatModel.id,
+        models.ChatModel.sender,
+        models.ChatModel.messages
+    ).where(models.ChatModel.session_id == session_id)
+
+    if before is not None:
+        query = query.where(models.ChatModel.id < before)
+    if after is not None:
+        query = query.where(models.ChatModel.id > after)
+    return query
+
+async def _fetch_page_rows(
+    db: AsyncSession,
+    session_id: str,
+    before: Optional[int],
+    after: Optional[int],
+    limit: int
+) -> Tuple[list, Optional[int]]:
+    """One page of (id, sender, messages) rows, newest first, and the next cursor."""
+    await archive_crud.arehydrate_session(db, session_id)
+    query = _page_query(session_id, before, after)
+
+    # Paging forwards reads upwards from the cursor; everything else reads down from the newest
+    forwards = after is not None and before is None
+    order = models.ChatModel.id.asc() if forwards else models.ChatModel.id.desc()
+
+    # Fetch one extra row to learn whether another page exists
+    result = await db.execute(query.order_by(order).limit(limit + 1))
+    rows = result.all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = rows[-1].id if has_more and rows else None
+    if forwards:
+        rows.reverse()
+    return rows, next_cursor
+
+def _encode_messages(rows) -> bytes:
+    """JSON array body (without brackets) of the complete messages among rows."""
+    return fast_json.dumps([
+        {"id": message_id, "sender": sender, "messages": messages}
+        for message_id, sender, messages in rows
+        if messages and sender  # Only keep complete messages
+    ])[1:-1]
+
+async def get_chat_messages_json(
+    db: AsyncSession,
+    session_id: str,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: int = CHAT_PAGE_DEFAULT_LIMIT
+) -> bytes:
+    """
+    Fetch one page of a session's messages using keyset pagination on id,
+    serialized as a ChatResponse JSON body without building a model per row.
+
+    Pages are returned newest-first. With ``before`` the page holds the
+    messages just older than that id; with ``after`` the messages just newer
+    than it. Either way the query is a bounded range scan over
+    (session_id, id), however long the session is. An archived session is
+    moved back into chats_2 first (crud/archive_crud.py).
+
+    next_cursor in the body is the id to pass as ``before`` (or ``after``
+    when paging forwards) for the next page, or null when there are no more
+    messages in that direction.
+    """
     try:
-        # Query messages for the session
-        db_chat = db.query(models.ChatModel).filter(
-            models.ChatModel.session_id == session_id
-        ).order_by(models.ChatModel.id.asc()).all()
-        
-        print(f"Found {len(db_chat)} messages for session {session_id}")
-        
-        formatted_messages = []
-        for chat in db_chat:
-            if chat.messages and chat.sender:  # Only check for required fields
-                formatted_messages.append(ChatMessage(
-                    sender=chat.sender,
-                    messages=chat.messages
-                ))
-            else:
-                print(f"Skipping incomplete chat message: {chat}")
-                
-        return formatted_messages
-        
+        rows, next_cursor = await _fetch_page_rows(db, session_id, before, after, limit)
+        return b'{"messages":[' + _encode_messages(rows) + b'],"next_cursor":' + fast_json.dumps(next_cursor) + b"}"
     except Exception as e:
         print(f"Error fetching chat messages: {str(e)}")
         raise HTTPException(
-            status_code=500, 
+            status_code=500,
             detail=f"Error fetching chat messages: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+async def stream_chat_messages_json(
+    session_id: str,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: int = CHAT_STREAM_MAX_LIMIT,
+    chunk_rows: int = CHAT_STREAM_CHUNK_ROWS
+) -> AsyncIterator[bytes]:
+    """
+    Stream a large page as a ChatResponse JSON body, chunk_rows messages at
+    a time, read through a server-side cursor on its own connection, so
+    neither the rows nor the body are held in memory at once.
+
+    The page is the same as get_chat_messages_json would return. A forwards page
+    (``after`` only) is still sent newest-first: its upper bound is looked
+    up first and the range is then read downwards.
+    """
+    async with database.AsyncSessionLocal() as db:
+        try:
+            await archive_crud.arehydrate_session(db, session_id)
+            query = _page_query(session_id, before, after)
+            upper = None
+            if after is not None and before is None:
+                # The row just past the page; the page is everything between after and it
+                upper = await db.scalar(
+                    select(models.ChatModel.id)
+                    .where(models.ChatModel.session_id == session_id, models.ChatModel.id > after)
+                    .order_by(models.ChatModel.id.asc())
+                    .offset(limit)
+                    .limit(1)
+                )
+                if upper is not None:
+                    query = query.where(models.ChatModel.id < upper)
+                query = query.limit(limit)
+            else:
+                query = query.limit(limit + 1)  # One extra row tells us whether there is a next page
+
+            result = await db.stream(query.order_by(models.ChatModel.id.desc()))
+            yield b'{"messages":['
+            seen = 0
+            first_id = last_id = None
+            has_more = False
+            separator = b""
+            async for partition in result.partitions(chunk_rows):
+                if seen + len(partition) > limit:
+                    partition = partition[:limit - seen]
+                    has_more = True
+                if partition:
+                    seen += len(partition)
+                    if first_id is None:
+                        first_id = partition[0][0]
+                    last_id = partition[-1][0]
+                    body = _encode_messages(partition)
+                    if body:
+                        yield separator + body
+                        separator = b","
+                if has_more:
+                    break
+            await result.close()
+
+            if upper is not None:
+                next_cursor = first_id  # Forwards: continue above the newest message sent
+            else:
+                next_cursor = last_id if has_more else None
+            yield b'],"next_cursor":' + fast_json.dumps(next_cursor) + b"}"
+        except Exception as e:
+            # Headers are already sent; the client sees a truncated body
+            print(f"Error streaming chat messages: {str(e)}")
+            raise
@@ -0,0 +1,159 @@
+''' Full-text search over a user's conversations
+
+chats_2.search_vector is a tsvector that a trigger computes from each
+message on insert, indexed with GIN (migrations/versions/0009_chat_search.sql
+and 0010). Messages written before 0009 are only found once
+'python -m migrations.runner backfill-search' has filled in theirs.
+Queries go through websearch_to_tsquery, so users can type plain words,
+"quoted phrases", OR and -excluded words. Matches are the user's messages
+in live sessions, ranked by ts_rank (newest first among equal ranks),
+each with a ts_headline snippet, paged with a (rank, id) keyset cursor.
+
+Archived sessions are matched on chats_archive.search_vector. The first
+page rehydrates up to SEARCH_REHYDRATE_LIMIT of them, most recent first,
+so that their messages are ranked with the others.
+'''
+import base64
+import os
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import models
+import crud.archive_crud as archive_crud
+
+SEARCH_PAGE_DEFAULT_LIMIT = 20
+SEARCH_PAGE_MAX_LIMIT = 100
+SEARCH_QUERY_MAX_LENGTH = 256
+SEARCH_REHYDRATE_LIMIT = int(os.getenv("SEARCH_REHYDRATE_LIMIT", "20"))
+# Message text is HTML-escaped before highlighting, so snippets can be rendered as HTML
+SEARCH_HEADLINE_OPTIONS = os.getenv(
+    "SEARCH_HEADLINE_OPTIONS",
+    'StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter=" ... "'
+)
+
+_MATCHING_ARCHIVES = text("""
+SELECT a.session_id
+FROM chats_archive a
+JOIN "Session" s ON s.session_token = a.session_id
+WHERE s.user_id = :user_id AND s.deleted_at IS NULL
+  AND a.search_vector @@ websearch_to_tsquery(CAST(:ts_config AS regconfig), :query)
+ORDER BY a.last_activity_at DESC
+LIMIT :limit
+""")
+
+# NOT MATERIALIZED lets the planner see the query itself, so it can estimate
+# how many messages match and pick between the GIN index and the user's sessions
+_SEARCH_PAGE = text("""
+WITH q AS NOT MATERIALIZED (
+    SELECT websearch_to_tsquery(CAST(:ts_config AS regconfig), :query) AS query
+), page AS (
+    SELECT c.id, c.session_id, s.session_short_name, c.sender, c.created_at, c.messages,
+           ts_rank(c.search_vector, q.query) AS rank
+    FROM q, chats_2 c
+    JOIN "Session" s ON s.session_token = c.session_id
+    WHERE s.user_id = :user_id AND s.deleted_at IS NULL
+      AND c.search_vector @@ q.query
+      AND (CAST(:cursor_rank AS REAL) IS NULL
+           OR (ts_rank(c.search_vector, q.query), c.id) < (CAST(:cursor_rank AS REAL), :cursor_id))
+    ORDER BY rank DESC, c.id DESC
+    LIMIT :limit
+)
+-- Headlines re-parse the text, so they are only built for the page
+SELECT page.id, page.session_id, page.session_short_name, page.sender, page.created_at, page.rank,
+       ts_headline(
+           CAST(:ts_config AS regconfig),
+           replace(replace(replace(page.messages, '&', '&amp;'), '<', '&lt;'), '>', '&gt;'),
+           q.query,
+           :headline_options
+       ) AS snippet
+FROM page, q
+ORDER BY page.rank DESC, page.id DESC
+""")
+
+def encode_search_cursor(rank: float, message_id: int) -> str:
+    """Opaque cursor for the position just after a hit in the rank ordering."""
+    raw = f"{rank!r}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
+    """Inverse of encode_search_cursor; raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        rank, message_id = raw.rsplit("|", 1)
+        return float(rank), int(message_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def rehydrate_matching_archives(db: Session, user_id: int, query: str, limit: int = SEARCH_REHYDRATE_LIMIT) -> int:
+    """Rehydrate up to limit of the user's archived sessions that match query. Returns how many."""
+    tokens = db.execute(
+        _MATCHING_ARCHIVES,
+        {"user_id": user_id, "query": query, "ts_config": models.SEARCH_TS_CONFIG, "limit": limit}
+    ).scalars().all()
+    db.rollback()
+    for token in tokens:
+        archive_crud.rehydrate_session(db, token)
+    return len(tokens)
+
+def search_messages(
+    db: Session,
+    user_id: int,
+    query: str,
+    limit: int = SEARCH_PAGE_DEFAULT_LIMIT,
+    cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Search a user's messages, best match first
+
+    Args:
+        db (Session): SQLAlchemy database session
+        user_id (int): Owner of the sessions searched
+        query (str): Search text, in web search syntax
+        limit (int): Page size
+        cursor (Optional[str]): next_cursor from the previous page
+
+    Returns:
+        tuple: (hits, next_cursor); next_cursor is None on the last page
+
+    Raises:
+        ValueError: If the query is empty or the cursor is malformed
+    """
+    query = query.strip()
+    if not query:
+        raise ValueError("Search query must not be empty")
+    cursor_rank, cursor_id = decode_search_cursor(cursor) if cursor else (None, None)
+    if cursor is None and SEARCH_REHYDRATE_LIMIT > 0:
+        rehydrate_matching_archives(db, user_id, query)
+
+    rows = db.execute(
+        _SEARCH_PAGE,
+        {
+            "user_id": user_id,
+            "query": query,
+            "ts_config": models.SEARCH_TS_CONFIG,
+            "headline_options": SEARCH_HEADLINE_OPTIONS,
+            "cursor_rank": cursor_rank,
+            "cursor_id": cursor_id,
+            "limit": limit + 1  # One extra row tells us whether there is a next page
+        }
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_search_cursor(rows[-1].rank, rows[-1].id) if has_more else None
+
+    # Keys in SearchHit's field order, as the response is serialized straight from these dicts
+    hits = [
+        {
+            "session_token": row.session_id,
+            "session_short_name": row.session_short_name,
+            "message_id": row.id,
+            "sender": row.sender,
+            "snippet": row.snippet,
+            "rank": row.rank,
+            "created_at": row.created_at
+        }
+        for row in rows
+    ]
+    return hits, next_cursor
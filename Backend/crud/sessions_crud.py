@@ -1,6 +1,27 @@
+from sqlalchemy import select, update, func, text
+from typing import List, Optional, Tuple
+from datetime import datetime
+import base64
+import os
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import models
 import schemas.sessions_schemas as session_schemas
+from ttl_cache import TTLCache
+import metrics
+
+# Chat routes validate the session token on every request; remember the answer briefly.
+# Deletes made by another worker process are only seen once the entry expires, which
+# is why the purger waits PURGE_GRACE (longer than this) before removing messages.
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "10000"))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "30"))
+# Unknown tokens are cached for less time, so a burst of bad tokens cannot pin the cache
+SESSION_CACHE_NEGATIVE_TTL = float(os.getenv("SESSION_CACHE_NEGATIVE_TTL", "5"))
+
+session_cache = TTLCache(max_entries=SESSION_CACHE_MAX_ENTRIES, ttl=SESSION_CACHE_TTL)
+
+def _remember_session(session_token: str, exists: bool) -> None:
+    session_cache.set(session_token, exists, ttl=None if exists else SESSION_CACHE_NEGATIVE_TTL)
 
 def create_session(db: Session, session: session_schemas.SessionCreate):
     import uuid
@@ -9,25 +30,198 @@ def create_session(db: Session, session: session_schemas.SessionCreate):
     db.add(db_session)
     db.commit()
     db.refresh(db_session)
+    _remember_session(session_token, True)
     return session_token
 
-def fetch_session(db: Session, user_id: int):
-    db_sessions = db.query(models.SessionModel.session_token, models.SessionModel.session_short_name).filter(models.SessionModel.user_id == user_id).all()
+async def session_exists(db: AsyncSession, session_token: str) -> bool:
+    """Whether a live session has this token; answered from session_cache when possible."""
+    cached = session_cache.get(session_token)
+    metrics.record_cache("session", cached is not None)
+    if cached is not None:
+        return cached
+    result = await db.execute(
+        select(models.SessionModel.id).where(
+            models.SessionModel.session_token == session_token,
+            models.SessionModel.deleted_at.is_(None)
+        ).limit(1)
+    )
+    exists = result.first() is not None
+    _remember_session(session_token, exists)
+    return exists
+
+def check_session_exists(db: Session, session_token: str) -> bool:
+    cached = session_cache.get(session_token)
+    metrics.record_cache("session", cached is not None)
+    if cached is not None:
+        return cached
+    existing_session = db.query(models.SessionModel.id).filter(
+        models.SessionModel.session_token == session_token,
+        models.SessionModel.deleted_at.is_(None)
+    ).first()
+    exists = existing_session is not None
+    _remember_session(session_token, exists)
+    return exists
+
+SESSION_PAGE_DEFAULT_LIMIT = 50
+SESSION_PAGE_MAX_LIMIT = 200
+# Characters of the last message returned as a preview
+SESSION_SNIPPET_LENGTH = 120
+
+def encode_session_cursor(last_activity_at: datetime, session_id: int) -> str:
+    """Opaque cursor for the position just after a session in the activity ordering."""
+    raw = f"{last_activity_at.isoformat()}|{session_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_session_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_session_cursor; raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        timestamp, session_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(session_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def list_sessions(
+    db: Session,
+    user_id: int,
+    limit: int = SESSION_PAGE_DEFAULT_LIMIT,
+    cursor: Optional[str] = None
+) -> Tuple[bool, List[dict], Optional[str]]:
+    """
+    List a user's sessions, most recently active first, with a preview of
+    each session's last message and its message count, in one query
+    
+    The query starts from the User row, so a missing user comes back as no
+    rows at all while a user without sessions comes back as a single row
+    with NULL session columns. Last activity is the newest message's
+    created_at, or the session's own created_at when it has no messages.
+    The message count is only computed for the sessions on the page.
+    Archived sessions are listed from their archive row, without
+    rehydrating them.
+    
+    Args:
+        db (Session): SQLAlchemy database session
+        user_id (int): Owner of the sessions
+        limit (int): Page size
+        cursor (Optional[str]): next_cursor from the previous page
+        
+    Returns:
+        tuple: (user_exists, sessions, next_cursor); next_cursor is None on the last page
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    cursor_at, cursor_id = decode_session_cursor(cursor) if cursor else (None, None)
+    rows = db.execute(
+        text("""
+        SELECT u.id AS user_id, page.*, stats.message_count + page.archived_count AS message_count
+        FROM "User" u
+        LEFT JOIN LATERAL (
+            SELECT * FROM (
+                SELECT s.id AS session_id, s.session_token, s.session_short_name,
+                       CASE WHEN last.created_at IS NOT NULL THEN last.snippet
+                            ELSE LEFT(a.last_message, :snippet_length) END AS last_message,
+                       CASE WHEN last.created_at IS NOT NULL THEN last.sender ELSE a.last_sender END AS last_sender,
+                       COALESCE(last.created_at, a.last_activity_at, s.created_at) AS last_activity_at,
+                       COALESCE(a.message_count, 0) AS archived_count
+                FROM "Session" s
+                LEFT JOIN LATERAL (
+                    SELECT LEFT(c.messages, :snippet_length) AS snippet, c.sender, c.created_at
+                    FROM chats_2 c
+                    WHERE c.session_id = s.session_token
+                    ORDER BY c.id DESC
+                    LIMIT 1
+                ) last ON true
+                -- Archived sessions keep their last message and count in the archive row
+                LEFT JOIN chats_archive a ON a.session_id = s.session_token
+                WHERE s.user_id = u.id AND s.deleted_at IS NULL
+            ) activity
+            WHERE CAST(:cursor_at AS TIMESTAMPTZ) IS NULL
+               OR (activity.last_activity_at, activity.session_id) < (CAST(:cursor_at AS TIMESTAMPTZ), :cursor_id)
+            ORDER BY activity.last_activity_at DESC, activity.session_id DESC
+            LIMIT :limit
+        ) page ON true
+        LEFT JOIN LATERAL (
+            SELECT COUNT(*) AS message_count FROM chats_2 c WHERE c.session_id = page.session_token
+        ) stats ON page.session_token IS NOT NULL
+        WHERE u.id = :user_id
+        ORDER BY page.last_activity_at DESC, page.session_id DESC
+        """),
+        {
+            "user_id": user_id,
+            "cursor_at": cursor_at,
+            "cursor_id": cursor_id,
+            "limit": limit + 1,  # One extra row tells us whether there is a next page
+            "snippet_length": SESSION_SNIPPET_LENGTH
+        }
+    ).all()
+
+    if not rows:
+        return False, [], None
+    rows = [row for row in rows if row.session_token is not None]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_session_cursor(rows[-1].last_activity_at, rows[-1].session_id) if has_more else None
+
     sessions_list = []
-    for session in db_sessions:
+    for row in rows:
+        # Keys in SessionSummary's field order, as the response is serialized straight from these dicts
         sessions_list.append({
-            "session_token": session.session_token,
-            "session_short_name": session.session_short_name
+            "session_short_name": row.session_short_name,
+            "session_token": row.session_token,
+            "last_message": row.last_message,
+            "last_sender": row.last_sender,
+            "message_count": row.message_count or 0,
+            "last_activity_at": row.last_activity_at
         })
-    return sessions_list
+    return True, sessions_list, next_cursor
 
 def delete_session(db: Session, session_token: str):
-    db_session = db.query(models.SessionModel).filter(models.SessionModel.session_token == session_token).first()
-    if db_session:
-        db.delete(db_session)
-        db.commit()
-        return True
-    return False
+    """Soft-delete a session; its messages are removed later by the session purger."""
+    return len(delete_sessions(db, [session_token])) == 1
+
+def delete_sessions(db: Session, session_tokens: List[str]) -> List[str]:
+    """
+    Soft-delete several sessions in one statement
+    
+    Args:
+        db (Session): SQLAlchemy database session
+        session_tokens (List[str]): Tokens of the sessions to delete
+        
+    Returns:
+        List[str]: Tokens that were found and marked deleted
+    """
+    if not session_tokens:
+        return []
+    result = db.execute(
+        update(models.SessionModel)
+        .where(
+            models.SessionModel.session_token.in_(session_tokens),
+            models.SessionModel.deleted_at.is_(None)
+        )
+        .values(deleted_at=func.now())
+        .returning(models.SessionModel.session_token)
+    )
+    deleted = [row.session_token for row in result]
+    db.commit()
+    for session_token in session_tokens:
+        session_cache.delete(session_token)
+    return deleted
+
+def fetch_deleted_sessions(db: Session, limit: int, min_age: float = 0) -> List[tuple]:
+    """Return (id, session_token) of sessions deleted at least min_age seconds ago, oldest deletion first."""
+    return db.query(models.SessionModel.id, models.SessionModel.session_token).filter(
+        models.SessionModel.deleted_at.isnot(None),
+        models.SessionModel.deleted_at <= func.now() - func.make_interval(0, 0, 0, 0, 0, 0, min_age)
+    ).order_by(models.SessionModel.deleted_at.asc()).limit(limit).all()
+
+def hard_delete_session(db: Session, session_id: int) -> None:
+    """Remove a soft-deleted Session row once its messages are gone."""
+    db.query(models.SessionModel).filter(
+        models.SessionModel.id == session_id,
+        models.SessionModel.deleted_at.isnot(None)
+    ).delete(synchronize_session=False)
+    db.commit()
 
 def update_session_name(db: Session, session_token: str, session_short_name: str) -> bool:
     """
@@ -47,7 +241,8 @@ def update_session_name(db: Session, session_token: str, session_short_name: str
     try:
         # Find the session by token
         db_session = db.query(models.SessionModel).filter(
-            models.SessionModel.session_token == session_token
+            models.SessionModel.session_token == session_token,
+            models.SessionModel.deleted_at.is_(None)
         ).first()
         
         if db_session:
@@ -80,7 +275,8 @@ def store_session_name(db: Session, session_token: str, session_short_name: str)
             
         # Find the session by token
         db_session = db.query(models.SessionModel).filter(
-            models.SessionModel.session_token == session_token
+            models.SessionModel.session_token == session_token,
+            models.SessionModel.deleted_at.is_(None)
         ).first()
         
         if db_session:
@@ -93,4 +289,42 @@ def store_session_name(db: Session, session_token: str, session_short_name: str)
         
     except Exception as e:
         db.rollback()
-        raise ValueError(f"Error storing session name: {str(e)}")
\ No newline at end of file
+        raise ValueError(f"Error storing session name: {str(e)}")
+
+def save_name_job(db: Session, job: dict) -> None:
+    """Insert or update the shared status row of a session-name job (workers/session_name_queue.py)."""
+    db.execute(
+        text("""
+        INSERT INTO session_name_jobs (job_id, session_token, status, session_name, error, finished_at)
+        VALUES (:job_id, :session_token, :status, :session_name, :error, :finished_at)
+        ON CONFLICT (job_id) DO UPDATE SET
+            status = EXCLUDED.status,
+            session_name = EXCLUDED.session_name,
+            error = EXCLUDED.error,
+            finished_at = EXCLUDED.finished_at,
+            updated_at = now()
+        """),
+        job
+    )
+    db.commit()
+
+async def get_name_job(db: AsyncSession, job_id: str) -> Optional[dict]:
+    """A session-name job's shared status row, with the seconds since it last changed."""
+    row = (await db.execute(
+        text("""
+        SELECT job_id, session_token, status, session_name, error,
+               EXTRACT(EPOCH FROM now() - updated_at)::float AS idle_seconds
+        FROM session_name_jobs WHERE job_id = :job_id
+        """),
+        {"job_id": job_id}
+    )).first()
+    return dict(row._mapping) if row is not None else None
+
+def prune_name_jobs(db: Session, retention: float) -> int:
+    """Delete session-name jobs that finished more than retention seconds ago."""
+    deleted = db.execute(
+        text("DELETE FROM session_name_jobs WHERE finished_at < now() - make_interval(secs => :retention)"),
+        {"retention": retention}
+    ).rowcount
+    db.commit()
+    return deleted
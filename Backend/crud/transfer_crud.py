@@ -0,0 +1,291 @@
+''' Bulk export and import of a user's conversations as NDJSON
+
+The format is one JSON object per line, each session followed by its
+messages in id order:
+
+    {"type":"session","session_token":"...","session_short_name":null,"created_at":"..."}
+    {"type":"message","session_token":"...","id":17,"sender":"human","messages":"...","token_count":4,"created_at":"..."}
+
+Export reads every row through one server-side cursor, EXPORT_FETCH_ROWS at
+a time, in a read-only REPEATABLE READ transaction, so memory stays flat
+however long the user's history is and the file is a consistent snapshot.
+Archived sessions are decoded from their blob without being rehydrated;
+only one archived session is held in memory at a time.
+
+Import loads that format into a user with COPY, in transactions of about
+IMPORT_BATCH_ROWS rows that only end between sessions, so a session is
+always committed together with all of its messages. Sessions keep their tokens (or get new ones with
+new_tokens=True), sessions and messages keep their created_at, and messages
+get new ids in their original order. A session whose token already exists
+is skipped with its messages, so an interrupted import can be run again.
+'''
+import io
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterator, Optional
+
+import orjson
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import fast_json
+import crud.archive_crud as archive_crud
+
+EXPORT_FETCH_ROWS = int(os.getenv("EXPORT_FETCH_ROWS", "2000"))
+EXPORT_CHUNK_BYTES = 64 * 1024
+IMPORT_BATCH_ROWS = int(os.getenv("IMPORT_BATCH_ROWS", "50000"))
+
+_EXPORT_ROWS = text("""
+SELECT s.session_token, s.session_short_name, s.created_at AS session_created_at,
+       a.session_id IS NOT NULL AS archived,
+       c.id, c.sender, c.messages, c.token_count, c.created_at
+FROM "Session" s
+LEFT JOIN chats_archive a ON a.session_id = s.session_token
+LEFT JOIN LATERAL (
+    SELECT c.id, c.sender, c.messages, c.token_count, c.created_at
+    FROM chats_2 c
+    WHERE c.session_id = s.session_token
+) c ON true
+WHERE s.user_id = :user_id AND s.deleted_at IS NULL
+ORDER BY s.id, c.id
+""")
+
+def _message_record(session_token: str, row_id, sender, messages, token_count, created_at) -> dict:
+    return {
+        "type": "message",
+        "session_token": session_token,
+        "id": row_id,
+        "sender": sender,
+        "messages": messages,
+        "token_count": token_count,
+        "created_at": created_at,
+    }
+
+def export_user(db: Session, user_id: int, fetch_rows: int = EXPORT_FETCH_ROWS) -> Iterator[dict]:
+    """
+    Yield a user's live sessions and their messages as export records, in
+    file order. Ends any transaction open on db; the export runs in its own.
+    """
+    db.rollback()
+    connection = db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    connection.execute(text("SET TRANSACTION READ ONLY"))
+    try:
+        result = connection.execute(_EXPORT_ROWS.execution_options(yield_per=fetch_rows), {"user_id": user_id})
+        current = None
+        for row in result:
+            if row.session_token != current:
+                current = row.session_token
+                yield {
+                    "type": "session",
+                    "session_token": current,
+                    "session_short_name": row.session_short_name,
+                    "created_at": row.session_created_at,
+                }
+                if row.archived:
+                    blob = connection.execute(
+                        text("SELECT blob FROM chats_archive WHERE session_id = :session_id"),
+                        {"session_id": current}
+                    ).scalar()
+                    # Archived rows predate anything written to the session since
+                    for row_id, sender, messages, token_count, created_at in archive_crud.decode_blob(blob):
+                        yield _message_record(current, row_id, sender, messages, token_count, datetime.fromisoformat(created_at))
+            if row.id is not None:
+                yield _message_record(current, row.id, row.sender, row.messages, row.token_count, row.created_at)
+    finally:
+        db.rollback()
+
+def export_user_ndjson(db: Session, user_id: int, chunk_bytes: int = EXPORT_CHUNK_BYTES) -> Iterator[bytes]:
+    """export_user as NDJSON, in chunks of about chunk_bytes."""
+    chunk = bytearray()
+    for record in export_user(db, user_id):
+        chunk += fast_json.dumps(record)
+        chunk += b"\n"
+        if len(chunk) >= chunk_bytes:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+async def aiter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a streamed body (e.g. request.stream()) into lines."""
+    pending = bytearray()
+    async for chunk in chunks:
+        pending += chunk
+        start = 0
+        while (end := pending.find(b"\n", start)) >= 0:
+            yield bytes(pending[start:end])
+            start = end + 1
+        del pending[:start]
+    if pending:
+        yield bytes(pending)
+
+def _copy_value(value) -> str:
+    """A field in COPY's text format."""
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+def _copy_rows(cursor, sql: str, rows) -> None:
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor.copy_expert(sql, buffer)
+
+class NdjsonImporter:
+    """
+    Loads export records into a user's sessions. Feed it lines with
+    add_line, call flush whenever full is true, and finish at the end.
+    A batch becomes full at the first session record after batch_rows rows,
+    which is held back for the next batch, so a session with more messages
+    than batch_rows makes one larger transaction rather than being split.
+    """
+
+    def __init__(self, db: Session, user_id: int, new_tokens: bool = False, batch_rows: int = IMPORT_BATCH_ROWS):
+        self.db = db
+        self.user_id = user_id
+        self.new_tokens = new_tokens
+        self.batch_rows = batch_rows
+        self.line_number = 0
+        self.sessions_imported = 0
+        self.sessions_skipped = 0
+        self.messages_imported = 0
+        self.messages_skipped = 0
+        self._sessions = []  # (token, session_short_name, created_at) waiting for the next flush
+        self._messages = []  # (token, messages, sender, token_count, created_at)
+        self._tokens = {}  # Exported token -> token in this database, for every session seen
+        self._skipped = set()  # Exported tokens of sessions that already existed
+        self._full = False  # The last session record starts the next batch
+
+    @property
+    def full(self) -> bool:
+        return self._full
+
+    def _error(self, message: str) -> ValueError:
+        return ValueError(f"Line {self.line_number}: {message}")
+
+    def _timestamp(self, value) -> datetime:
+        if value is None:
+            return datetime.now(timezone.utc)
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise self._error(f"invalid created_at {value!r}")
+
+    def _string(self, record: dict, field: str, max_length: Optional[int] = None, optional: bool = False) -> Optional[str]:
+        value = record.get(field)
+        if value is None and optional:
+            return None
+        if not isinstance(value, str):
+            raise self._error(f"{field} must be a string")
+        if max_length is not None and len(value) > max_length:
+            raise self._error(f"{field} is longer than {max_length} characters")
+        return value
+
+    def add_line(self, line: bytes) -> None:
+        """Queue one NDJSON line; raises ValueError on a malformed record."""
+        self.line_number += 1
+        if not line.strip():
+            return
+        try:
+            record = orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            raise self._error(f"invalid JSON ({e})")
+        if not isinstance(record, dict):
+            raise self._error("expected a JSON object")
+
+        kind = record.get("type")
+        token = self._string(record, "session_token", max_length=255)
+        if not token:
+            raise self._error("session_token must not be empty")
+        if kind == "session":
+            if token in self._tokens:
+                raise self._error(f"session {token} appears twice")
+            self._full = len(self._sessions) + len(self._messages) >= self.batch_rows
+            self._tokens[token] = str(uuid.uuid4()) if self.new_tokens else token
+            self._sessions.append((
+                token,
+                self._string(record, "session_short_name", max_length=100, optional=True),
+                self._timestamp(record.get("created_at")),
+            ))
+        elif kind == "message":
+            if token not in self._tokens:
+                raise self._error(f"message for session {token} before its session record")
+            token_count = record.get("token_count")
+            if token_count is not None and not isinstance(token_count, int):
+                raise self._error("token_count must be an integer")
+            self._messages.append((
+                token,
+                self._string(record, "messages"),
+                self._string(record, "sender", max_length=10),
+                token_count,
+                self._timestamp(record.get("created_at")),
+            ))
+        else:
+            raise self._error(f"unknown record type {kind!r}")
+
+    def flush(self) -> None:
+        """COPY the queued sessions and their messages in one transaction."""
+        sessions = self._sessions[:-1] if self._full else self._sessions
+        if not sessions and not self._messages:
+            return
+        try:
+            if sessions:
+                targets = [self._tokens[token] for token, _, _ in sessions]
+                existing = set(self.db.execute(
+                    text('SELECT session_token FROM "Session" WHERE session_token = ANY(:tokens)'),
+                    {"tokens": targets}
+                ).scalars())
+                new_sessions = [row for row in sessions if self._tokens[row[0]] not in existing]
+                self._skipped.update(row[0] for row in sessions if self._tokens[row[0]] in existing)
+                # "Session".id has no column default; the ORM draws it from this sequence
+                ids = self.db.execute(
+                    text("SELECT nextval('session_id_seq') FROM generate_series(1, :count)"),
+                    {"count": len(new_sessions)}
+                ).scalars().all()
+            else:
+                new_sessions, ids = [], []
+            messages = [row for row in self._messages if row[0] not in self._skipped]
+
+            cursor = self.db.connection().connection.cursor()
+            try:
+                _copy_rows(
+                    cursor,
+                    'COPY "Session" (id, user_id, session_token, session_short_name, created_at) FROM STDIN',
+                    (
+                        (session_id, self.user_id, self._tokens[token], name, created_at)
+                        for session_id, (token, name, created_at) in zip(ids, new_sessions)
+                    )
+                )
+                # Ids come from the chats_2 sequence in file order, so message order is kept
+                _copy_rows(
+                    cursor,
+                    "COPY chats_2 (session_id, messages, sender, token_count, created_at) FROM STDIN",
+                    ((self._tokens[token], *rest) for token, *rest in messages)
+                )
+            finally:
+                cursor.close()
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        self.sessions_imported += len(new_sessions)
+        self.sessions_skipped += len(sessions) - len(new_sessions)
+        self.messages_imported += len(messages)
+        self.messages_skipped += len(self._messages) - len(messages)
+        self._sessions = self._sessions[-1:] if self._full else []
+        self._messages.clear()
+        self._full = False
+
+    def finish(self) -> dict:
+        """Flush what is left and return the import's totals."""
+        self._full = False
+        self.flush()
+        return {
+            "sessions_imported": self.sessions_imported,
+            "sessions_skipped": self.sessions_skipped,
+            "messages_imported": self.messages_imported,
+            "messages_skipped": self.messages_skipped,
+        }
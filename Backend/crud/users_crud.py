@@ -1,9 +1,50 @@
 from sqlalchemy.orm import Session
+from typing import Optional, Tuple
 import models
 import schemas.user_schemas as user_schemas
 
-def get_user(db: Session):
-    return db.query(models.User).all()
+USER_PAGE_DEFAULT_LIMIT = 50
+USER_PAGE_MAX_LIMIT = 500
+
+def _like_prefix(prefix: str) -> str:
+    # Treat LIKE wildcards in user input literally
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%"
+
+def get_users(
+    db: Session,
+    limit: int = USER_PAGE_DEFAULT_LIMIT,
+    cursor: Optional[int] = None,
+    email_prefix: Optional[str] = None,
+    name_prefix: Optional[str] = None
+) -> Tuple[list, Optional[int]]:
+    """
+    List users a page at a time, selecting only id, name and email
+    
+    Args:
+        db (Session): SQLAlchemy database session
+        limit (int): Page size
+        cursor (Optional[int]): Return users with an id greater than this
+        email_prefix (Optional[str]): Only users whose email starts with this
+        name_prefix (Optional[str]): Only users whose name starts with this
+        
+    Returns:
+        tuple: (rows, next_cursor); next_cursor is None on the last page
+    """
+    query = db.query(models.User.id, models.User.name, models.User.email)
+    if cursor is not None:
+        query = query.filter(models.User.id > cursor)
+    if email_prefix:
+        query = query.filter(models.User.email.like(_like_prefix(email_prefix), escape="\\"))
+    if name_prefix:
+        query = query.filter(models.User.name.like(_like_prefix(name_prefix), escape="\\"))
+
+    # One extra row tells us whether there is a next page
+    rows = query.order_by(models.User.id.asc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = rows[-1].id if has_more else None
+    return rows, next_cursor
 
 def get_user_by_id(db: Session, id: int):
     return db.query(models.User).filter(models.User.id == id).first()
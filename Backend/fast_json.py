@@ -0,0 +1,110 @@
+''' JSON bytes straight from DB rows, with negotiated compression
+
+The hot read endpoints (GET /chat/{token}, GET /sessions/{user_id}) build
+plain dicts from their rows and serialize them once with orjson, instead of
+building a pydantic model per row and letting FastAPI validate and
+re-serialize the response. Their response_model stays for the OpenAPI
+schema only; the bytes match what it would produce.
+
+Bodies of at least JSON_COMPRESS_MIN_SIZE bytes are compressed when the
+client accepts it: brotli if the optional brotli package is installed,
+else gzip. Streamed bodies are compressed incrementally.
+'''
+import os
+import zlib
+from typing import AsyncIterator, Optional
+
+import orjson
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip is offered
+    brotli = None
+
+JSON_COMPRESS_MIN_SIZE = int(os.getenv("JSON_COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))  # Higher levels cost far more CPU than they save
+
+# Preferred first
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+def dumps(obj) -> bytes:
+    """Serialize like pydantic does: datetimes in UTC as ...Z, no whitespace."""
+    return orjson.dumps(obj, option=orjson.OPT_UTC_Z)
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best supported Content-Encoding from an Accept-Encoding header, or None."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in SUPPORTED_ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+class _Compressor:
+    """Incremental compressor for one response body."""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+def compress(data: bytes, encoding: str) -> bytes:
+    compressor = _Compressor(encoding)
+    return compressor.compress(data) + compressor.finish()
+
+def json_response(request: Request, body: bytes, status_code: int = 200) -> Response:
+    """Response for an already serialized body, compressed if large and accepted."""
+    headers = {"Vary": "Accept-Encoding"}
+    if len(body) >= JSON_COMPRESS_MIN_SIZE:
+        encoding = choose_encoding(request.headers.get("accept-encoding"))
+        if encoding is not None:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
+
+def streaming_json_response(
+    request: Request, chunks: AsyncIterator[bytes], media_type: str = "application/json"
+) -> StreamingResponse:
+    """Chunked response for a body produced piece by piece, compressed on the fly if accepted."""
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    if encoding is None:
+        return StreamingResponse(chunks, media_type=media_type, headers=headers)
+    headers["Content-Encoding"] = encoding
+
+    async def compressed():
+        compressor = _Compressor(encoding)
+        async for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+
+    return StreamingResponse(compressed(), media_type=media_type, headers=headers)
@@ -0,0 +1,100 @@
+''' Production server: gunicorn pre-forking uvicorn workers
+
+    gunicorn -c gunicorn.conf.py main:app
+
+`python main.py` is the single-process development server with reload; use
+this in production. Each worker imports the app itself (no preload), so DB
+pools, LLM clients and background threads are created per worker by the
+app lifespan (startup.py) and torn down when the worker exits. Migrations
+run once, in the master, before any worker starts (and again on HUP).
+
+    - WEB_CONCURRENCY: worker processes (default: one per CPU this process
+      may run on). Workers share their state through the database: session
+      name jobs are answered from session_name_jobs by any worker, cached
+      history is checked against the session's newest message, deleted
+      sessions are purged only after PURGE_GRACE (longer than the session
+      cache's TTL) and the purger / archiver threads skip each other's rows.
+      Duplicate-message coalescing and the LLM concurrency limit stay per
+      worker;
+    - GUNICORN_MAX_REQUESTS / GUNICORN_MAX_REQUESTS_JITTER: recycle a worker
+      after about this many requests (0 disables recycling);
+    - GUNICORN_GRACEFUL_TIMEOUT: seconds a worker gets to finish in-flight
+      requests (including streamed replies) on restart or shutdown.
+
+Graceful restart: `kill -HUP <master pid>` starts fresh workers and retires
+the old ones once they finish; `kill -TERM` drains and stops. Each worker
+opens up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections per engine, so keep
+the worker count times that under the database's max_connections.
+'''
+import glob
+import os
+
+def _cpu_count() -> int:
+    # The CPUs this process may use (a container's cpuset), not every CPU of the host
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS
+        return os.cpu_count() or 1
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+# Async workers each keep a CPU busy, so one per CPU rather than the 2 * CPU + 1 of sync workers
+workers = int(os.getenv("WEB_CONCURRENCY") or _cpu_count())
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Worker recycling bounds slow leaks; the jitter keeps workers from restarting together
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+# Uvicorn workers heartbeat from the event loop, so this only catches a blocked loop
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Never preload: engines and clients must be created after the fork, in each worker
+preload_app = False
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+def _migrate(server):
+    # Once in the master rather than in every worker's lifespan and on every recycle
+    if os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() in ("1", "true", "yes"):
+        from sqlalchemy import create_engine
+        from sqlalchemy.pool import NullPool
+        import database
+        from migrations.runner import run_migrations
+
+        # Own engine without a pool, so no connection is inherited by the forked workers
+        engine = create_engine(database.SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+        try:
+            applied = run_migrations(engine)
+        finally:
+            engine.dispose()
+        server.log.info("Applied %d migration(s)", len(applied))
+    # Workers inherit the environment; their lifespan skips the migration step
+    os.environ["MIGRATIONS_RUN_BY_MASTER"] = "1"
+
+def on_starting(server):
+    # Samples left by a previous run's workers would be aggregated into /metrics
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(multiproc_dir, "*.db")):
+            os.remove(path)
+    _migrate(server)
+
+def on_reload(server):
+    # New code may bring new migrations; apply them before the new workers start
+    _migrate(server)
+
+def when_ready(server):
+    server.log.info(
+        "Serving with %s worker(s), recycled after ~%s requests",
+        server.cfg.workers, server.cfg.max_requests or "unlimited"
+    )
+
+def child_exit(server, worker):
+    # Drop the dead worker's live gauges (DB pool usage) from the aggregated metrics
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid)
@@ -1,13 +1,45 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
-from routers import users, sessions, Chat
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from database import engine, async_engine
+from routers import users, sessions, Chat, admin
+import metrics
+from profiler import ProfilerMiddleware, request_profiler
+from startup import startup, STARTUP_IN_BACKGROUND
+import asyncio
 import os
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# How long /health/ready waits for the database before reporting it down
+READINESS_DB_TIMEOUT = float(os.getenv("READINESS_DB_TIMEOUT", "2"))
 
-app = FastAPI(title="ChatBot API")
+metrics.instrument_pool(engine, "sync")
+metrics.instrument_pool(async_engine, "async")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Migrations, LLM clients and background workers (see startup.py), kept off the import path
+    if STARTUP_IN_BACKGROUND:
+        startup.run_in_background()
+    else:
+        await asyncio.to_thread(startup.run)
+    yield
+    await asyncio.to_thread(startup.wait)
+    from Agent.agent_registry import registry
+    from workers.session_purger import session_purger
+    from workers.session_name_queue import session_name_queue
+    from workers.session_archiver import session_archiver
+    session_archiver.stop()
+    session_name_queue.stop()
+    session_purger.stop()
+    request_profiler.stop()
+    registry.clear()
+    # Each worker process owns its pools; close them as it exits
+    await async_engine.dispose()
+    engine.dispose()
+
+app = FastAPI(title="ChatBot API", lifespan=lifespan)
 
 # Configure CORS - Allow all origins for now
 app.add_middleware(
@@ -18,10 +50,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Samples stacks of requests while profiling is on (see profiler.py); a pass-through otherwise
+app.add_middleware(ProfilerMiddleware)
+
 # Include routers
 app.include_router(users.router, tags=["users"])
 app.include_router(sessions.router, tags=["sessions"])
 app.include_router(Chat.router, tags=["chat"])
+app.include_router(admin.router, tags=["admin"])
 
 @app.get("/")
 def read_root():
@@ -31,7 +67,35 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/live")
+def liveness_check():
+    # The process is up and serving; says nothing about its dependencies
+    return {"status": "alive"}
+
+async def _ping_database() -> None:
+    async with async_engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+@app.get("/health/ready")
+async def readiness_check():
+    # Ready once every startup step succeeded and the database answers
+    report = startup.report()
+    if startup.ready:
+        try:
+            await asyncio.wait_for(_ping_database(), READINESS_DB_TIMEOUT)
+            report["database"] = "ok"
+        except Exception as e:
+            report["status"] = "unavailable"
+            report["database"] = f"unavailable: {e!r}"
+    return JSONResponse(report, status_code=200 if report["status"] == "ready" else 503)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    # Prometheus text format; aggregated over all workers when PROMETHEUS_MULTIPROC_DIR is set
+    return Response(metrics.metrics_payload(), media_type=metrics.CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
+    # Development server; production runs gunicorn with gunicorn.conf.py
     import uvicorn
     port = int(os.getenv("PORT", 8000))
     uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
@@ -0,0 +1,137 @@
+''' Prometheus metrics for the chat hot path, served at GET /metrics
+
+Chat turns are timed per stage (history load, prompt build, LLM call,
+first streamed token, persist) alongside prompt/completion token counts,
+prompt history length, DB pool usage, cache hit/miss counters and the
+session archive (bytes archived, rehydration latency).
+
+Multiple worker processes: set PROMETHEUS_MULTIPROC_DIR to an empty,
+writable directory (cleared between deploys) before the workers start.
+Every process then writes its samples there and /metrics, whichever
+worker answers it, aggregates all of them. Without it, /metrics reports
+the answering process only.
+'''
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client import REGISTRY
+from sqlalchemy import event
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+STAGES = ("history_load", "prompt_build", "llm_call", "first_token", "persist")
+
+CHAT_STAGE_SECONDS = Histogram(
+    "chat_stage_seconds",
+    "Time spent in each stage of a chat turn",
+    ["stage", "mode"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+CHAT_TURN_SECONDS = Histogram(
+    "chat_turn_seconds",
+    "End-to-end time of a chat turn inside the agent",
+    ["mode"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens sent to and received from the model, as reported by the model",
+    ["kind"],
+)
+CHAT_HISTORY_MESSAGES = Histogram(
+    "chat_history_messages",
+    "Prior messages included in the prompt window",
+    buckets=(0, 2, 5, 10, 20, 50, 100, 200),
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache and result",
+    ["cache", "result"],
+)
+CHAT_REHYDRATE_SECONDS = Histogram(
+    "chat_rehydrate_seconds",
+    "Time to move an archived session back into chats_2 on first access",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+ARCHIVE_BYTES = Counter(
+    "chat_archive_bytes_total",
+    "Message payload archived by the session archiver, before and after compression",
+    ["kind"],
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CAPACITY = Gauge(
+    "db_pool_capacity",
+    "Pool size plus max overflow",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+
+@contextmanager
+def time_stage(stage: str, mode: str):
+    """Observe the duration of the enclosed block as one chat stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        CHAT_STAGE_SECONDS.labels(stage=stage, mode=mode).observe(time.perf_counter() - started)
+
+def observe_stage(stage: str, mode: str, seconds: float) -> None:
+    CHAT_STAGE_SECONDS.labels(stage=stage, mode=mode).observe(seconds)
+
+def observe_usage(usage_metadata) -> None:
+    """Count prompt and completion tokens from a LangChain usage_metadata dict."""
+    if not usage_metadata:
+        return
+    LLM_TOKENS.labels(kind="prompt").inc(usage_metadata.get("input_tokens") or 0)
+    LLM_TOKENS.labels(kind="completion").inc(usage_metadata.get("output_tokens") or 0)
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+def observe_archive(raw_bytes: int, compressed_bytes: int) -> None:
+    ARCHIVE_BYTES.labels(kind="raw").inc(raw_bytes)
+    ARCHIVE_BYTES.labels(kind="compressed").inc(compressed_bytes)
+
+def instrument_pool(engine, name: str) -> None:
+    """Track checked-out connections of a SQLAlchemy engine's pool (sync or async)."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    pool = sync_engine.pool
+    if hasattr(pool, "size"):
+        DB_POOL_CAPACITY.labels(pool=name).set(pool.size() + max(pool._max_overflow, 0))
+    checked_out = DB_POOL_CHECKED_OUT.labels(pool=name)
+
+    @event.listens_for(sync_engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_out.inc()
+
+    @event.listens_for(sync_engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        checked_out.dec()
+
+def metrics_payload() -> bytes:
+    """Current metrics in the Prometheus text format."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+def mark_process_dead(pid: int) -> None:
+    """Drop a dead worker's live gauges; call from the process manager (e.g. gunicorn child_exit)."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,49 @@
+''' Fill in chats_2.search_vector for messages written before full-text search
+
+Run through the migration runner (it applies pending migrations first):
+    python -m migrations.runner backfill-search --batch-sessions 200
+
+Migration 0009 only adds the column and the trigger that fills it on
+insert, so it is instant on a large table. This walks the sessions in id
+order and computes the vectors of their older messages, one short
+transaction per batch of sessions (served by the (session_id, id) index),
+pausing between batches so chat traffic is not starved. It can be stopped
+and run again: messages that already have a vector are skipped. Until it
+has run, older messages are simply not found by search.
+'''
+import time
+
+from migrations.runner import autocommit_connection
+
+def backfill_search(engine=None, batch_sessions: int = 200, pause: float = 0.05) -> int:
+    """Compute missing search vectors; returns the number of messages updated."""
+    if engine is None:
+        from database import engine
+    from models import SEARCH_TS_CONFIG
+
+    updated, after_id, batches = 0, 0, 0
+    started = time.perf_counter()
+    with autocommit_connection(engine) as connection:
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute(
+                    'SELECT id, session_token FROM "Session" WHERE id > %s ORDER BY id LIMIT %s',
+                    (after_id, batch_sessions)
+                )
+                sessions = cursor.fetchall()
+                if not sessions:
+                    break
+                # Autocommit: each statement is its own transaction, so row locks are short-lived
+                cursor.execute(
+                    "UPDATE chats_2 SET search_vector = to_tsvector(CAST(%s AS regconfig), messages) "
+                    "WHERE session_id = ANY(%s) AND search_vector IS NULL",
+                    (SEARCH_TS_CONFIG, [token for _, token in sessions])
+                )
+                updated += cursor.rowcount
+                after_id = sessions[-1][0]
+                batches += 1
+                if batches % 50 == 0:
+                    print(f"Indexed {updated} messages, up to session id {after_id}")
+                time.sleep(pause)
+    print(f"Backfilled search vectors for {updated} messages in {time.perf_counter() - started:.1f}s")
+    return updated
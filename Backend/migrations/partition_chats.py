@@ -0,0 +1,177 @@
+''' Convert chats_2 into a table hash-partitioned by session_id
+
+Run through the migration runner (it applies pending migrations first):
+    python -m migrations.runner partition-chats --partitions 16
+
+Existing rows are copied in id-ordered batches while the old table stays
+live. Then, under a write lock, the two tables are reconciled in full (rows
+committed late with lower ids are added, rows deleted during the copy are
+removed) and renamed; that pass scans both tables, so it holds the lock for
+roughly a second per million rows.
+The old table is kept as chats_2_unpartitioned so the change can be rolled
+back; drop it once the new table has been verified.
+'''
+import re
+import time
+
+from migrations.runner import autocommit_connection
+
+TABLE_NAME = "chats_2"
+LEGACY_SUFFIX = "_unpartitioned"
+# The partitioned primary key (session_id, id) replaces these
+SKIPPED_INDEXES = {f"{TABLE_NAME}_pkey", "ix_chats_2_session_id_id"}
+
+def is_partitioned(cursor, table: str = TABLE_NAME) -> bool:
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+def _copy_columns(cursor, table: str) -> str:
+    # Generated columns are recomputed by the new table and cannot be inserted
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND is_generated = 'NEVER'
+        ORDER BY ordinal_position
+    """, (table,))
+    return ", ".join(f'"{row[0]}"' for row in cursor.fetchall())
+
+def _secondary_indexes(cursor, table: str) -> list:
+    cursor.execute("""
+        SELECT indexname, indexdef FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = %s
+    """, (table,))
+    return [(name, definition) for name, definition in cursor.fetchall() if name not in SKIPPED_INDEXES]
+
+def _triggers(cursor, table: str) -> list:
+    # LIKE does not copy triggers (e.g. the one filling search_vector)
+    cursor.execute(
+        "SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = to_regclass(%s) AND NOT tgisinternal",
+        (table,)
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+def _copy_batch(cursor, source: str, target: str, columns: str, last_id: int, batch_size: int):
+    cursor.execute(
+        f"SELECT max(id) FROM (SELECT id FROM {source} WHERE id > %s ORDER BY id LIMIT %s) batch",
+        (last_id, batch_size)
+    )
+    upper = cursor.fetchone()[0]
+    if upper is None:
+        return None
+    cursor.execute(
+        f"INSERT INTO {target} ({columns}) SELECT {columns} FROM {source} WHERE id > %s AND id <= %s",
+        (last_id, upper)
+    )
+    return upper
+
+def _reconcile(cursor, source: str, target: str, columns: str) -> tuple:
+    """
+    Make target hold exactly source's rows, whatever was written or deleted
+    during the copy. Rows are never updated in place, so (session_id, id)
+    identifies a row's content. Returns (rows inserted, rows deleted).
+    """
+    cursor.execute(f"""
+        INSERT INTO {target} ({columns})
+        SELECT {columns} FROM {source} s
+        WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE t.session_id = s.session_id AND t.id = s.id)
+    """)
+    inserted = cursor.rowcount
+    cursor.execute(f"""
+        DELETE FROM {target} t
+        WHERE NOT EXISTS (SELECT 1 FROM {source} s WHERE s.session_id = t.session_id AND s.id = t.id)
+    """)
+    return inserted, cursor.rowcount
+
+def partition_chats(engine=None, partitions: int = 16, batch_size: int = 50_000) -> bool:
+    """
+    Hash-partition chats_2 by session_id into `partitions` tables.
+
+    Returns False if chats_2 is already partitioned, True after a conversion.
+    """
+    if engine is None:
+        from database import engine
+
+    staging = f"{TABLE_NAME}_partitioned"
+    with autocommit_connection(engine) as connection:
+        with connection.cursor() as cursor:
+            if is_partitioned(cursor):
+                print(f"{TABLE_NAME} is already partitioned")
+                return False
+
+            started = time.perf_counter()
+            cursor.execute(f"DROP TABLE IF EXISTS {staging} CASCADE")  # Leftover from an interrupted run
+            cursor.execute(f"""
+                CREATE TABLE {staging} (
+                    LIKE {TABLE_NAME} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED INCLUDING STORAGE
+                ) PARTITION BY HASH (session_id)
+            """)
+            # Partitioned keys must contain the partition column; INCLUDE keeps the token window index-only
+            cursor.execute(
+                f"ALTER TABLE {staging} ADD CONSTRAINT {staging}_pkey "
+                f"PRIMARY KEY (session_id, id) INCLUDE (sender, token_count)"
+            )
+            for remainder in range(partitions):
+                cursor.execute(
+                    f"CREATE TABLE {TABLE_NAME}_p{remainder} PARTITION OF {staging} "
+                    f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+                )
+
+            # Recreate other indexes (e.g. search) on the new table under temporary names
+            indexes = _secondary_indexes(cursor, TABLE_NAME)
+            for name, definition in indexes:
+                definition = re.sub(
+                    r"\bINDEX \S+ ON (ONLY )?(\S+\.)?\S+",
+                    f'INDEX "{name[:50]}_new" ON {staging}',
+                    definition,
+                    count=1
+                )
+                cursor.execute(definition)
+
+            # Bulk copy while the old table keeps taking writes
+            columns = _copy_columns(cursor, TABLE_NAME)
+            last_id, copied_batches = 0, 0
+            while True:
+                upper = _copy_batch(cursor, TABLE_NAME, staging, columns, last_id, batch_size)
+                if upper is None:
+                    break
+                last_id = upper
+                copied_batches += 1
+                if copied_batches % 20 == 0:
+                    print(f"Copied rows up to id {last_id}")
+
+            # The id watermark misses rows committed late under lower ids and rows
+            # deleted behind it, so reconcile the whole table, then swap names
+            cursor.execute("BEGIN")
+            try:
+                cursor.execute(f"LOCK TABLE {TABLE_NAME} IN EXCLUSIVE MODE")
+                inserted, deleted = _reconcile(cursor, TABLE_NAME, staging, columns)
+                print(f"Reconciled under lock: {inserted} rows added, {deleted} removed")
+                # Copied rows already carry what the triggers compute; new writes need them
+                for definition in _triggers(cursor, TABLE_NAME):
+                    cursor.execute(re.sub(r"\bON (ONLY )?(\S+\.)?\S+", f"ON {staging}", definition, count=1))
+                legacy = f"{TABLE_NAME}{LEGACY_SUFFIX}"
+                cursor.execute(f"ALTER TABLE {TABLE_NAME} RENAME TO {legacy}")
+                cursor.execute(f"ALTER INDEX IF EXISTS {TABLE_NAME}_pkey RENAME TO {legacy}_pkey")
+                cursor.execute(
+                    "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s",
+                    (legacy,)
+                )
+                for (name,) in cursor.fetchall():
+                    if name != f"{legacy}_pkey":
+                        cursor.execute(f'ALTER INDEX "{name}" RENAME TO "{name[:48]}_unpart"')
+                cursor.execute(f"ALTER TABLE {staging} RENAME TO {TABLE_NAME}")
+                cursor.execute(f"ALTER INDEX {staging}_pkey RENAME TO {TABLE_NAME}_pkey")
+                for name, _ in indexes:
+                    cursor.execute(f'ALTER INDEX "{name[:50]}_new" RENAME TO "{name}"')
+                cursor.execute(f"ALTER SEQUENCE IF EXISTS {TABLE_NAME}_id_seq OWNED BY {TABLE_NAME}.id")
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+
+            cursor.execute(f"ANALYZE {TABLE_NAME}")
+            print(
+                f"Partitioned {TABLE_NAME} into {partitions} partitions in "
+                f"{time.perf_counter() - started:.1f}s; old table kept as {TABLE_NAME}{LEGACY_SUFFIX}"
+            )
+            return True
@@ -0,0 +1,214 @@
+''' Versioned schema migrations
+
+Migrations are the numbered .sql files in migrations/versions, applied in
+order and recorded in the schema_migrations table. A file whose first line
+is "-- migrate: no-transaction" runs statement by statement outside a
+transaction (needed for CREATE INDEX CONCURRENTLY); every other file is
+applied atomically.
+
+Usage (from the Backend directory):
+    python -m migrations.runner                 # apply pending migrations
+    python -m migrations.runner status          # list applied / pending
+    python -m migrations.runner partition-chats --partitions 16
+    python -m migrations.runner backfill-search  # search vectors of messages older than 0009
+'''
+import argparse
+import os
+import re
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, NamedTuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+MIGRATIONS_DIR = Path(__file__).parent / "versions"
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+# Arbitrary key for pg_advisory_lock, so concurrent workers migrate one at a time
+MIGRATION_LOCK_KEY = 7_210_008
+CONCURRENT_INDEX_RE = re.compile(
+    r'CREATE\s+(UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+("[^"]+"|\w+)\s+ON\s+("[^"]+"|[\w.]+)',
+    re.IGNORECASE
+)
+
+class Migration(NamedTuple):
+    version: str
+    path: Path
+    transactional: bool
+
+def discover_migrations() -> List[Migration]:
+    """Return all migration files in version order."""
+    migrations = []
+    for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        first_line = path.read_text().split("\n", 1)[0].strip()
+        migrations.append(Migration(
+            version=path.stem,
+            path=path,
+            transactional=first_line != NO_TRANSACTION_MARKER
+        ))
+    return migrations
+
+def split_statements(sql: str) -> List[str]:
+    """Split a migration file into statements (one per trailing semicolon)."""
+    without_comments = "\n".join(
+        line for line in sql.splitlines() if not line.strip().startswith("--")
+    )
+    return [stmt.strip() for stmt in re.split(r";\s*(?:\n|$)", without_comments) if stmt.strip()]
+
+def _applied_versions(cursor) -> set:
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(255) PRIMARY KEY,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+def _drop_invalid_index(cursor, name: str) -> None:
+    # A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which
+    # IF NOT EXISTS would then skip; drop it so the build is retried
+    cursor.execute(
+        "SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(%s) AND NOT indisvalid", (name,)
+    )
+    if cursor.fetchone():
+        print(f"Dropping invalid index {name} left by an earlier run")
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+def _create_index_concurrently(cursor, statement: str, match) -> None:
+    unique, name, table = match.group(1) or "", match.group(2), match.group(3)
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cursor.fetchone()
+    if row is None or row[0] != "p":
+        _drop_invalid_index(cursor, name)
+        cursor.execute(statement)
+        return
+
+    # CONCURRENTLY is not supported on a partitioned table (e.g. chats_2 after
+    # partition-chats): build each partition's index concurrently and attach it
+    # to an index on the parent alone, which becomes valid once all are attached
+    cursor.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (name,))
+    row = cursor.fetchone()
+    if row is not None and row[0]:
+        return
+    definition = statement[match.end():]
+    cursor.execute(f"CREATE {unique}INDEX IF NOT EXISTS {name} ON ONLY {table}{definition}")
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname",
+        (table,)
+    )
+    for (partition,) in cursor.fetchall():
+        child = '"' + f"{partition}_{name.strip(chr(34))}"[:63] + '"'
+        _drop_invalid_index(cursor, child)
+        cursor.execute(f'CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {child} ON "{partition}"{definition}')
+        cursor.execute(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+
+def _apply(cursor, migration: Migration) -> None:
+    statements = split_statements(migration.path.read_text())
+    if migration.transactional:
+        cursor.execute("BEGIN")
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (migration.version,))
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+    else:
+        # Statements must be idempotent (IF [NOT] EXISTS) so a failed run can be retried
+        for statement in statements:
+            index = CONCURRENT_INDEX_RE.match(statement)
+            if index:
+                _create_index_concurrently(cursor, statement, index)
+            else:
+                cursor.execute(statement)
+        cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (migration.version,))
+
+@contextmanager
+def autocommit_connection(engine):
+    """
+    Borrow a pooled DBAPI connection in autocommit mode, so statements such
+    as CREATE INDEX CONCURRENTLY can run, and hand it back in its default mode.
+    """
+    fairy = engine.raw_connection()
+    connection = fairy.dbapi_connection  # The pool proxy does not forward attribute writes
+    try:
+        connection.rollback()  # autocommit cannot be switched inside a transaction
+        connection.autocommit = True
+        yield connection
+    finally:
+        connection.autocommit = False
+        fairy.close()  # Back to the pool
+
+def run_migrations(engine=None) -> List[str]:
+    """
+    Apply pending migrations and return the versions applied.
+
+    Safe to call from several processes at once: a Postgres advisory lock
+    serialises them and later callers find nothing left to do.
+    """
+    if engine is None:
+        from database import engine
+
+    applied_now = []
+    with autocommit_connection(engine) as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+            try:
+                applied = _applied_versions(cursor)
+                for migration in discover_migrations():
+                    if migration.version in applied:
+                        continue
+                    print(f"Applying migration {migration.version}")
+                    _apply(cursor, migration)
+                    applied_now.append(migration.version)
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+    return applied_now
+
+def migration_status(engine=None) -> List[tuple]:
+    """Return (version, applied) for every known migration."""
+    if engine is None:
+        from database import engine
+
+    with autocommit_connection(engine) as connection:
+        with connection.cursor() as cursor:
+            applied = _applied_versions(cursor)
+    return [(m.version, m.version in applied) for m in discover_migrations()]
+
+def main():
+    parser = argparse.ArgumentParser(description="ChatBot schema migrations")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("upgrade", help="Apply pending migrations (default)")
+    subparsers.add_parser("status", help="Show applied and pending migrations")
+    partition_parser = subparsers.add_parser(
+        "partition-chats", help="Convert chats_2 to a hash-partitioned table, copying existing rows"
+    )
+    partition_parser.add_argument("--partitions", type=int, default=16)
+    partition_parser.add_argument("--batch-size", type=int, default=50_000)
+    backfill_parser = subparsers.add_parser(
+        "backfill-search", help="Compute chats_2.search_vector for messages written before migration 0009"
+    )
+    backfill_parser.add_argument("--batch-sessions", type=int, default=200)
+    backfill_parser.add_argument("--pause", type=float, default=0.05, help="Seconds to sleep between batches")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        for version, applied in migration_status():
+            print(f"{'applied' if applied else 'pending':<8} {version}")
+    elif args.command == "partition-chats":
+        from migrations.partition_chats import partition_chats
+        run_migrations()
+        partition_chats(partitions=args.partitions, batch_size=args.batch_size)
+    elif args.command == "backfill-search":
+        from migrations.backfill_search import backfill_search
+        run_migrations()
+        backfill_search(batch_sessions=args.batch_sessions, pause=args.pause)
+    else:
+        applied = run_migrations()
+        print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+-- Baseline: the schema previously created by Base.metadata.create_all.
+-- Every statement is idempotent so existing databases adopt it unchanged.
+
+CREATE SEQUENCE IF NOT EXISTS user_id_seq;
+CREATE SEQUENCE IF NOT EXISTS session_id_seq;
+
+CREATE TABLE IF NOT EXISTS "User" (
+    id INTEGER NOT NULL,
+    name VARCHAR(100),
+    password VARCHAR(255),
+    email VARCHAR(255),
+    PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS "ix_User_email" ON "User" (email);
+CREATE INDEX IF NOT EXISTS "ix_User_name" ON "User" (name);
+CREATE INDEX IF NOT EXISTS "ix_User_id" ON "User" (id);
+
+CREATE TABLE IF NOT EXISTS "Session" (
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    session_token VARCHAR(255) NOT NULL,
+    session_short_name VARCHAR(100),
+    PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS "ix_Session_session_token" ON "Session" (session_token);
+CREATE INDEX IF NOT EXISTS "ix_Session_user_id" ON "Session" (user_id);
+CREATE INDEX IF NOT EXISTS "ix_Session_id" ON "Session" (id);
+CREATE INDEX IF NOT EXISTS "ix_Session_session_short_name" ON "Session" (session_short_name);
+
+CREATE TABLE IF NOT EXISTS chats_2 (
+    id SERIAL NOT NULL,
+    session_id VARCHAR(255) NOT NULL,
+    messages TEXT NOT NULL,
+    sender VARCHAR(10) NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE INDEX IF NOT EXISTS ix_chats_2_id ON chats_2 (id);
+CREATE INDEX IF NOT EXISTS ix_chats_2_session_id ON chats_2 (session_id);
@@ -0,0 +1,2 @@
+-- Per-message token counts used by the prompt history window.
+ALTER TABLE chats_2 ADD COLUMN IF NOT EXISTS token_count INTEGER;
@@ -0,0 +1,10 @@
+-- migrate: no-transaction
+-- History reads filter on session_id and order by id. One (session_id, id)
+-- index serves both, and INCLUDE lets the prompt window's token totals be
+-- summed without the heap (only the messages inside the window are fetched).
+-- Built CONCURRENTLY so writes continue on large tables; the single-column
+-- indexes it replaces are dropped afterwards (the primary key still covers id).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chats_2_session_id_id
+    ON chats_2 (session_id, id) INCLUDE (sender, token_count);
+DROP INDEX CONCURRENTLY IF EXISTS ix_chats_2_session_id;
+DROP INDEX CONCURRENTLY IF EXISTS ix_chats_2_id;
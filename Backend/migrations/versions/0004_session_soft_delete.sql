@@ -0,0 +1,4 @@
+-- Sessions are soft-deleted first; the background purger removes their
+-- chats_2 rows in batches and then the Session row itself.
+ALTER TABLE "Session" ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMPTZ;
+CREATE INDEX IF NOT EXISTS "ix_Session_deleted_at" ON "Session" (deleted_at) WHERE deleted_at IS NOT NULL;
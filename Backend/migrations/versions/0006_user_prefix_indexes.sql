@@ -0,0 +1,6 @@
+-- migrate: no-transaction
+-- GET /users filters on email / name prefixes (LIKE 'abc%'). The existing
+-- btree indexes only serve LIKE under the C collation, so add pattern_ops
+-- indexes that work with any database collation.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_User_email_pattern" ON "User" (email varchar_pattern_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_User_name_pattern" ON "User" (name varchar_pattern_ops);
@@ -0,0 +1,4 @@
+-- Creation times for sessions and messages, used to order session lists by
+-- last activity. Rows that predate this migration get the migration time.
+ALTER TABLE "Session" ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE chats_2 ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT now();
@@ -0,0 +1,16 @@
+-- Cold storage for idle sessions (workers/session_archiver.py): a session's
+-- chats_2 rows as one zstd-compressed blob, moved back on first access.
+-- The last-message columns keep session lists correct without reading the blob.
+CREATE TABLE IF NOT EXISTS chats_archive (
+    session_id VARCHAR(255) PRIMARY KEY,
+    blob BYTEA NOT NULL,
+    message_count INTEGER NOT NULL,
+    first_id INTEGER NOT NULL,
+    last_id INTEGER NOT NULL,
+    last_message TEXT,
+    last_sender VARCHAR(10),
+    last_activity_at TIMESTAMPTZ NOT NULL,
+    raw_bytes BIGINT NOT NULL,
+    compressed_bytes BIGINT NOT NULL,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
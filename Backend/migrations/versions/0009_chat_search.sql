@@ -0,0 +1,14 @@
+-- Full-text search over a user's messages (crud/search_crud.py). The
+-- tsvector is a plain nullable column, so adding it is a catalog change
+-- that does not rewrite chats_2. A trigger fills it on every insert;
+-- messages written before this migration get theirs from
+-- 'python -m migrations.runner backfill-search', in batches. The GIN
+-- indexes are built concurrently by 0010.
+-- The text search configuration here must match models.SEARCH_TS_CONFIG.
+ALTER TABLE chats_2 ADD COLUMN IF NOT EXISTS search_vector tsvector;
+DROP TRIGGER IF EXISTS chats_2_search_vector ON chats_2;
+CREATE TRIGGER chats_2_search_vector BEFORE INSERT OR UPDATE OF messages ON chats_2
+    FOR EACH ROW EXECUTE FUNCTION tsvector_update_trigger(search_vector, 'pg_catalog.english', messages);
+-- Archived sessions keep the lexemes of all their messages (without
+-- positions), so a search can find them without decompressing any blob
+ALTER TABLE chats_archive ADD COLUMN IF NOT EXISTS search_vector tsvector;
@@ -0,0 +1,5 @@
+-- migrate: no-transaction
+-- GIN indexes for full-text search (0009), built concurrently so chat
+-- writes and rehydrations continue while they build.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chats_2_search_vector ON chats_2 USING GIN (search_vector);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chats_archive_search_vector ON chats_archive USING GIN (search_vector);
@@ -0,0 +1,14 @@
+-- Status of session-name jobs (workers/session_name_queue.py), so a poll that
+-- reaches a different worker process than the one that queued the job can
+-- still answer it. Finished rows are deleted after NAME_JOB_RETENTION.
+CREATE TABLE IF NOT EXISTS session_name_jobs (
+    job_id VARCHAR(36) PRIMARY KEY,
+    session_token VARCHAR(255) NOT NULL,
+    status VARCHAR(16) NOT NULL,
+    session_name VARCHAR(100),
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    finished_at TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS ix_session_name_jobs_finished_at ON session_name_jobs (finished_at);
@@ -1,6 +1,11 @@
-from sqlalchemy import Column, Integer, String, VARCHAR, Sequence, Text
+from sqlalchemy import Column, Integer, BigInteger, String, VARCHAR, Sequence, Text, Index, DateTime, LargeBinary, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from database import Base
 
+# Text search configuration of the search_vector columns; changing it needs a migration
+SEARCH_TS_CONFIG = "english"
+
 class User(Base):
     __tablename__ = "User"
 
@@ -16,11 +21,40 @@ class SessionModel(Base):
     user_id = Column(Integer, index=True, nullable=False)
     session_token = Column(VARCHAR(255), unique=True, index=True, nullable=False)
     session_short_name = Column(String(100), index=True, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    deleted_at = Column(DateTime(timezone=True), nullable=True)  # Set on delete; rows are purged in the background
 
 class ChatModel(Base):
+    # Schema changes ship as versioned migrations (migrations/versions), not create_all
     __tablename__ = "chats_2"
+    __table_args__ = (
+        # History reads filter on session_id and order by id
+        Index("ix_chats_2_session_id_id", "session_id", "id", postgresql_include=["sender", "token_count"]),
+        Index("ix_chats_2_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)  # Changed from VARCHAR
-    session_id = Column(String(255), index=True, nullable=False)  # Changed nullable to False
+    id = Column(Integer, primary_key=True, autoincrement=True)  # Changed from VARCHAR
+    session_id = Column(String(255), nullable=False)  # Changed nullable to False
     messages = Column(Text, nullable=False)  # Changed to Text and nullable False
-    sender = Column(String(10), nullable=False)  # Added length and nullable False
\ No newline at end of file
+    sender = Column(String(10), nullable=False)  # Added length and nullable False
+    token_count = Column(Integer, nullable=True)  # Estimated tokens, written at insert time
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # Filled by a trigger on insert (migrations/versions/0009_chat_search.sql); only search reads it
+    search_vector = deferred(Column(TSVECTOR, nullable=True))
+
+class ChatArchiveModel(Base):
+    # One row per archived session: its chats_2 rows as a zstd blob (crud/archive_crud.py)
+    __tablename__ = "chats_archive"
+
+    session_id = Column(String(255), primary_key=True)
+    blob = Column(LargeBinary, nullable=False)
+    message_count = Column(Integer, nullable=False)
+    first_id = Column(Integer, nullable=False)
+    last_id = Column(Integer, nullable=False)
+    last_message = Column(Text, nullable=True)
+    last_sender = Column(String(10), nullable=True)
+    last_activity_at = Column(DateTime(timezone=True), nullable=False)
+    raw_bytes = Column(BigInteger, nullable=False)  # Size of the uncompressed payload
+    compressed_bytes = Column(BigInteger, nullable=False)
+    archived_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    search_vector = deferred(Column(TSVECTOR, nullable=True))  # Lexemes of every archived message, for search
@@ -0,0 +1,295 @@
+''' Sampling profiler for individual requests, kept in a ring buffer
+
+While profiling is on, a single background thread samples Python stacks
+every PROFILER_INTERVAL seconds and attributes each sample to the request
+it belongs to:
+
+    - async requests are sampled through their asyncio task: its live
+      stack while it runs on the event loop, otherwise the chain of
+      coroutines it is suspended in (ending in an "[await ...]" frame), so
+      profiles show wall-clock time, including waits on the model or DB;
+    - threadpool samples (sync endpoints) go to the in-flight requests
+      whose endpoint function is on the sampled stack.
+
+A finished request's profile is kept when profiling is enabled for every
+request (PROFILER_ENABLED) or when it took longer than
+PROFILER_SLOW_THRESHOLD seconds. The last PROFILER_MAX_PROFILES profiles
+are served by routers/admin.py in the folded-stack format read by
+flamegraph.pl, speedscope and inferno.
+
+With PROFILER_ENABLED off and PROFILER_SLOW_THRESHOLD at 0 the middleware
+is a single attribute check per request and no thread runs.
+'''
+import asyncio
+import itertools
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILER_SLOW_THRESHOLD = float(os.getenv("PROFILER_SLOW_THRESHOLD", "0"))
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.005"))
+PROFILER_MAX_PROFILES = int(os.getenv("PROFILER_MAX_PROFILES", "50"))
+# Deepest stack kept per sample; deeper frames are cut at the root end
+MAX_STACK_DEPTH = 128
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+def _fold(frame) -> str:
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+def _stack_codes(frame) -> set:
+    codes = set()
+    while frame is not None:
+        codes.add(frame.f_code)
+        frame = frame.f_back
+    return codes
+
+class _ActiveRequest:
+    def __init__(self, scope: dict, task, loop_thread: int):
+        self.scope = scope
+        self.task = task
+        self.loop_thread = loop_thread
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.samples: Counter = Counter()
+
+    def endpoint_code(self):
+        route = self.scope.get("route")
+        endpoint = getattr(route, "endpoint", None)
+        return getattr(endpoint, "__code__", None)
+
+class Profile:
+    """One finished request's samples."""
+
+    def __init__(self, active: _ActiveRequest, status: Optional[int], duration: float, reason: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = active.scope.get("method", "")
+        self.path = active.scope.get("path", "")
+        self.status = status
+        self.duration = duration
+        self.started_at = active.started_at
+        self.reason = reason
+        self.samples = active.samples
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 2),
+            "started_at": self.started_at,
+            "reason": self.reason,
+            "samples": sum(self.samples.values()),
+        }
+
+    def folded(self) -> str:
+        """Folded stacks ("root;frame;frame count" per line) rooted at the request line."""
+        root = f"{self.method} {self.path}"
+        return "".join(
+            f"{root};{stack} {count}\n" if stack else f"{root} {count}\n"
+            for stack, count in self.samples.most_common()
+        )
+
+class RequestProfiler:
+    def __init__(
+        self,
+        enabled: bool = PROFILER_ENABLED,
+        slow_threshold: float = PROFILER_SLOW_THRESHOLD,
+        interval: float = PROFILER_INTERVAL,
+        max_profiles: int = PROFILER_MAX_PROFILES
+    ):
+        self.enabled = enabled
+        self.slow_threshold = slow_threshold
+        self.interval = interval
+        self.profiles: Deque[Profile] = deque(maxlen=max_profiles)
+        self._active: Dict[int, _ActiveRequest] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.samples_taken = 0
+
+    @property
+    def active(self) -> bool:
+        """Whether requests are being sampled at all."""
+        return self.enabled or self.slow_threshold > 0
+
+    def configure(self, enabled: Optional[bool] = None, slow_threshold: Optional[float] = None) -> None:
+        if enabled is not None:
+            self.enabled = enabled
+        if slow_threshold is not None:
+            self.slow_threshold = slow_threshold
+
+    # Request lifecycle, called from the middleware on the event loop
+
+    def begin(self, scope: dict) -> int:
+        token = next(self._ids)
+        active = _ActiveRequest(scope, asyncio.current_task(), threading.get_ident())
+        with self._lock:
+            self._active[token] = active
+        self._ensure_thread()
+        self._wake.set()
+        return token
+
+    def end(self, token: int, status: Optional[int]) -> None:
+        with self._lock:
+            active = self._active.pop(token, None)
+        if active is None:
+            return
+        duration = time.perf_counter() - active.started
+        if self.enabled:
+            reason = "enabled"
+        elif self.slow_threshold > 0 and duration >= self.slow_threshold:
+            reason = "slow"
+        else:
+            return
+        self.profiles.append(Profile(active, status, duration, reason))
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        for profile in list(self.profiles):
+            if profile.id == profile_id:
+                return profile
+        return None
+
+    def clear(self) -> None:
+        self.profiles.clear()
+
+    # Sampler thread
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.is_set():
+            self._wake.clear()
+            with self._lock:
+                active = list(self._active.values())
+            if not active:
+                self._wake.wait(1.0)
+                continue
+            self._sample(active, own)
+            self.samples_taken += 1
+            time.sleep(self.interval)
+
+    def _sample(self, active: List[_ActiveRequest], own: int) -> None:
+        frames = sys._current_frames()
+        loop_threads = {request.loop_thread for request in active}
+
+        # Async requests: the live stack if the task is running, else where it is suspended
+        for request in active:
+            task = request.task
+            if task is None or task.done():
+                continue
+            if _running_task(task) is task:
+                frame = frames.get(request.loop_thread)
+                if frame is not None:
+                    request.samples[_fold(frame)] += 1
+            else:
+                request.samples[_await_stack(task)] += 1
+
+        # Worker threads (sync endpoints): match the endpoint function on the stack
+        by_code = {}
+        for request in active:
+            code = request.endpoint_code()
+            if code is not None:
+                by_code.setdefault(code, []).append(request)
+        if not by_code:
+            return
+        for thread_id, frame in frames.items():
+            if thread_id == own or thread_id in loop_threads:
+                continue
+            codes = _stack_codes(frame)
+            matched = [request for code, requests in by_code.items() if code in codes for request in requests]
+            if matched:
+                stack = _fold(frame)
+                for request in matched:  # Concurrent calls of one sync route share samples
+                    request.samples[stack] += 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "slow_threshold": self.slow_threshold,
+            "interval": self.interval,
+            "in_flight": len(self._active),
+            "profiles": len(self.profiles),
+            "max_profiles": self.profiles.maxlen,
+            "samples_taken": self.samples_taken,
+        }
+
+def _await_stack(task) -> str:
+    """Folded coroutine chain of a suspended task, outermost first."""
+    labels = []
+    awaitable = task.get_coro()
+    while awaitable is not None and len(labels) < MAX_STACK_DEPTH:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None) or getattr(awaitable, "ag_frame", None)
+        if frame is None:
+            labels.append(f"[await {type(awaitable).__name__}]")
+            break
+        labels.append(_frame_label(frame))
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None) or getattr(awaitable, "ag_await", None)
+    return ";".join(labels)
+
+def _running_task(task):
+    """The task currently running on task's event loop, read from the sampler thread."""
+    if task is None:
+        return None
+    try:
+        return asyncio.current_task(task.get_loop())
+    except RuntimeError:
+        return None
+
+class ProfilerMiddleware:
+    """ASGI middleware feeding request_profiler; a pass-through while profiling is off."""
+
+    def __init__(self, app, profiler: "RequestProfiler" = None):
+        self.app = app
+        self.profiler = profiler or request_profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.active:
+            return await self.app(scope, receive, send)
+
+        token = self.profiler.begin(scope)
+        status = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.profiler.end(token, status)
+
+request_profiler = RequestProfiler()
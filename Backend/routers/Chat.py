@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
+import asyncio
+import hashlib
+import json
 import sys
 import os
-from typing import List
+from typing import Optional
 import crud.chat_crud as chat_crud
 import schemas.chat_schemas as chat_schemas
 
@@ -11,12 +15,17 @@ import schemas.chat_schemas as chat_schemas
 agent_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Agent'))
 sys.path.insert(0, agent_path)
 
-from Agent.Chat import chat_with_agent
+from Agent.llm_governor import llm_governor, LLMUnavailable
 
 import schemas.sessions_schemas as session_schemas
 import crud.sessions_crud as sessions_crud
 import database
-import models
+import fast_json
+from single_flight import SingleFlight
+
+# Identical messages to one session within this many seconds are answered once (double submits, retries)
+CHAT_DEDUP_WINDOW = float(os.getenv("CHAT_DEDUP_WINDOW", "5"))
+chat_turns = SingleFlight(window=CHAT_DEDUP_WINDOW)
 
 router = APIRouter(
     prefix="/chat",
@@ -32,52 +41,150 @@ class ChatResponse(BaseModel):
     response: str
     session_token: str
 
-from schemas.chat_schemas import ChatMessage, ChatResponse as ChatMessageResponse
-
-class ChatHistoryResponse(BaseModel):
-    messages: List[ChatMessage]
-    session_token: str
+def turn_key(session_token: str, message: str) -> tuple:
+    """chat_turns key: the same message to the same session is one turn, streamed or not."""
+    return (session_token, hashlib.sha256(message.encode("utf-8")).hexdigest())
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def llm_unavailable(e: LLMUnavailable) -> HTTPException:
+    """503 telling the client when to try again."""
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": e.retry_after_header}
+    )
 
 @router.post("/", response_model=ChatResponse)
-def chat(chat_request: ChatRequest, db: Session = Depends(get_db)):
+async def chat(chat_request: ChatRequest, db: AsyncSession = Depends(database.get_async_db)):
     # Verify session exists
-    session_exists = db.query(models.SessionModel).filter(
-        models.SessionModel.session_token == chat_request.session_token
-    ).first()
-    
-    if not session_exists:
+    if not await sessions_crud.session_exists(db, chat_request.session_token):
         raise HTTPException(status_code=404, detail="Session not found")
     
     try:
-        # Use session_token as session_id for the chat agent
-        ai_response = chat_with_agent(chat_request.session_token, chat_request.message)
+        # Use session_token as session_id for the chat agent, on this request's connection.
+        # Duplicates of a turn that is running (or just ran) share its reply and its stored rows.
+        key = turn_key(chat_request.session_token, chat_request.message)
+        # Imported here rather than at module load: it pulls in LangChain and the model SDK,
+        # which the lifespan warm-up (startup.py) has normally loaded already
+        from Agent.Chat import chat_with_agent
+        ai_response = await chat_turns.do(
+            key,
+            lambda: chat_with_agent(chat_request.session_token, chat_request.message, db=db)
+        )
         
         return ChatResponse(
             response=ai_response,
             session_token=chat_request.session_token
         )
+    except LLMUnavailable as e:
+        raise llm_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
 
-@router.get("/{session_token}", response_model=chat_schemas.ChatResponse)
-def get_chat(session_token: str, db: Session = Depends(get_db)):
+def format_sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def chat_event_stream(session_token: str, message: str):
+    """
+    SSE frames of one streamed turn, coalesced through chat_turns like POST /chat.
+    The leader relays tokens as they arrive; a duplicate (a double submit, or
+    the same message sent to POST /chat) gets the leader's full reply as a
+    single "token" event instead of running the model again.
+    """
+    from Agent.Chat import stream_chat_with_agent
+    tokens: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+
+    async def stream_turn() -> str:
+        # Only runs in the leader; its tokens reach this response through the queue
+        parts = []
+        async for token in stream_chat_with_agent(session_token, message):
+            parts.append(token)
+            tokens.put_nowait(token)
+        return "".join(parts)
+
+    # A task of its own, so the generator can yield while the turn runs
+    turn = asyncio.ensure_future(chat_turns.do(turn_key(session_token, message), stream_turn))
+    turn.add_done_callback(lambda _: tokens.put_nowait(None))
+    streamed = False
+    try:
+        while True:
+            token = await tokens.get()
+            if token is None:
+                break
+            streamed = True
+            yield format_sse("token", {"content": token})
+        reply = turn.result()
+        if not streamed and reply:
+            yield format_sse("token", {"content": reply})
+        yield format_sse("done", {"session_token": session_token})
+    except LLMUnavailable as e:
+        yield format_sse("error", {"detail": str(e), "retry_after": e.retry_after_header})
+    except Exception as e:
+        yield format_sse("error", {"detail": f"Chat processing failed: {str(e)}"})
+    finally:
+        # The client went away mid-stream; the agent still stores the partial reply
+        turn.cancel()
+
+@router.post("/stream")
+async def chat_stream(chat_request: ChatRequest, db: AsyncSession = Depends(database.get_async_db)):
+    """
+    Streaming variant of POST /chat: the reply is sent as Server-Sent Events,
+    one "token" event per chunk, followed by "done" (or "error"). A duplicate
+    of a turn that is running (or just ran) receives its reply in one "token" event.
+    """
     # Verify session exists
-    session_exists = db.query(models.SessionModel).filter(
-        models.SessionModel.session_token == session_token
-    ).first()
+    if not await sessions_crud.session_exists(db, chat_request.session_token):
+        raise HTTPException(status_code=404, detail="Session not found")
+    # Answer 503 up front rather than as an event once the stream has started
+    try:
+        llm_governor.ensure_available()
+    except LLMUnavailable as e:
+        raise llm_unavailable(e)
+
+    return StreamingResponse(
+        chat_event_stream(chat_request.session_token, chat_request.message),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Disable proxy buffering so tokens flush immediately
+        },
+    )
 
-    if not session_exists:
+@router.get("/llm/stats")
+def llm_stats():
+    """Concurrency limit, breaker state and retry counters of the shared LLM governor, and LLM response cache hits per route"""
+    # Deferred like the other Agent imports: response_cache pulls in LangChain
+    from Agent.response_cache import cache_stats
+    return {**llm_governor.stats(), "chat_single_flight": chat_turns.stats(), "llm_response_cache": cache_stats()}
+
+@router.get("/{session_token}", response_model=chat_schemas.ChatResponse)
+async def get_chat(
+    request: Request,
+    session_token: str,
+    before: Optional[int] = Query(None, description="Return messages older than this id"),
+    after: Optional[int] = Query(None, description="Return messages newer than this id"),
+    limit: int = Query(chat_crud.CHAT_PAGE_DEFAULT_LIMIT, ge=1, le=chat_crud.CHAT_STREAM_MAX_LIMIT),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """
+    Page through a session's messages, newest first.
+    Follow next_cursor with ``before`` (or ``after`` when paging forwards).
+    Pages over CHAT_PAGE_MAX_LIMIT messages are streamed.
+    """
+    # Verify session exists
+    if not await sessions_crud.session_exists(db, session_token):
         raise HTTPException(status_code=404, detail="Session not found")
 
+    # Rows go straight to JSON bytes (fast_json.py); response_model only documents the shape
+    if limit > chat_crud.CHAT_PAGE_MAX_LIMIT:
+        return fast_json.streaming_json_response(
+            request,
+            chat_crud.stream_chat_messages_json(session_token, before=before, after=after, limit=limit)
+        )
     try:
-        messages = chat_crud.get_chat_messages(db, session_token)
-        return chat_schemas.ChatResponse(messages=messages)
+        body = await chat_crud.get_chat_messages_json(
+            db, session_token, before=before, after=after, limit=limit
+        )
+        return fast_json.json_response(request, body)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Chat fetching failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Chat fetching failed: {str(e)}")
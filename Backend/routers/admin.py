@@ -0,0 +1,132 @@
+from fastapi import APIRouter, Header, HTTPException, Depends, Query, Request
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from typing import Optional
+import os
+import time
+import database
+import fast_json
+import crud.archive_crud as archive_crud
+import crud.transfer_crud as transfer_crud
+import crud.users_crud as users_crud
+from profiler import request_profiler
+from workers.session_archiver import session_archiver
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    dependencies=[Depends(require_admin)],
+    responses={404: {"description": "Not found"}},
+)
+
+class ProfilerSettings(BaseModel):
+    enabled: Optional[bool] = None
+    slow_threshold: Optional[float] = None  # Seconds; 0 turns slow-request capture off
+
+@router.get("/profiler")
+def profiler_status():
+    """Profiler settings and ring-buffer usage for this worker process"""
+    return request_profiler.stats()
+
+@router.patch("/profiler")
+def configure_profiler(settings: ProfilerSettings):
+    """Turn profiling on or off, or change the slow-request threshold, without a restart"""
+    request_profiler.configure(enabled=settings.enabled, slow_threshold=settings.slow_threshold)
+    return request_profiler.stats()
+
+@router.get("/profiles")
+def list_profiles():
+    """Captured request profiles, newest first"""
+    return {"profiles": [profile.summary() for profile in reversed(request_profiler.profiles)]}
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str):
+    """
+    One profile as folded stacks, e.g.
+    curl -H "X-Admin-Token: ..." .../admin/profiles/<id> | flamegraph.pl > profile.svg
+    """
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile.folded())
+
+@router.delete("/profiles")
+def clear_profiles():
+    request_profiler.clear()
+    return {"message": "Profiles cleared"}
+
+@router.get("/archive")
+def archive_status(db: Session = Depends(database.get_db)):
+    """
+    Storage saved by the session archive (all workers, from the database) and
+    this worker's archiver and rehydration-latency stats
+    """
+    return {**archive_crud.archive_report(db), "archiver": session_archiver.stats()}
+
+@router.post("/archive/run")
+def run_archiver():
+    """Start an archive pass on this worker now instead of at the next interval"""
+    session_archiver.notify()
+    return {"message": "Archive pass requested"}
+
+async def _export_chunks(user_id: int):
+    # The export holds a server-side cursor; each chunk is read on the threadpool
+    db = database.SessionLocal()
+    chunks = transfer_crud.export_user_ndjson(db, user_id)
+    try:
+        while (chunk := await run_in_threadpool(next, chunks, None)) is not None:
+            yield chunk
+    finally:
+        def close():
+            chunks.close()
+            db.close()
+        await run_in_threadpool(close)
+
+@router.get("/users/{user_id}/export")
+def export_user(user_id: int, request: Request, db: Session = Depends(database.get_db)):
+    """
+    Stream a user's sessions and messages as NDJSON (crud/transfer_crud.py), e.g.
+    curl -H "X-Admin-Token: ..." .../admin/users/42/export > user-42.ndjson
+    """
+    if not users_crud.check_user_exists_with_id(db, id=user_id):
+        raise HTTPException(status_code=404, detail="User does not exist")
+    return fast_json.streaming_json_response(request, _export_chunks(user_id), media_type="application/x-ndjson")
+
+@router.post("/users/{user_id}/import")
+async def import_user(user_id: int, request: Request, new_tokens: bool = Query(False)):
+    """
+    Load an NDJSON export into a user with COPY. Sessions whose token already
+    exists are skipped; pass new_tokens=true to copy them under new tokens.
+    """
+    started = time.perf_counter()
+    db = database.SessionLocal()
+    try:
+        if not await run_in_threadpool(users_crud.check_user_exists_with_id, db, user_id):
+            raise HTTPException(status_code=404, detail="User does not exist")
+        importer = transfer_crud.NdjsonImporter(db, user_id, new_tokens=new_tokens)
+        try:
+            async for line in transfer_crud.aiter_lines(request.stream()):
+                importer.add_line(line)
+                if importer.full:
+                    await run_in_threadpool(importer.flush)
+            totals = await run_in_threadpool(importer.finish)
+        except ValueError as e:
+            # Batches already flushed stay imported; running the import again skips them
+            raise HTTPException(
+                status_code=400,
+                detail=f"{e} ({importer.sessions_imported} sessions and {importer.messages_imported} messages were imported before it)"
+            )
+    finally:
+        await run_in_threadpool(db.close)
+    return {**totals, "seconds": round(time.perf_counter() - started, 3)}
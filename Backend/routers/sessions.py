@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from typing import Optional
 import schemas.sessions_schemas as session_schemas
 import crud.sessions_crud as sessions_crud
 import crud.users_crud as users_crud
-import crud.chat_crud as chat_crud
+import crud.search_crud as search_crud
 import database
-from Agent.session_name_generator import session_name_generator
+import fast_json
+from Agent.history_cache import history_cache
+from workers.session_name_queue import session_name_queue
 
 router = APIRouter(
     prefix="/sessions",
@@ -37,82 +39,151 @@ def create_session(session: session_schemas.SessionCreate, db: Session = Depends
             "message": "User does not exist"
         }
 
-@router.get("/{user_id}")
-def fetch_sessions(user_id: int, db: Session = Depends(get_db)):
-    if users_crud.check_user_exists_with_id(db, id=user_id):
-        db_sessions = sessions_crud.fetch_session(db, user_id=user_id)
-        if db_sessions:
-            return {
-                "sessions": db_sessions,
-                "message": "Sessions fetched successfully"
-            }
-        else:
-            return {
-                "sessions": [],
-                "message": "No sessions found for this user"
-            }
+@router.get("/{user_id}", response_model=session_schemas.SessionListResponse)
+def fetch_sessions(
+    request: Request,
+    user_id: int,
+    limit: int = Query(sessions_crud.SESSION_PAGE_DEFAULT_LIMIT, ge=1, le=sessions_crud.SESSION_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    List a user's sessions, most recently active first, each with a preview
+    of its last message and its message count. Pass next_cursor back as
+    ``cursor`` for the following page.
+    """
+    try:
+        user_exists, db_sessions, next_cursor = sessions_crud.list_sessions(
+            db,
+            user_id=user_id,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not user_exists:
+        payload = {"sessions": None, "message": "User does not exist", "next_cursor": None}
+    elif db_sessions:
+        payload = {"sessions": db_sessions, "message": "Sessions fetched successfully", "next_cursor": next_cursor}
     else:
-        return {
-            "message": "User does not exist"
-        }
+        payload = {"sessions": [], "message": "No sessions found for this user", "next_cursor": None}
+    # Serialized once with orjson (fast_json.py); response_model only documents the shape
+    return fast_json.json_response(request, fast_json.dumps(payload))
+
+@router.get("/{user_id}/search", response_model=session_schemas.SearchResponse)
+def search_sessions(
+    request: Request,
+    user_id: int,
+    q: str = Query(..., min_length=1, max_length=search_crud.SEARCH_QUERY_MAX_LENGTH),
+    limit: int = Query(search_crud.SEARCH_PAGE_DEFAULT_LIMIT, ge=1, le=search_crud.SEARCH_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Full-text search across a user's sessions. ``q`` takes web search
+    syntax (words, "quoted phrases", OR, -word); results are messages, best
+    match first, each with an HTML-escaped snippet whose matches are wrapped
+    in <mark>. Pass next_cursor back as ``cursor`` for the following page.
+    """
+    if not users_crud.check_user_exists_with_id(db, id=user_id):
+        payload = {"results": None, "message": "User does not exist", "next_cursor": None}
+        return fast_json.json_response(request, fast_json.dumps(payload))
+    try:
+        hits, next_cursor = search_crud.search_messages(db, user_id=user_id, query=q, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    message = "Search completed successfully" if hits else "No messages match the search"
+    payload = {"results": hits, "message": message, "next_cursor": next_cursor}
+    return fast_json.json_response(request, fast_json.dumps(payload))
     
+@router.post("/bulk-delete", response_model=session_schemas.SessionBulkDeleteResponse)
+def delete_sessions(request: session_schemas.SessionBulkDelete, db: Session = Depends(get_db)):
+    """
+    Delete many sessions at once. Sessions are hidden immediately; their
+    messages are removed in the background by the session purger.
+    """
+    deleted = sessions_crud.delete_sessions(db, session_tokens=request.session_tokens)
+    for session_token in deleted:
+        history_cache.invalidate(session_token)
+    deleted_set = set(deleted)
+    return {
+        "message": f"{len(deleted)} session(s) deleted successfully",
+        "deleted": deleted,
+        "not_found": [token for token in request.session_tokens if token not in deleted_set]
+    }
+
 @router.delete("/{session_token}")
 def delete_session(session_token: str, db: Session = Depends(get_db)):
+    # Soft delete returns at once; the purger removes the chat rows in batches after PURGE_GRACE
     db_session = sessions_crud.delete_session(db, session_token=session_token)
-    chat_crud.delete_session(db, session_id=session_token)
     if db_session:
+        history_cache.invalidate(session_token)
         return {
             "message": "Session deleted successfully"
         }
     else:
         raise HTTPException(status_code=404, detail="Session not found")
 
-@router.post("/{session_token}/name", response_model=session_schemas.SessionNameResponse)
+@router.post("/{session_token}/name", status_code=202, response_model=session_schemas.SessionNameJobResponse)
 def generate_session_name(
     session_token: str,
     request: session_schemas.SessionNameRequest,
     db: Session = Depends(get_db)
 ):
     """
-    Generate and store a session name for an existing session
+    Queue generation of a session name for an existing session
+    
+    Returns 202 with a job id at once; poll GET /sessions/name-jobs/{job_id}
+    (optionally with ``wait`` to block until the name is ready). A request
+    for a session that already has a pending job joins that job.
     
     Args:
         session_token: The unique token of the session
         topic: The topic or first message to base the session name on
         db: Database session
     """
-    try:
-        # Generate the session name
-        session_name = session_name_generator(request.topic)
-        
-        # Store the generated name
-        success = sessions_crud.store_session_name(
-            db=db,
-            session_token=session_token,
-            session_short_name=session_name
-        )
-        
-        if success:
-            return {
-                "message": "Session name generated and stored successfully",
-                "session_name": session_name
-            }
-        else:
-            raise HTTPException(
-                status_code=404,
-                detail="Session not found"
-            )
-            
-    except ValueError as e:
-        raise HTTPException(
-            status_code=400,
-            detail=str(e)
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error generating session name: {str(e)}"
-        )
+    if not request.topic:
+        raise HTTPException(status_code=400, detail="Topic is required")
+    if not sessions_crud.check_session_exists(db, session_token):
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    job, created = session_name_queue.submit(session_token, request.topic)
+    return {
+        "message": "Session name generation queued" if created else "Session name generation already in progress",
+        **job.to_dict()
+    }
+
+@router.get("/name-jobs/stats")
+def name_job_stats():
+    """Queue depth, worker usage and job latency for session-name generation"""
+    return session_name_queue.stats()
+
+@router.get("/name-jobs/{job_id}", response_model=session_schemas.SessionNameJobResponse)
+async def get_name_job(job_id: str, wait: float = Query(0, ge=0, le=30)):
+    """
+    Fetch the status of a session-name job.
+    With ``wait`` > 0 the call holds until the job finishes or the wait expires (long poll).
+    """
+    job = session_name_queue.get(job_id)
+    if job is not None:
+        await job.wait(wait)
+        state = job.to_dict()
+    else:
+        # Queued by another worker process; answer from the shared job table
+        state = await session_name_queue.load(job_id, wait)
+        if state is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+    messages = {
+        "queued": "Session name generation queued",
+        "running": "Session name generation in progress",
+        "done": "Session name generated and stored successfully",
+        "failed": "Session name generation failed",
+        "not_found": "Session not found",
+    }
+    return {"message": messages[state["status"]], **state}
 
 @router.patch("/{session_token}/name")
 def update_session_name(
@@ -0,0 +1,81 @@
+''' Tests for single-flight coalescing of streamed chat turns (no model or database needed) '''
+import asyncio
+import sys
+import types
+
+import pytest
+
+import routers.Chat as chat_router
+from single_flight import SingleFlight
+
+@pytest.fixture
+def agent(monkeypatch):
+    """Replaces Agent.Chat with a stream that waits for the test to release it."""
+    state = types.SimpleNamespace(calls=0, release=None)
+
+    async def stream_chat_with_agent(session_id, user_input):
+        state.calls += 1
+        for token in ("Hel", "lo"):
+            await state.release.wait()
+            yield token
+
+    module = types.ModuleType("Agent.Chat")
+    module.stream_chat_with_agent = stream_chat_with_agent
+    monkeypatch.setitem(sys.modules, "Agent.Chat", module)
+    monkeypatch.setattr(chat_router, "chat_turns", SingleFlight(window=60))
+    return state
+
+async def collect(session_token, message):
+    return [frame async for frame in chat_router.chat_event_stream(session_token, message)]
+
+def test_duplicate_stream_replays_the_leaders_reply(agent):
+    async def scenario():
+        agent.release = asyncio.Event()
+        leader = asyncio.create_task(collect("s", "hi"))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(collect("s", "hi"))
+        await asyncio.sleep(0)
+        agent.release.set()
+        return await leader, await follower
+
+    leader, follower = asyncio.run(scenario())
+    assert agent.calls == 1
+    assert leader == [
+        chat_router.format_sse("token", {"content": "Hel"}),
+        chat_router.format_sse("token", {"content": "lo"}),
+        chat_router.format_sse("done", {"session_token": "s"}),
+    ]
+    assert follower == [
+        chat_router.format_sse("token", {"content": "Hello"}),
+        chat_router.format_sse("done", {"session_token": "s"}),
+    ]
+
+def test_other_messages_are_not_coalesced(agent):
+    async def scenario():
+        agent.release = asyncio.Event()
+        agent.release.set()
+        await collect("s", "hi")
+        await collect("s", "something else")
+        await collect("t", "hi")
+
+    asyncio.run(scenario())
+    assert agent.calls == 3
+
+def test_disconnected_leader_hands_the_turn_to_a_follower(agent):
+    async def scenario():
+        agent.release = asyncio.Event()
+        leader = chat_router.chat_event_stream("s", "hi")
+        first = asyncio.create_task(leader.__anext__())
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(collect("s", "hi"))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        await leader.aclose()
+        agent.release.set()
+        return await follower
+
+    follower = asyncio.run(scenario())
+    assert agent.calls == 2
+    assert follower[-1] == chat_router.format_sse("done", {"session_token": "s"})
+    assert "".join(follower[:-1]).count("token") == 2
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import schemas.user_schemas as user_schemas, crud.users_crud as users_crud, database
 
 router = APIRouter(
@@ -16,10 +16,25 @@ def get_db():
     finally:
         db.close()
 
-@router.get("/", response_model=List[user_schemas.UserBase])
-def read_users(db: Session = Depends(get_db)):
-    users = users_crud.get_user(db)
-    return users
+@router.get("/", response_model=user_schemas.UserListResponse)
+def read_users(
+    limit: int = Query(users_crud.USER_PAGE_DEFAULT_LIMIT, ge=1, le=users_crud.USER_PAGE_MAX_LIMIT),
+    cursor: Optional[int] = Query(None, description="Return users with an id greater than this"),
+    email_prefix: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    users, next_cursor = users_crud.get_users(
+        db,
+        limit=limit,
+        cursor=cursor,
+        email_prefix=email_prefix,
+        name_prefix=name_prefix
+    )
+    return {
+        "users": users,
+        "next_cursor": next_cursor
+    }
 
 @router.get("/{user_id}", response_model=user_schemas.UserBase)
 def read_user(user_id: int, db: Session = Depends(get_db)):
@@ -1,7 +1,8 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 class ChatMessage(BaseModel):
+    id: Optional[int] = None
     sender: str
     messages: str
 
@@ -9,4 +10,5 @@ class ChatMessage(BaseModel):
         from_attributes = True
 
 class ChatResponse(BaseModel):
-    messages: List[ChatMessage]
\ No newline at end of file
+    messages: List[ChatMessage]
+    next_cursor: Optional[int] = None  # Pass as before/after to fetch the next page
\ No newline at end of file
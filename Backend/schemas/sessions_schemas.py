@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from datetime import datetime
 from typing import List, Optional
 
 class SessionBase(BaseModel):
@@ -32,6 +33,31 @@ class SessionFetchResponse(BaseModel):
     sessions: Optional[List[SessionData]] = None
     message: str
 
+class SessionSummary(SessionData):
+    last_message: Optional[str] = None  # First characters of the newest message
+    last_sender: Optional[str] = None
+    message_count: int = 0
+    last_activity_at: datetime
+
+class SessionListResponse(BaseModel):
+    sessions: Optional[List[SessionSummary]] = None
+    message: str
+    next_cursor: Optional[str] = None  # Pass as cursor to fetch the next page
+
+class SearchHit(BaseModel):
+    session_token: str
+    session_short_name: Optional[str] = None
+    message_id: int
+    sender: str
+    snippet: str  # HTML-escaped excerpt with the matches wrapped in <mark>
+    rank: float
+    created_at: datetime
+
+class SearchResponse(BaseModel):
+    results: Optional[List[SearchHit]] = None
+    message: str
+    next_cursor: Optional[str] = None  # Pass as cursor to fetch the next page
+
 class SessionNameRequest(BaseModel):
     topic: str
 
@@ -39,5 +65,21 @@ class SessionNameResponse(BaseModel):
     message: str
     session_name: str
 
+class SessionNameJobResponse(BaseModel):
+    message: str
+    job_id: str
+    session_token: str
+    status: str  # queued, running, done, failed or not_found
+    session_name: Optional[str] = None
+    error: Optional[str] = None
+
 class SessionNameUpdate(BaseModel):
-    session_short_name: str
\ No newline at end of file
+    session_short_name: str
+
+class SessionBulkDelete(BaseModel):
+    session_tokens: List[str]
+
+class SessionBulkDeleteResponse(BaseModel):
+    message: str
+    deleted: List[str]
+    not_found: List[str]
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List, Optional
 
 class UserBase(BaseModel):
     name: str
@@ -8,6 +9,18 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     pass
 
+class UserListItem(BaseModel):
+    id: int
+    name: Optional[str] = None
+    email: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class UserListResponse(BaseModel):
+    users: List[UserListItem]
+    next_cursor: Optional[int] = None  # Pass as cursor to fetch the next page
+
 class UserCreateResponse(BaseModel):
     message: str
     id: int
@@ -0,0 +1,67 @@
+''' Single-flight coalescing of identical concurrent async calls
+
+The first caller for a key (the leader) runs the call; callers arriving
+with the same key while it runs (followers) wait for the leader's result
+instead of running their own. Results are also remembered for ``window``
+seconds, so a duplicate that arrives just after the leader finished gets
+the same answer. Coalescing is per process and per event loop.
+'''
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from ttl_cache import TTLCache
+
+T = TypeVar("T")
+
+_MISSING = object()
+
+class _LeaderCancelled(Exception):
+    """The leader went away without a result; a follower takes over."""
+
+class SingleFlight:
+    def __init__(self, window: float = 0.0, max_entries: int = 10000):
+        self.window = window
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self._recent = TTLCache(max_entries=max_entries if window > 0 else 0, ttl=window)
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() for key unless an identical call is running or has just finished."""
+        while True:
+            recent = self._recent.get(key, _MISSING)
+            if recent is not _MISSING:
+                self.coalesced += 1
+                return recent
+            leader = self._in_flight.get(key)
+            if leader is None:
+                break
+            self.coalesced += 1
+            try:
+                # Shielded so a follower that disconnects does not cancel the leader's future
+                return await asyncio.shield(leader)
+            except _LeaderCancelled:
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        self.leaders += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()  # Mark retrieved when nobody was waiting
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            self._recent.set(key, result)
+            return result
+        finally:
+            self._in_flight.pop(key, None)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._in_flight), "leaders": self.leaders, "coalesced": self.coalesced}
@@ -0,0 +1,109 @@
+''' Process startup work, run from the app lifespan instead of at import
+
+Importing main only builds the app and its routes. The slow parts of
+starting a worker run here, in order:
+
+    - migrations: bring the schema up to date (RUN_MIGRATIONS_ON_STARTUP;
+      skipped under gunicorn, whose master has already applied them);
+    - agent: import LangChain and the model SDK and build the shared
+      clients and chains (Agent/agent_registry.py);
+    - workers: start the session purger, the session-name queue and the
+      session archiver.
+
+A failing step is recorded and the remaining steps still run; the process
+stays live but is not ready. With STARTUP_IN_BACKGROUND the steps run on a
+thread after the server starts accepting connections, so liveness answers
+at once and readiness turns green when they finish; otherwise the server
+only starts listening once they are done.
+'''
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+RUN_MIGRATIONS_ON_STARTUP = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+# Set by gunicorn.conf.py in the master, which migrates once before forking workers
+MIGRATIONS_RUN_BY_MASTER = os.getenv("MIGRATIONS_RUN_BY_MASTER") == "1"
+STARTUP_IN_BACKGROUND = os.getenv("STARTUP_IN_BACKGROUND", "false").lower() in ("1", "true", "yes")
+
+def _migrate() -> None:
+    from database import engine
+    from migrations.runner import run_migrations
+    if RUN_MIGRATIONS_ON_STARTUP and not MIGRATIONS_RUN_BY_MASTER:
+        run_migrations(engine)
+
+def _warm_agent() -> None:
+    # Loads LangChain and the model SDK, which is most of the import time of the app
+    import Agent.Chat  # noqa: F401
+    from Agent.agent_registry import registry
+    registry.warm()
+
+def _start_workers() -> None:
+    from workers.session_purger import session_purger
+    from workers.session_name_queue import session_name_queue
+    from workers.session_archiver import session_archiver, ARCHIVE_ENABLED
+    session_purger.start()
+    session_name_queue.start()
+    if ARCHIVE_ENABLED:
+        session_archiver.start()
+
+STARTUP_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("migrations", _migrate),
+    ("agent", _warm_agent),
+    ("workers", _start_workers),
+]
+
+class Startup:
+    """Runs the startup steps once and reports their outcome for /health/ready."""
+
+    def __init__(self, steps: List[Tuple[str, Callable[[], None]]] = STARTUP_STEPS):
+        self.steps = steps
+        self.results: Dict[str, dict] = {name: {"status": "pending"} for name, _ in steps}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def ready(self) -> bool:
+        return self.done and all(result["status"] == "ok" for result in self.results.values())
+
+    def run(self) -> None:
+        self.started_at = time.perf_counter()
+        for name, step in self.steps:
+            self.results[name] = {"status": "running"}
+            started = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                print(f"Startup step {name} failed: {e}")
+                self.results[name] = {"status": "failed", "error": str(e)}
+            else:
+                self.results[name] = {"status": "ok"}
+            self.results[name]["seconds"] = round(time.perf_counter() - started, 3)
+        self.finished_at = time.perf_counter()
+
+    def run_in_background(self) -> None:
+        self._thread = threading.Thread(target=self.run, name="startup", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def report(self) -> dict:
+        if self.ready:
+            status = "ready"
+        elif self.done:
+            status = "failed"
+        else:
+            status = "starting"
+        report = {"status": status, "steps": self.results}
+        if self.done:
+            report["seconds"] = round(self.finished_at - self.started_at, 3)
+        return report
+
+startup = Startup()
@@ -0,0 +1,136 @@
+''' Tests for single-flight coalescing (no database needed) '''
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = 0
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "answer"
+
+        tasks = [asyncio.create_task(flight.do("key", work)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*tasks)
+
+    assert asyncio.run(scenario()) == ["answer"] * 5
+    assert calls == 1
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4}
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight()
+
+    async def scenario():
+        return await asyncio.gather(
+            flight.do("a", lambda: asyncio.sleep(0, "a")),
+            flight.do("b", lambda: asyncio.sleep(0, "b"))
+        )
+
+    assert asyncio.run(scenario()) == ["a", "b"]
+    assert flight.leaders == 2
+
+def test_leader_error_reaches_followers_and_is_not_remembered():
+    flight = SingleFlight(window=60)
+    calls = 0
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def failing():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            raise RuntimeError("model failed")
+
+        tasks = [asyncio.create_task(flight.do("key", failing)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert calls == 1
+    assert asyncio.run(flight.do("key", lambda: asyncio.sleep(0, "retried"))) == "retried"
+
+def test_results_are_reused_within_the_window():
+    flight = SingleFlight(window=60)
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert asyncio.run(flight.do("key", work)) == 1
+    assert asyncio.run(flight.do("key", work)) == 1
+    assert calls == 1
+
+def test_without_a_window_finished_calls_run_again():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert asyncio.run(flight.do("key", work)) == 1
+    assert asyncio.run(flight.do("key", work)) == 2
+
+def test_follower_takes_over_when_the_leader_is_cancelled():
+    flight = SingleFlight()
+    calls = []
+
+    async def scenario():
+        leader_started = asyncio.Event()
+
+        async def work(name):
+            calls.append(name)
+            if name == "leader":
+                leader_started.set()
+                await asyncio.Event().wait()  # Never finishes on its own
+            return f"from {name}"
+
+        leader = asyncio.create_task(flight.do("key", lambda: work("leader")))
+        await leader_started.wait()
+        follower = asyncio.create_task(flight.do("key", lambda: work("follower")))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "from follower"
+    assert calls == ["leader", "follower"]
+    assert flight.stats()["in_flight"] == 0
+
+def test_cancelled_follower_does_not_cancel_the_leader():
+    flight = SingleFlight()
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "done"
+
+        leader = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        follower.cancel()
+        await asyncio.gather(follower, return_exceptions=True)
+        release.set()
+        return await leader
+
+    assert asyncio.run(scenario()) == "done"
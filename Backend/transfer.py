@@ -0,0 +1,94 @@
+''' Export and import users' conversations as NDJSON (crud/transfer_crud.py)
+
+Usage (from the Backend directory):
+    python -m transfer export --user-id 42 > user-42.ndjson
+    python -m transfer export --user-id 42 --output user-42.ndjson.gz
+    python -m transfer import --user-id 7 user-42.ndjson.gz [--new-tokens]
+
+Files ending in .gz are compressed / decompressed on the fly. "-" (the
+default) is stdout for export and stdin for import. Progress and totals go
+to stderr.
+'''
+import argparse
+import gzip
+import sys
+import time
+
+import database
+import models
+import crud.transfer_crud as transfer_crud
+
+def _open(path: str, mode: str):
+    if path == "-":
+        return sys.stdout.buffer if "w" in mode else sys.stdin.buffer
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+def _user_exists(db, user_id: int) -> bool:
+    # Not users_crud.check_user_exists_with_id: it prints to stdout, where exports go
+    return db.query(models.User.id).filter(models.User.id == user_id).first() is not None
+
+def export_command(args) -> None:
+    db = database.SessionLocal()
+    try:
+        if not _user_exists(db, args.user_id):
+            sys.exit(f"User {args.user_id} does not exist")
+        started = time.perf_counter()
+        written = 0
+        output = _open(args.output, "wb")
+        try:
+            for chunk in transfer_crud.export_user_ndjson(db, args.user_id):
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+        print(f"Exported user {args.user_id}: {written} bytes in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    finally:
+        db.close()
+
+def import_command(args) -> None:
+    db = database.SessionLocal()
+    try:
+        if not _user_exists(db, args.user_id):
+            sys.exit(f"User {args.user_id} does not exist")
+        started = time.perf_counter()
+        importer = transfer_crud.NdjsonImporter(db, args.user_id, new_tokens=args.new_tokens, batch_rows=args.batch_rows)
+        source = _open(args.input, "rb")
+        try:
+            for line in source:
+                importer.add_line(line)
+                if importer.full:
+                    importer.flush()
+                    print(f"Imported {importer.messages_imported} messages", file=sys.stderr)
+            totals = importer.finish()
+        except ValueError as e:
+            sys.exit(f"{e}; {importer.sessions_imported} sessions were imported before it, run again to resume")
+        finally:
+            if source is not sys.stdin.buffer:
+                source.close()
+        print(f"{totals} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and import conversations as NDJSON")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Write a user's sessions and messages")
+    export_parser.add_argument("--user-id", type=int, required=True)
+    export_parser.add_argument("--output", default="-", help="File to write (.gz to compress); stdout by default")
+    import_parser = subparsers.add_parser("import", help="Load an export into a user with COPY")
+    import_parser.add_argument("input", nargs="?", default="-", help="File to read (.gz is decompressed); stdin by default")
+    import_parser.add_argument("--user-id", type=int, required=True, help="User the sessions are imported into")
+    import_parser.add_argument("--new-tokens", action="store_true", help="Give the sessions new tokens (to copy within a database)")
+    import_parser.add_argument("--batch-rows", type=int, default=transfer_crud.IMPORT_BATCH_ROWS)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_command(args)
+    else:
+        import_command(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+''' Background archiver for idle sessions
+
+Every ARCHIVE_INTERVAL seconds this worker walks the sessions whose newest
+message is older than ARCHIVE_IDLE_DAYS and moves each one's chats_2 rows
+into a single zstd-compressed chats_archive row (crud/archive_crud.py),
+one short transaction per session. Archived sessions are moved back
+transparently the next time they are read. Archiving is idempotent and
+locks each session with SKIP LOCKED, so archivers in several worker
+processes can run side by side. Each pass also indexes a batch of archives
+written before they carried a search_vector.
+'''
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import database
+import crud.archive_crud as archive_crud
+
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "true").lower() in ("1", "true", "yes")
+ARCHIVE_IDLE_DAYS = float(os.getenv("ARCHIVE_IDLE_DAYS", "30"))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "3600"))
+ARCHIVE_SESSIONS_PER_PASS = int(os.getenv("ARCHIVE_SESSIONS_PER_PASS", "100"))
+# Pause between sessions so archiving yields to foreground traffic
+ARCHIVE_SESSION_PAUSE = float(os.getenv("ARCHIVE_SESSION_PAUSE", "0.01"))
+
+class SessionArchiver:
+    def __init__(
+        self,
+        idle_days: float = ARCHIVE_IDLE_DAYS,
+        interval: float = ARCHIVE_INTERVAL,
+        session_pause: float = ARCHIVE_SESSION_PAUSE
+    ):
+        self.idle_days = idle_days
+        self.interval = interval
+        self.session_pause = session_pause
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.sessions_archived = 0
+        self.messages_archived = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.archives_indexed = 0
+        self.last_run_at = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="session-archiver", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def notify(self) -> None:
+        """Ask the archiver to run a pass now."""
+        self._wake.set()
+
+    def archive_idle(self) -> int:
+        """Archive every session idle past the threshold. Returns sessions archived."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.idle_days)
+        archived = 0
+        after_id = 0
+        db = database.SessionLocal()
+        try:
+            while not self._stop.is_set():
+                idle = archive_crud.fetch_idle_sessions(db, cutoff, after_id, ARCHIVE_SESSIONS_PER_PASS)
+                db.rollback()  # Do not hold the snapshot while archiving
+                if not idle:
+                    break
+                for session_id, session_token in idle:
+                    if self._stop.is_set():
+                        break
+                    after_id = session_id
+                    try:
+                        result = archive_crud.archive_session(db, session_token, cutoff)
+                    except Exception as e:
+                        # e.g. a session too large to index; it stays in chats_2 and the pass moves on
+                        print(f"Archiving session {session_token} failed: {str(e)}")
+                        result = None
+                    if result is not None:
+                        archived += 1
+                        self.sessions_archived += 1
+                        self.messages_archived += result["messages"]
+                        self.raw_bytes += result["raw_bytes"]
+                        self.compressed_bytes += result["compressed_bytes"]
+                    time.sleep(self.session_pause)
+            if not self._stop.is_set():
+                self.archives_indexed += archive_crud.index_unsearchable_archives(db, ARCHIVE_SESSIONS_PER_PASS)
+        finally:
+            db.close()
+        self.last_run_at = time.time()
+        return archived
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ARCHIVE_ENABLED,
+            "idle_days": self.idle_days,
+            "interval": self.interval,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "last_run_at": self.last_run_at,
+            "sessions_archived": self.sessions_archived,
+            "messages_archived": self.messages_archived,
+            "raw_bytes": self.raw_bytes,
+            "compressed_bytes": self.compressed_bytes,
+            "archives_indexed": self.archives_indexed,
+        }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.archive_idle()
+            except Exception as e:
+                print(f"Session archive failed: {str(e)}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+session_archiver = SessionArchiver()
@@ -0,0 +1,282 @@
+''' In-process job queue for session-name generation
+
+POST /sessions/{token}/name enqueues a job and returns at once; a small
+pool of worker threads calls Gemini and stores the result with
+sessions_crud.store_session_name. Requests for a token that already has a
+queued or running job join that job instead of creating another.
+
+Jobs run in the process that queued them, but every status change is also
+written to the session_name_jobs table, so a status poll that reaches
+another worker process is answered from there (re-read every
+NAME_JOB_POLL_INTERVAL seconds while it waits, as there is no wake-up
+across processes).
+'''
+import asyncio
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional, Tuple
+
+import database
+import crud.sessions_crud as sessions_crud
+
+NAME_QUEUE_WORKERS = int(os.getenv("NAME_QUEUE_WORKERS", "4"))
+# Finished jobs stay pollable for this long
+NAME_JOB_RETENTION = float(os.getenv("NAME_JOB_RETENTION", "3600"))
+# How often a long poll for another process's job re-reads session_name_jobs
+NAME_JOB_POLL_INTERVAL = float(os.getenv("NAME_JOB_POLL_INTERVAL", "0.5"))
+# An unfinished job whose row has not changed for this long lost its process (e.g. a recycled worker)
+NAME_JOB_STALE_AFTER = float(os.getenv("NAME_JOB_STALE_AFTER", "300"))
+# Number of recent job latencies kept for the stats endpoint
+LATENCY_WINDOW = 500
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+NOT_FOUND = "not_found"
+FINISHED_STATES = {DONE, FAILED, NOT_FOUND}
+
+class NameJob:
+    def __init__(self, session_token: str, topic: str):
+        self.id = str(uuid.uuid4())
+        self.session_token = session_token
+        self.topic = topic
+        self.status = QUEUED
+        self.session_name: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # (loop, event) of each long poll waiting on this job
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self._waiters_lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    async def wait(self, timeout: float) -> None:
+        """Wait up to timeout seconds for the job to finish."""
+        if timeout <= 0:
+            return
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._waiters_lock:
+            if self.finished:
+                return
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._waiters_lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def _notify(self) -> None:
+        """Wake the long polls waiting on this job; called by the worker thread once it has finished."""
+        with self._waiters_lock:
+            waiters, self._waiters = self._waiters, []
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # The loop was closed (e.g. the worker is shutting down)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "session_token": self.session_token,
+            "status": self.status,
+            "session_name": self.session_name,
+            "error": self.error,
+        }
+
+    def to_record(self) -> dict:
+        """The job's row in session_name_jobs."""
+        finished_at = datetime.fromtimestamp(self.finished_at, timezone.utc) if self.finished_at else None
+        return {**self.to_dict(), "finished_at": finished_at}
+
+class SessionNameQueue:
+    def __init__(self, workers: int = NAME_QUEUE_WORKERS):
+        self.workers = workers
+        self._queue: "queue.Queue[Optional[NameJob]]" = queue.Queue()
+        self._jobs: Dict[str, NameJob] = {}
+        self._active_by_token: Dict[str, NameJob] = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._running = 0
+        self._latencies: Deque[Tuple[float, float]] = deque(maxlen=LATENCY_WINDOW)  # (wait, total)
+        self.completed = 0
+        self.failed = 0
+        self.coalesced = 0
+        self._pruned_at = 0.0
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"session-name-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, session_token: str, topic: str) -> Tuple[NameJob, bool]:
+        """
+        Enqueue name generation for a session.
+
+        Returns:
+            tuple: (job, created). created is False when an unfinished job
+            for the same token already existed and was returned instead.
+        """
+        with self._lock:
+            self._prune()
+            active = self._active_by_token.get(session_token)
+            if active is not None and not active.finished:
+                self.coalesced += 1
+                return active, False
+            job = NameJob(session_token, topic)
+            self._jobs[job.id] = job
+            self._active_by_token[session_token] = job
+        # Before a worker thread can pick it up, so the queued row never overwrites a later status
+        db = database.SessionLocal()
+        try:
+            sessions_crud.save_name_job(db, job.to_record())
+        except Exception:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+                if self._active_by_token.get(session_token) is job:
+                    del self._active_by_token[session_token]
+            raise
+        finally:
+            db.close()
+        self._queue.put(job)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[NameJob]:
+        """A job queued by this process, or None."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    async def load(self, job_id: str, wait: float = 0) -> Optional[dict]:
+        """
+        Status of a job queued by another worker process, from session_name_jobs.
+        With wait > 0, re-read until the job finishes or the wait expires.
+        Returns None if there is no such job.
+        """
+        deadline = time.monotonic() + wait
+        while True:
+            async with database.AsyncSessionLocal() as db:
+                job = await sessions_crud.get_name_job(db, job_id)
+            if job is None:
+                return None
+            idle_seconds = job.pop("idle_seconds")
+            if job["status"] in FINISHED_STATES:
+                return job
+            if idle_seconds > NAME_JOB_STALE_AFTER:
+                return {**job, "status": FAILED, "error": "Session name generation was interrupted; request it again"}
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return job
+            await asyncio.sleep(min(NAME_JOB_POLL_INTERVAL, remaining))
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = list(self._latencies)
+            running = self._running
+        waits = sorted(wait for wait, _ in latencies)
+        totals = sorted(total for _, total in latencies)
+
+        def pct(values, fraction):
+            return round(values[min(len(values) - 1, int(len(values) * fraction))], 3) if values else None
+
+        return {
+            "queue_depth": self._queue.qsize(),
+            "running": running,
+            "workers": len(self._threads),
+            "completed": self.completed,
+            "failed": self.failed,
+            "coalesced": self.coalesced,
+            "wait_seconds_p50": pct(waits, 0.5),
+            "wait_seconds_p95": pct(waits, 0.95),
+            "latency_seconds_p50": pct(totals, 0.5),
+            "latency_seconds_p95": pct(totals, 0.95),
+        }
+
+    def _prune(self) -> None:
+        cutoff = time.time() - NAME_JOB_RETENTION
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if self._active_by_token.get(job.session_token) is job:
+                del self._active_by_token[job.session_token]
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            with self._lock:
+                self._running += 1
+            job.status = RUNNING
+            job.started_at = time.time()
+            self._publish(job)
+            try:
+                self._run(job)
+            except Exception as e:
+                job.status = FAILED
+                job.error = f"Error generating session name: {str(e)}"
+            finally:
+                job.finished_at = time.time()
+                with self._lock:
+                    self._running -= 1
+                    self._latencies.append((job.started_at - job.created_at, job.finished_at - job.created_at))
+                    if job.status == FAILED:
+                        self.failed += 1
+                    else:
+                        self.completed += 1
+                job._notify()
+                self._publish(job)
+
+    def _publish(self, job: NameJob) -> None:
+        """Store a job's status for other processes, and now and then drop expired rows."""
+        db = database.SessionLocal()
+        try:
+            sessions_crud.save_name_job(db, job.to_record())
+            if job.finished and time.monotonic() - self._pruned_at > 60:
+                self._pruned_at = time.monotonic()
+                sessions_crud.prune_name_jobs(db, NAME_JOB_RETENTION)
+        except Exception as e:
+            print(f"Saving session name job {job.id} failed: {str(e)}")
+        finally:
+            db.close()
+
+    def _run(self, job: NameJob) -> None:
+        # Imported here so the queue module stays light for the web process
+        from Agent.session_name_generator import session_name_generator
+
+        session_name = session_name_generator(job.topic)
+        db = database.SessionLocal()
+        try:
+            stored = sessions_crud.store_session_name(
+                db=db,
+                session_token=job.session_token,
+                session_short_name=session_name
+            )
+        finally:
+            db.close()
+        job.session_name = session_name
+        job.status = DONE if stored else NOT_FOUND
+
+session_name_queue = SessionNameQueue()
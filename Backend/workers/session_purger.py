@@ -0,0 +1,113 @@
+''' Background purger for soft-deleted sessions
+
+DELETE /sessions/{token} only marks the Session row deleted. This worker
+then removes the session's chats_2 rows in bounded batches (one short
+transaction each, so no long-held locks however large the session is),
+its archived messages if any, and finally the Session row. Purging is idempotent, so purgers in several
+worker processes can run side by side.
+
+A session is only purged PURGE_GRACE seconds after it was deleted. Other
+worker processes may still have it cached as live (SESSION_CACHE_TTL) or
+be finishing a turn for it, and a message stored after the purge would
+be left behind with no session.
+'''
+import os
+import threading
+import time
+
+import database
+import crud.sessions_crud as sessions_crud
+import crud.chat_crud as chat_crud
+import crud.archive_crud as archive_crud
+
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "1000"))
+# Pause between batches so purging yields to foreground traffic
+PURGE_BATCH_PAUSE = float(os.getenv("PURGE_BATCH_PAUSE", "0.05"))
+# How often to look for deleted sessions whose grace period has passed
+PURGE_INTERVAL = float(os.getenv("PURGE_INTERVAL", "30"))
+PURGE_SESSIONS_PER_PASS = int(os.getenv("PURGE_SESSIONS_PER_PASS", "100"))
+# Seconds between deleting a session and purging it; keep it above SESSION_CACHE_TTL and a turn's duration
+PURGE_GRACE = float(os.getenv("PURGE_GRACE", "180"))
+
+class SessionPurger:
+    def __init__(
+        self,
+        batch_size: int = PURGE_BATCH_SIZE,
+        batch_pause: float = PURGE_BATCH_PAUSE,
+        interval: float = PURGE_INTERVAL
+    ):
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.sessions_purged = 0
+        self.rows_purged = 0
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._wake.set()  # Sweep anything left over from before a restart
+        self._thread = threading.Thread(target=self._run, name="session-purger", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def notify(self) -> None:
+        """Ask the purger to run now, e.g. right after sessions were deleted."""
+        self._wake.set()
+
+    def purge_session(self, db, session_id: int, session_token: str) -> int:
+        """Delete one session's messages batch by batch, then its Session row."""
+        purged = 0
+        while not self._stop.is_set():
+            deleted = chat_crud.delete_session_batch(db, session_token, self.batch_size)
+            purged += deleted
+            if deleted < self.batch_size:
+                break
+            time.sleep(self.batch_pause)
+        else:
+            return purged  # Shutting down; the session is picked up again next time
+        archive_crud.delete_archive(db, session_token)
+        sessions_crud.hard_delete_session(db, session_id)
+        self.sessions_purged += 1
+        self.rows_purged += purged
+        return purged
+
+    def purge_pending(self) -> int:
+        """Purge every session currently marked deleted. Returns sessions purged."""
+        total = 0
+        db = database.SessionLocal()
+        try:
+            while not self._stop.is_set():
+                pending = sessions_crud.fetch_deleted_sessions(db, limit=PURGE_SESSIONS_PER_PASS, min_age=PURGE_GRACE)
+                if not pending:
+                    break
+                for session_id, session_token in pending:
+                    if self._stop.is_set():
+                        break
+                    self.purge_session(db, session_id, session_token)
+                    total += 1
+        finally:
+            db.close()
+        return total
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.purge_pending()
+            except Exception as e:
+                print(f"Session purge failed: {str(e)}")
+
+session_purger = SessionPurger()
@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { SessionList } from "./components/SessionList";
 import { ChatArea } from "./components/ChatArea";
 import { RenameSessionDialog } from "./components/RenameSessionDialog";
@@ -29,12 +29,18 @@ type View = "chat" | "account";
 function ChatInterface() {
   const [currentView, setCurrentView] = useState<View>("chat");
   const [sessions, setSessions] = useState<Session[]>([]);
+  // Cursor of the next page of older sessions; null once every session is listed
+  const [sessionsCursor, setSessionsCursor] = useState<string | null>(null);
+  const loadingSessionsRef = useRef(false);
   const [activeSessionId, setActiveSessionId] = useState("");
   const [renameDialogOpen, setRenameDialogOpen] = useState(false);
   const [sessionToRename, setSessionToRename] = useState<string | null>(null);
   const [deleteDialogOpen, setDeleteDialogOpen] = useState(false);
   const [sessionToDelete, setSessionToDelete] = useState<string | null>(null);
   const [messagesBySession, setMessagesBySession] = useState<Record<string, Message[]>>({});
+  // Cursor of the page before the oldest loaded message; null once the first message is loaded
+  const [olderCursorBySession, setOlderCursorBySession] = useState<Record<string, number | null>>({});
+  const loadingOlderRef = useRef<Set<string>>(new Set());
 
   // Load sessions on mount
   useEffect(() => {
@@ -48,15 +54,19 @@ function ChatInterface() {
     }
   }, [activeSessionId]);
 
+  const formatSession = (s: SessionType): Session => ({
+    id: s.session_token,
+    title: s.session_short_name || "New Chat",
+    timestamp: s.last_activity_at ? new Date(s.last_activity_at).toLocaleString() : "Recently",
+  });
+
   const loadSessions = async () => {
     try {
-      const sessionsData = await api.getSessions();
-      const formattedSessions = sessionsData.map((s: SessionType) => ({
-        id: s.session_token,
-        title: s.session_short_name || "New Chat",
-        timestamp: "Recently",
-      }));
+      // The first page; older sessions load as the sidebar is scrolled down
+      const { sessions: sessionsData, nextCursor } = await api.getSessions();
+      const formattedSessions = sessionsData.map(formatSession);
       setSessions(formattedSessions);
+      setSessionsCursor(nextCursor);
       
       if (formattedSessions.length > 0 && !activeSessionId) {
         setActiveSessionId(formattedSessions[0].id);
@@ -66,13 +76,33 @@ function ChatInterface() {
     }
   };
 
+  const loadMoreSessions = async () => {
+    if (sessionsCursor === null || loadingSessionsRef.current) return;
+    loadingSessionsRef.current = true;
+    try {
+      const { sessions: sessionsData, nextCursor } = await api.getSessions(sessionsCursor);
+      setSessions(prev => {
+        // Sessions created here since the first page are already listed
+        const listed = new Set(prev.map(s => s.id));
+        return [...prev, ...sessionsData.map(formatSession).filter(s => !listed.has(s.id))];
+      });
+      setSessionsCursor(nextCursor);
+    } catch (error) {
+      console.error("Failed to load more sessions:", error);
+    } finally {
+      loadingSessionsRef.current = false;
+    }
+  };
+
   const loadMessages = async (sessionToken: string) => {
     try {
-      const messages = await api.getMessages(sessionToken);
+      // Only the newest page; earlier ones load as the user scrolls up
+      const { messages, nextCursor } = await api.getMessages(sessionToken);
       setMessagesBySession(prev => ({
         ...prev,
         [sessionToken]: messages
       }));
+      setOlderCursorBySession(prev => ({ ...prev, [sessionToken]: nextCursor }));
     } catch (error) {
       console.error("Failed to load messages:", error);
       setMessagesBySession(prev => ({
@@ -82,6 +112,24 @@ function ChatInterface() {
     }
   };
 
+  const loadOlderMessages = async (sessionToken: string) => {
+    const before = olderCursorBySession[sessionToken];
+    if (before == null || loadingOlderRef.current.has(sessionToken)) return;
+    loadingOlderRef.current.add(sessionToken);
+    try {
+      const { messages, nextCursor } = await api.getMessages(sessionToken, before);
+      setMessagesBySession(prev => ({
+        ...prev,
+        [sessionToken]: [...messages, ...(prev[sessionToken] || [])]
+      }));
+      setOlderCursorBySession(prev => ({ ...prev, [sessionToken]: nextCursor }));
+    } catch (error) {
+      console.error("Failed to load earlier messages:", error);
+    } finally {
+      loadingOlderRef.current.delete(sessionToken);
+    }
+  };
+
   const handleNewSession = async () => {
     try {
       const sessionToken = await api.createSession();
@@ -213,6 +261,8 @@ function ChatInterface() {
             onRenameSession={handleRenameSession}
             onDeleteSession={handleDeleteSession}
             onAccountSettings={() => setCurrentView("account")}
+            hasMoreSessions={sessionsCursor !== null}
+            onLoadMoreSessions={loadMoreSessions}
           />
         </div>
         <div className="flex-1 overflow-hidden">
@@ -222,6 +272,8 @@ function ChatInterface() {
             sessionTitle={sessions.find(s => s.id === activeSessionId)?.title || "Chat"}
             hasActiveSession={activeSessionId !== ""}
             onNewSession={handleNewSession}
+            hasOlderMessages={olderCursorBySession[activeSessionId] != null}
+            onLoadOlderMessages={() => loadOlderMessages(activeSessionId)}
           />
         </div>
       </div>
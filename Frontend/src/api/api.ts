@@ -1,4 +1,4 @@
-import type { Message, Session, UserCreateResponse, User } from '../types';
+import type { Message, MessagePage, SessionPage, UserCreateResponse, User } from '../types';
 import { storage } from '../utils/storage';
 
 // Remove trailing slash from API_BASE_URL if present
@@ -92,13 +92,15 @@ export const api = {
   },
 
   // Session related API calls
-  async getSessions(): Promise<Session[]> {
+  async getSessions(cursor: string | null = null): Promise<SessionPage> {
     const userId = storage.getUserId();
     if (!userId) throw new ApiError(401, 'User not authenticated');
     
-    const response = await fetch(`${API_BASE_URL}/sessions/${userId}`);
+    // One page, most recently active first; pass nextCursor back for the next one
+    const query = cursor === null ? '' : `?cursor=${encodeURIComponent(cursor)}`;
+    const response = await fetch(`${API_BASE_URL}/sessions/${userId}${query}`);
     const data = await handleApiResponse(response);
-    return data.sessions || [];
+    return { sessions: data.sessions || [], nextCursor: data.next_cursor ?? null };
   },
 
   async createSession(): Promise<string> {
@@ -151,16 +153,30 @@ export const api = {
         topic
       }),
     });
-    return await handleApiResponse(response);
+    let job = await handleApiResponse(response);
+
+    // Generation runs in the background; long-poll the job until it finishes
+    while (job.status === 'queued' || job.status === 'running') {
+      const jobResponse = await fetch(`${API_BASE_URL}/sessions/name-jobs/${job.job_id}?wait=25`);
+      job = await handleApiResponse(jobResponse);
+    }
+    if (job.status !== 'done') {
+      throw new ApiError(job.status === 'not_found' ? 404 : 500, job.error || job.message);
+    }
+    return { session_name: job.session_name, message: job.message };
   },
 
   // Chat related API calls
-  async getMessages(sessionToken: string): Promise<Message[]> {
+  async getMessages(sessionToken: string, before: number | null = null): Promise<MessagePage> {
     if (!storage.isAuthenticated()) throw new ApiError(401, 'User not authenticated');
     
-    const response = await fetch(`${API_BASE_URL}/chat/${sessionToken}`);
+    // The API pages newest-first: fetch the newest page (or the one before a cursor)
+    // and return it in chronological order, with the cursor of the page before it
+    const query = before === null ? '' : `?before=${before}`;
+    const response = await fetch(`${API_BASE_URL}/chat/${sessionToken}${query}`);
     const data = await handleApiResponse(response);
-    return data.messages || [];
+    const messages: Message[] = (data.messages || []).map((message: Message) => ({ ...message, id: String(message.id) }));
+    return { messages: messages.reverse(), nextCursor: data.next_cursor ?? null };
   },
 
   async sendMessage(sessionToken: string, message: string): Promise<Message> {
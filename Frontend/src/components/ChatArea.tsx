@@ -1,4 +1,4 @@
-import { useState } from "react";
+import { useLayoutEffect, useRef, useState } from "react";
 import { ScrollArea } from "./ui/scroll-area";
 import { Input } from "./ui/input";
 import { Button } from "./ui/button";
@@ -6,6 +6,7 @@ import { Avatar, AvatarFallback } from "./ui/avatar";
 import { Send, Plus } from "lucide-react";
 import { useAuth } from "./AuthContext";
 import { MarkdownFormatter } from "./MarkdownFormatter";
+import { LoadMoreTrigger } from "./LoadMoreTrigger";
 import type { Message } from "../types";
 
 interface ChatAreaProps {
@@ -14,6 +15,8 @@ interface ChatAreaProps {
   readonly sessionTitle: string;
   readonly hasActiveSession: boolean;
   readonly onNewSession: () => void;
+  readonly hasOlderMessages: boolean;
+  readonly onLoadOlderMessages: () => void;
 }
 
 export function ChatArea({ 
@@ -21,10 +24,30 @@ export function ChatArea({
   onSendMessage, 
   sessionTitle,
   hasActiveSession,
-  onNewSession
+  onNewSession,
+  hasOlderMessages,
+  onLoadOlderMessages
 }: ChatAreaProps) {
   const { user } = useAuth();
   const [input, setInput] = useState("");
+  const contentRef = useRef<HTMLDivElement>(null);
+  const shownRef = useRef({ firstId: "", lastId: "", scrollHeight: 0 });
+
+  useLayoutEffect(() => {
+    const viewport = contentRef.current?.closest<HTMLElement>('[data-slot="scroll-area-viewport"]');
+    if (!viewport) return;
+    const firstId = messages[0]?.id ?? "";
+    const lastId = messages[messages.length - 1]?.id ?? "";
+    const shown = shownRef.current;
+    if (lastId !== shown.lastId) {
+      // Opened a session or a message arrived: show the newest messages
+      viewport.scrollTop = viewport.scrollHeight;
+    } else if (firstId !== shown.firstId) {
+      // Earlier messages were added above: keep the same messages in view
+      viewport.scrollTop += viewport.scrollHeight - shown.scrollHeight;
+    }
+    shownRef.current = { firstId, lastId, scrollHeight: viewport.scrollHeight };
+  }, [messages]);
 
   const handleSubmit = (e: React.FormEvent) => {
     e.preventDefault();
@@ -96,7 +119,10 @@ export function ChatArea({
       {/* Messages - Scrollable */}
       <div className="flex-1 overflow-y-auto">
         <ScrollArea className="h-full">
-          <div className="space-y-4 p-4">
+          <div ref={contentRef} className="space-y-4 p-4">
+            {hasOlderMessages && (
+              <LoadMoreTrigger onVisible={onLoadOlderMessages} label="Loading earlier messages..." />
+            )}
             {messages.map((message) => (
               <div
                 key={message.id}
@@ -0,0 +1,30 @@
+import { useEffect, useRef } from "react";
+
+interface LoadMoreTriggerProps {
+  readonly onVisible: () => void;
+  readonly label: string;
+}
+
+// Placed at the end of a paged list: calls onVisible while it is scrolled into view
+export function LoadMoreTrigger({ onVisible, label }: LoadMoreTriggerProps) {
+  const ref = useRef<HTMLDivElement>(null);
+
+  useEffect(() => {
+    const element = ref.current;
+    if (!element) return;
+    // Re-observed after each render, so it fires again if a page did not push it out of view
+    const observer = new IntersectionObserver((entries) => {
+      if (entries.some((entry) => entry.isIntersecting)) {
+        onVisible();
+      }
+    });
+    observer.observe(element);
+    return () => observer.disconnect();
+  }, [onVisible]);
+
+  return (
+    <div ref={ref} className="py-2 text-center text-xs text-slate-500 dark:text-slate-400">
+      {label}
+    </div>
+  );
+}
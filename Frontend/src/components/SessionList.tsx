@@ -15,6 +15,7 @@ import {
 import { Collapsible, CollapsibleContent, CollapsibleTrigger } from "./ui/collapsible";
 import { useTheme } from "./ThemeProvider";
 import { useAuth } from "./AuthContext";
+import { LoadMoreTrigger } from "./LoadMoreTrigger";
 
 interface Session {
   id: string;
@@ -30,9 +31,11 @@ interface SessionListProps {
   readonly onRenameSession: (id: string) => void;
   readonly onDeleteSession: (id: string) => void;
   readonly onAccountSettings: () => void;
+  readonly hasMoreSessions: boolean;
+  readonly onLoadMoreSessions: () => void;
 }
 
-export function SessionList({ sessions, activeSessionId, onSessionSelect, onNewSession, onRenameSession, onDeleteSession, onAccountSettings }: SessionListProps) {
+export function SessionList({ sessions, activeSessionId, onSessionSelect, onNewSession, onRenameSession, onDeleteSession, onAccountSettings, hasMoreSessions, onLoadMoreSessions }: SessionListProps) {
   const { theme, toggleTheme } = useTheme();
   const { user, logout } = useAuth();
   const [toolsOpen, setToolsOpen] = useState(true);
@@ -156,6 +159,9 @@ export function SessionList({ sessions, activeSessionId, onSessionSelect, onNewS
                   </div>
                 </div>
               ))}
+              {hasMoreSessions && (
+                <LoadMoreTrigger onVisible={onLoadMoreSessions} label="Loading older conversations..." />
+              )}
             </div>
           </ScrollArea>
         </CollapsibleContent>
@@ -24,7 +24,7 @@ const useChat = () => {
 
   const loadSessions = async () => {
     try {
-      const sessions = await api.handleRequest(api.getSessions());
+      const { sessions } = await api.handleRequest(api.getSessions());
       setState(prev => ({
         ...prev,
         sessions,
@@ -36,7 +36,7 @@ const useChat = () => {
 
   const loadMessages = async (sessionToken: string) => {
     try {
-      const messages = await api.handleRequest(api.getMessages(sessionToken));
+      const { messages } = await api.handleRequest(api.getMessages(sessionToken));
       setState(prev => ({
         ...prev,
         messagesBySession: {
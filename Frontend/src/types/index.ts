@@ -10,6 +10,14 @@ export interface Session {
   timestamp?: string;
   session_token: string;
   session_short_name?: string;
+  last_message?: string | null;
+  message_count?: number;
+  last_activity_at?: string;
+}
+
+export interface SessionPage {
+  sessions: Session[];
+  nextCursor: string | null;  // Pass as `cursor` to fetch the next page
 }
 
 export interface Message {
@@ -19,6 +27,11 @@ export interface Message {
   timestamp: string;
 }
 
+export interface MessagePage {
+  messages: Message[];
+  nextCursor: number | null;  // Pass as `before` to fetch the page of older messages
+}
+
 export interface ChatState {
   sessions: Session[];
   activeSessionId: string;